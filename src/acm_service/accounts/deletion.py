@@ -0,0 +1,21 @@
+import logging
+from uuid import UUID
+
+from acm_service.utils.database.session import create_unit_of_work
+from acm_service.utils.dependencies import get_background_account_service
+from acm_service.utils.logconf import DEFAULT_LOGGER
+
+logger = logging.getLogger(DEFAULT_LOGGER)
+
+
+async def run_account_deletion(account_id: UUID) -> None:
+    """Background job deleting a scheduled account chunk by chunk, every chunk in its own short transaction."""
+    try:
+        finished = False
+        while not finished:
+            async with create_unit_of_work() as unit_of_work:
+                finished = await get_background_account_service(unit_of_work).delete_chunk(account_id)
+    except Exception as exc:
+        logger.exception(f'Deletion of account {account_id} failed: {exc}')
+        async with create_unit_of_work() as unit_of_work:
+            await get_background_account_service(unit_of_work).fail_deletion(account_id)
@@ -1,16 +1,43 @@
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, Integer, Index, DateTime, func, PrimaryKeyConstraint, \
+    UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from acm_service.utils.database.session import Base
+from acm_service.utils.database.repository import DatabaseNow, utc_now
+from acm_service.utils.database.types import UUIDType
 
 
 class Account(Base):
     __tablename__ = 'accounts'
+    # partitioned by region on PostgreSQL (migration b74d84bc7ca9) the region joins the primary key and e-mails are
+    # unique through the account_emails table instead
+    __table_args__ = (PrimaryKeyConstraint('id', name='accounts_pkey'),
+                      UniqueConstraint('email', name='accounts_email_key'),
+                      Index('ix_accounts_region_vip_name', 'region', 'vip', 'name'),
+                      Index('ix_accounts_updated_at_id', 'updated_at', 'id'))
 
-    id = Column(String, primary_key=True, index=True)
-    email = Column(String, unique=True)
+    id = Column(UUIDType, index=True)
+    email = Column(String)
     name = Column(String, index=False)
     region = Column(String, nullable=False)
     vip = Column(Boolean, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    # stamped by the database as the row is written, the change feed pages by it
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=DatabaseNow(), onupdate=DatabaseNow())
 
-    agents = relationship('Agent',  cascade='all,delete', backref='accounts', passive_deletes=True)
\ No newline at end of file
+    agents = relationship('Agent',  cascade='all,delete', backref='accounts', passive_deletes=True)
+
+
+Index('ix_accounts_lower_email', func.lower(Account.email))
+
+
+class AccountDeletion(Base):
+    __tablename__ = 'account_deletions'
+
+    account_id = Column(UUIDType, primary_key=True)
+    region = Column(String, nullable=False)
+    vip = Column(Boolean, nullable=False)
+    status = Column(String, nullable=False)
+    agents_deleted = Column(Integer, nullable=False, default=0)
+    # refreshed by the job running the deletion after every chunk, a running deletion without it is taken over
+    heartbeat_at = Column(DateTime(timezone=True))
@@ -1,105 +1,268 @@
+import json
 from datetime import timedelta
-from typing import List
-from uuid import UUID, uuid4
+from typing import List, AsyncIterator
+from uuid import UUID
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, update, func, text, Table, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.sql import Select
+from sqlalchemy.orm import selectinload
+from pydantic import parse_raw_as
+from pydantic.json import pydantic_encoder
 
-from acm_service.accounts.model import Account as AccountDB
-from acm_service.accounts.schema import AccountWithoutAgents, Account
-from acm_service.utils.cache.repositories import Cache, logger
-from acm_service.utils.database.repository import AbstractRepository, log_exception
-from acm_service.utils.database.session import create_session
-from acm_service.utils.env import REDIS_CACHE_INVALIDATION_IN_SECONDS
+from acm_service.accounts.model import Account as AccountDB, AccountDeletion as AccountDeletionDB
+from acm_service.accounts.schema import AccountWithoutAgents, Account, RegionEnum, DeletedAccount, AccountDeletion, \
+    DeletionStatusEnum, EraseResult, RegionStats
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.agents.repository import ACCOUNT_AGENTS, ACCOUNT_AGENTS_VERSION
+from acm_service.agents.schema import Agent
+from acm_service.changes.model import Tombstone as TombstoneDB
+from acm_service.changes.repository import write_tombstones
+from acm_service.changes.schema import ChangeKindEnum
+from acm_service.utils.cache.repositories import Cache, ABSENT, logger
+from acm_service.utils.database.repository import AbstractRepository, DatabaseRepository, log_exception, \
+    insert_unless_conflicting, stream_rows, supports_returning, supports_truncate, utc_now
+from acm_service.utils.database.ids import new_id
+from acm_service.utils.database.session import create_session, UnitOfWork
+from acm_service.utils.env import REDIS_CACHE_INVALIDATION_IN_SECONDS, ERASE_CHUNK_SIZE, \
+    STATS_CACHE_INVALIDATION_IN_SECONDS, NEGATIVE_CACHE_TTL_IN_SECONDS, ACCOUNT_DELETION_LEASE_IN_SECONDS
+from acm_service.utils.pagination import CursorParams, CursorPage, paginate_by_keyset
 
 
-class AccountRepository(AbstractRepository):
+class AccountRepository(DatabaseRepository, AbstractRepository):
 
     @log_exception
     async def get(self, account_uuid: UUID) -> AccountWithoutAgents | None:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AccountDB).where(AccountDB.id == str(account_uuid)))
-                result = query.scalar()
-                if result:
-                    return AccountWithoutAgents.from_orm(result)
-                return None
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AccountDB).where(AccountDB.id == account_uuid))
+            result = query.scalar()
+            if result:
+                return AccountWithoutAgents.from_orm(result)
+            return None
 
     @log_exception
     async def get_by(self, **kwargs) -> List[AccountWithoutAgents]:
         if 'email' in kwargs.keys():
             return await self.get_account_by_email(kwargs['email'])
 
+        if 'emails' in kwargs.keys():
+            return await self.get_accounts_by_emails(kwargs['emails'])
+
         raise NotImplementedError
 
+    @staticmethod
+    def _filter(query: Select, region: RegionEnum | None, vip: bool | None) -> Select:
+        # served by the (region, vip, name) index, the region also prunes partitions on PostgreSQL
+        if region is not None:
+            query = query.where(AccountDB.region == region)
+        if vip is not None:
+            query = query.where(AccountDB.vip == vip)
+        return query
+
     @log_exception
-    async def get_all(self) -> List[AccountWithoutAgents]:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AccountDB).order_by(AccountDB.name))  # todo from ORM
-                return query.scalars().all()
+    async def get_all(self, region: RegionEnum | None = None, vip: bool | None = None) -> List[AccountWithoutAgents]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = self._filter(select(AccountDB).order_by(AccountDB.name), region, vip)
+            return (await session.execute(query)).scalars().all()
+
+    @log_exception
+    async def get_stats(self) -> List[RegionStats]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = select(AccountDB.region, AccountDB.vip, func.count().label('accounts')). \
+                group_by(AccountDB.region, AccountDB.vip).order_by(AccountDB.region, AccountDB.vip)
+            return [RegionStats(**row._asdict()) for row in (await session.execute(query)).all()]
+
+    @log_exception
+    async def get_page(self, params: CursorParams, region: RegionEnum | None = None,
+                       vip: bool | None = None) -> CursorPage[AccountWithoutAgents]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = self._filter(select(AccountDB).order_by(AccountDB.name, AccountDB.id), region, vip)
+            return await paginate_by_keyset(session, query, params, AccountWithoutAgents)
+
+    def stream(self, region: RegionEnum | None = None,
+               vip: bool | None = None) -> AsyncIterator[AccountWithoutAgents]:
+        return stream_rows(self._filter(select(AccountDB).order_by(AccountDB.id), region, vip), AccountWithoutAgents)
 
     @log_exception
     async def create(self, **kwargs) -> AccountWithoutAgents:
-        async with create_session() as session:
-            async with session.begin():
-                new_account = AccountDB(id=str(uuid4()), **kwargs)
-                session.add(new_account)
-                await session.commit()
-                return AccountWithoutAgents.from_orm(new_account)
+        async with self._unit_of_work.transaction() as session:
+            new_account = AccountDB(id=new_id(), **kwargs)
+            session.add(new_account)
+            await session.flush()
+            return AccountWithoutAgents.from_orm(new_account)
+
+    @log_exception
+    async def create_many(self, items: List[dict]) -> List[AccountWithoutAgents]:
+        now = utc_now()
+        rows = [dict(account, id=new_id(), created_at=now) for account in items]
+        if rows:
+            async with self._unit_of_work.transaction() as session:
+                rows = await insert_unless_conflicting(session, AccountDB, rows)
+        return [AccountWithoutAgents.parse_obj(row) for row in rows]
 
     @log_exception
     async def get_with_agents(self, account_uuid: UUID) -> Account | None:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AccountDB).where(AccountDB.id == str(account_uuid)).
-                                              options(selectinload(AccountDB.agents)))
-                result = query.scalar()
-                if result:
-                    return Account.from_orm(result)
-                return None
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AccountDB).where(AccountDB.id == account_uuid).
+                                          options(selectinload(AccountDB.agents)))
+            result = query.scalar()
+            if result:
+                return Account.from_orm(result)
+            return None
 
     @log_exception
     async def get_account_by_email(self, email: str) -> List[AccountWithoutAgents]:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AccountDB).where(AccountDB.email == email))
-                result = query.scalar()
-                if result:
-                    return [AccountWithoutAgents.from_orm(result)]
-                return []
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AccountDB).where(func.lower(AccountDB.email) == email.lower()))
+            result = query.scalar()
+            if result:
+                return [AccountWithoutAgents.from_orm(result)]
+            return []
 
     @log_exception
-    async def delete_all(self) -> None:
-        async with create_session() as session:
-            async with session.begin():
-                await session.execute(delete(AccountDB))
+    async def get_accounts_by_emails(self, emails: List[str]) -> List[AccountWithoutAgents]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AccountDB).where(
+                func.lower(AccountDB.email).in_([email.lower() for email in emails])))
+            return [AccountWithoutAgents.from_orm(account) for account in query.scalars()]
 
     @log_exception
-    async def delete(self, account_uuid: UUID) -> None:
+    async def erase(self) -> EraseResult:
+        """Removes all accounts, agents, deletion records and tombstones outside the unit of work.
+
+        PostgreSQL truncates the locked tables. Elsewhere rows are deleted in chunks, every chunk in its own
+        transaction, so the journal never has to hold the whole table.
+        """
+        tables = [AccountDeletionDB.__table__, TombstoneDB.__table__, AgentDB.__table__, AccountDB.__table__]
         async with create_session() as session:
-            async with session.begin():
-                request = select(AccountDB).where(AccountDB.id == str(account_uuid)).options(
-                    joinedload(AccountDB.agents))
-                account = await session.scalar(request)
-                await session.delete(account)
-                await session.commit()
+            if supports_truncate(session):
+                names = ', '.join(table.name for table in tables)
+                async with session.begin():
+                    await session.execute(text(f'LOCK TABLE {names} IN ACCESS EXCLUSIVE MODE'))
+                    rows_removed = {table.name: await session.scalar(select(func.count()).select_from(table))
+                                    for table in tables}
+                    await session.execute(text(f'TRUNCATE TABLE {names}'))
+                return EraseResult(method='truncate', rows_removed=rows_removed)
+
+        return EraseResult(method='delete',
+                           rows_removed={table.name: await self._delete_in_chunks(table) for table in tables})
+
+    @staticmethod
+    async def _delete_in_chunks(table: Table) -> int:
+        key = next(iter(table.primary_key.columns))
+        removed = 0
+        while True:
+            async with create_session() as session:
+                async with session.begin():
+                    chunk = select(key).limit(ERASE_CHUNK_SIZE).scalar_subquery()
+                    result = await session.execute(delete(table).where(key.in_(chunk)))
+            if result.rowcount == 0:
+                return removed
+            removed += result.rowcount
+
+    @log_exception
+    async def delete(self, account_uuid: UUID, region: RegionEnum | None = None) -> DeletedAccount | None:
+        account_columns = (AccountDB.id, AccountDB.name, AccountDB.email, AccountDB.region, AccountDB.vip)
+        async with self._unit_of_work.transaction() as session:
+            if supports_returning(session):
+                # agents go with ON DELETE CASCADE, the outer select still sees them in the statement snapshot
+                deleted = self._filter(delete(AccountDB), region, None).where(AccountDB.id == account_uuid). \
+                    returning(*account_columns).cte('deleted_account')
+                query = select(deleted, AgentDB.id.label('agent_id')). \
+                    outerjoin(AgentDB, and_(AgentDB.account_id == deleted.c.id, AgentDB.region == deleted.c.region))
+                rows = (await session.execute(query)).all()
+                if not rows:
+                    return None
+                deleted_account = DeletedAccount(**rows[0]._asdict(),
+                                                 agent_ids=[row.agent_id for row in rows if row.agent_id is not None])
+                await self._write_tombstones(session, deleted_account)
+                return deleted_account
+
+            account = (await session.execute(self._filter(select(*account_columns), region, None).
+                                             where(AccountDB.id == account_uuid))).one_or_none()
+            if account is None:
+                return None
+            agents = (AgentDB.account_id == account.id, AgentDB.region == account.region)
+            agent_ids = (await session.scalars(select(AgentDB.id).where(*agents))).all()
+            await session.execute(delete(AgentDB).where(*agents))
+            await session.execute(delete(AccountDB).where(AccountDB.id == account.id,
+                                                          AccountDB.region == account.region))
+            deleted_account = DeletedAccount(**account._asdict(), agent_ids=agent_ids)
+            await self._write_tombstones(session, deleted_account)
+            return deleted_account
+
+    @staticmethod
+    async def _write_tombstones(session: AsyncSession, account: DeletedAccount) -> None:
+        await write_tombstones(session, ChangeKindEnum.agent, account.agent_ids, account.id)
+        await write_tombstones(session, ChangeKindEnum.account, [account.id], account.id)
+
+    @log_exception
+    async def start_deletion(self, account: AccountWithoutAgents) -> AccountDeletion:
+        """Schedules the deletion of the account, a deletion scheduled by a concurrent request is returned instead."""
+        row = {'account_id': account.id, 'region': account.region, 'vip': account.vip,
+               'status': DeletionStatusEnum.pending.value, 'agents_deleted': 0}
+        async with self._unit_of_work.transaction() as session:
+            if await insert_unless_conflicting(session, AccountDeletionDB, [row]):
+                return AccountDeletion.parse_obj(row)
+        return await self.get_deletion(account.id, primary=True)
+
+    @log_exception
+    async def get_deletion(self, account_uuid: UUID, primary: bool = False) -> AccountDeletion | None:
+        async with self._unit_of_work.read_transaction(primary) as session:
+            deletion = await session.get(AccountDeletionDB, account_uuid, populate_existing=True)
+            return AccountDeletion.from_orm(deletion) if deletion else None
+
+    @log_exception
+    async def claim_deletion(self, account_uuid: UUID) -> bool:
+        """Marks a pending, failed or abandoned deletion as running, True only for the one caller that changed it.
+
+        A running deletion is abandoned when its job has not refreshed the heartbeat within the lease, e.g. because its
+        process died.
+        """
+        now = utc_now()
+        expired = now - timedelta(seconds=ACCOUNT_DELETION_LEASE_IN_SECONDS)
+        async with self._unit_of_work.transaction() as session:
+            claimable = [DeletionStatusEnum.pending.value, DeletionStatusEnum.failed.value]
+            abandoned = and_(AccountDeletionDB.status == DeletionStatusEnum.running.value,
+                             or_(AccountDeletionDB.heartbeat_at.is_(None), AccountDeletionDB.heartbeat_at < expired))
+            query = update(AccountDeletionDB). \
+                where(AccountDeletionDB.account_id == account_uuid,
+                      or_(AccountDeletionDB.status.in_(claimable), abandoned)). \
+                values(status=DeletionStatusEnum.running.value, heartbeat_at=now). \
+                execution_options(synchronize_session=False)
+            result = await session.execute(query)
+            return result.rowcount == 1
+
+    @log_exception
+    async def update_deletion(self, account_uuid: UUID, status: DeletionStatusEnum, agents_deleted: int = 0) -> None:
+        async with self._unit_of_work.transaction() as session:
+            query = update(AccountDeletionDB).where(AccountDeletionDB.account_id == account_uuid). \
+                values(status=status.value, agents_deleted=AccountDeletionDB.agents_deleted + agents_deleted,
+                       heartbeat_at=utc_now()). \
+                execution_options(synchronize_session=False)
+            await session.execute(query)
 
     @log_exception
     async def update(self, account_uuid: UUID, **kwargs) -> None:
-        async with create_session() as session:
-            async with session.begin():
-                query = update(AccountDB).where(AccountDB.id == str(account_uuid)).values(**kwargs). \
-                    execution_options(synchronize_session="fetch")
-                await session.execute(query)
-                await session.flush()
+        async with self._unit_of_work.transaction() as session:
+            query = update(AccountDB).where(AccountDB.id == account_uuid).values(**kwargs). \
+                execution_options(synchronize_session="fetch")
+            await session.execute(query)
+            await session.flush()
 
 
 class AccountCachedRepository(AbstractRepository):
+    """Write-through cache of accounts: set on create and update, marked absent on delete (with its agents).
+
+    An updated account is read back within the unit of work, i.e. from the primary, and the cache is changed only
+    once the unit of work is committed, so a rolled back write never reaches it. Misses are filled only if the
+    key is still not cached (SET NX): a row read from a lagging replica never replaces a write.
+    """
 
-    def __init__(self, cache: Cache = Cache.get_instance()):
-        self._account_repository = AccountRepository()
+    def __init__(self, unit_of_work: UnitOfWork | None = None, cache: Cache = Cache.get_instance()):
+        self._unit_of_work = unit_of_work or UnitOfWork()
+        self._account_repository = AccountRepository(self._unit_of_work)
         self._cache = cache
 
     async def update_cache(self, account: AccountWithoutAgents) -> None:
@@ -107,39 +270,113 @@ class AccountCachedRepository(AbstractRepository):
                               timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
         logger.debug(f'Putting Account {account.id} into cache')
 
-    async def get_from_cache(self, key: UUID) -> Account | None:
-        from_cache = await self._cache.get(Account.__name__, str(key))
-        if from_cache is None:
-            logger.debug('Cache miss')
-            return None
-        logger.debug('Cache hit')
-        return Account.parse_raw(from_cache)
+    async def mark_deleted(self, account_uuid: UUID, agent_uuids: List[UUID]) -> None:
+        # markers instead of a DEL, so a concurrent miss cannot fill a deleted row back in from a replica
+        expiration = timedelta(seconds=NEGATIVE_CACHE_TTL_IN_SECONDS)
+        await self._cache.set(Account.__name__, str(account_uuid), ABSENT, expiration)
+        await self._cache.set_many(Agent.__name__, {str(x): ABSENT for x in agent_uuids}, expiration)
+        await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, str(account_uuid),
+                                        expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        logger.debug(f'Marking Account {account_uuid} as deleted in cache')
+
+    async def evict(self, account_uuid: UUID, agent_uuids: List[UUID] | None = None) -> None:
+        await self._cache.delete(Account.__name__, str(account_uuid))
+        if agent_uuids is not None:
+            await self._cache.delete(Agent.__name__, *(str(x) for x in agent_uuids))
+            await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, str(account_uuid),
+                                            expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        logger.debug(f'Removing Account {account_uuid} from cache')
 
     async def get(self, account_uuid: UUID) -> AccountWithoutAgents | None:
-        from_cache = await self.get_from_cache(account_uuid)
-        if from_cache:
-            return from_cache
+        from_cache = await self._cache.get(Account.__name__, str(account_uuid))
+        if from_cache is not None:
+            return Account.parse_raw(from_cache) if from_cache != ABSENT else None
 
         result = await self._account_repository.get(account_uuid)
         if result:
-            await self.update_cache(result)
+            await self._cache.add(Account.__name__, str(account_uuid), result.json(),
+                                  timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        else:
+            await self._cache.set_absent(Account.__name__, str(account_uuid),
+                                         timedelta(seconds=NEGATIVE_CACHE_TTL_IN_SECONDS))
 
         return result
 
     async def get_by(self, **kwargs) -> List[AccountWithoutAgents]:
         return await self._account_repository.get_by(**kwargs)
 
-    async def get_all(self) -> List[AccountWithoutAgents]:
-        return await self._account_repository.get_all()
+    async def get_all(self, region: RegionEnum | None = None, vip: bool | None = None) -> List[AccountWithoutAgents]:
+        return await self._account_repository.get_all(region=region, vip=vip)
+
+    async def get_stats(self) -> List[RegionStats]:
+        from_cache = await self._cache.get(RegionStats.__name__, '*')
+        if from_cache:
+            return parse_raw_as(List[RegionStats], from_cache)
+
+        result = await self._account_repository.get_stats()
+        await self._cache.set(RegionStats.__name__, '*', json.dumps(result, default=pydantic_encoder),
+                              timedelta(seconds=STATS_CACHE_INVALIDATION_IN_SECONDS))
+        return result
+
+    async def get_page(self, params: CursorParams, region: RegionEnum | None = None,
+                       vip: bool | None = None) -> CursorPage[AccountWithoutAgents]:
+        return await self._account_repository.get_page(params, region=region, vip=vip)
+
+    def stream(self, region: RegionEnum | None = None,
+               vip: bool | None = None) -> AsyncIterator[AccountWithoutAgents]:
+        return self._account_repository.stream(region=region, vip=vip)
 
     async def create(self, **kwargs) -> AccountWithoutAgents:
-        return await self._account_repository.create(**kwargs)
+        result = await self._account_repository.create(**kwargs)
+        await self._unit_of_work.after_commit(lambda: self.update_cache(result))
+        return result
+
+    async def create_many(self, items: List[dict]) -> List[AccountWithoutAgents]:
+        result = await self._account_repository.create_many(items)
+        await self._unit_of_work.after_commit(lambda: self._cache.set_many(
+            Account.__name__, {str(account.id): account.json() for account in result},
+            timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS)))
+        return result
+
+    async def delete(self, reference, region: RegionEnum | None = None) -> DeletedAccount | None:
+        result = await self._account_repository.delete(reference, region)
+        if result:
+            await self._unit_of_work.after_commit(lambda: self.mark_deleted(reference, result.agent_ids),
+                                                  lambda: self.evict(reference, result.agent_ids))
+        return result
 
-    async def delete(self, reference) -> None:
-        await self._account_repository.delete(reference)
+    async def start_deletion(self, account: AccountWithoutAgents) -> AccountDeletion:
+        return await self._account_repository.start_deletion(account)
 
-    async def delete_all(self) -> None:
-        await self._account_repository.delete_all()
+    async def get_deletion(self, account_uuid: UUID, primary: bool = False) -> AccountDeletion | None:
+        return await self._account_repository.get_deletion(account_uuid, primary)
+
+    async def claim_deletion(self, account_uuid: UUID) -> bool:
+        return await self._account_repository.claim_deletion(account_uuid)
+
+    async def update_deletion(self, account_uuid: UUID, status: DeletionStatusEnum, agents_deleted: int = 0) -> None:
+        await self._account_repository.update_deletion(account_uuid, status, agents_deleted)
+
+    async def erase(self) -> EraseResult:
+        result = await self._account_repository.erase()
+        await self.evict_all()
+        return result
+
+    async def evict_all(self) -> None:
+        await self._cache.delete_namespace(Account.__name__)
+        await self._cache.delete_namespace(Agent.__name__)
+        await self._cache.delete_namespace(ACCOUNT_AGENTS)
 
     async def update(self, reference, **kwargs) -> None:
         await self._account_repository.update(reference, **kwargs)
+        # read back from the primary, the write is in the same unit of work
+        account = await self._account_repository.get(reference)
+
+        async def update_cache():
+            if account is None:
+                await self._cache.set(Account.__name__, str(reference), ABSENT,
+                                      timedelta(seconds=NEGATIVE_CACHE_TTL_IN_SECONDS))
+                return
+            await self.update_cache(account)
+
+        await self._unit_of_work.after_commit(update_cache, lambda: self.evict(reference))
@@ -1,17 +1,24 @@
 import logging
+from typing import List
 from uuid import UUID
 
-from fastapi import Depends
+from fastapi import Depends, BackgroundTasks
 from fastapi import APIRouter, status
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import paginate
+from pydantic import conlist
 
-from acm_service.accounts.schema import AccountWithoutAgents, Account, AccountCreate
-from acm_service.utils.http_exceptions import raise_not_found, raise_email_already_used
+from acm_service.accounts.schema import AccountWithoutAgents, Account, AccountCreate, RegionEnum, \
+    AccountCreateResult, AccountDeletion, DeletionStatusEnum, AccountStats, Stats
+from acm_service.accounts.deletion import run_account_deletion
+from acm_service.utils.http_exceptions import raise_not_found, raise_email_already_used, raise_invalid_cursor
 from acm_service.utils.dependencies import get_token_header, get_account_service
+from acm_service.utils.env import BULK_CREATE_LIMIT
+from acm_service.utils.export import to_ndjson, NDJSON_MEDIA_TYPE
 from acm_service.utils.logconf import DEFAULT_LOGGER
-from acm_service.utils.pagination import Page
+from acm_service.utils.pagination import Page, CursorPage, CursorParams
 from acm_service.accounts.service import AccountService
-from acm_service.utils.http_exceptions import DuplicatedMailException
+from acm_service.utils.http_exceptions import DuplicatedMailException, InvalidCursorException
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -21,13 +28,42 @@ router = APIRouter(
     dependencies=[Depends(get_token_header)]
 )
 
+stats_router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    dependencies=[Depends(get_token_header)]
+)
+
+
+@stats_router.get('', response_model=Stats)
+async def read_stats(account_service: AccountService = Depends(get_account_service)):
+    return await account_service.get_global_stats()
+
 
 @router.get('', response_model=Page[AccountWithoutAgents])
-async def read_accounts(account_service: AccountService = Depends(get_account_service)):
-    result = await account_service.get_all()
+async def read_accounts(region: RegionEnum | None = None, vip: bool | None = None,
+                        account_service: AccountService = Depends(get_account_service)):
+    result = await account_service.get_all(region=region, vip=vip)
     return paginate(result)
 
 
+@router.get('/cursor', response_model=CursorPage[AccountWithoutAgents])
+async def read_accounts_by_cursor(params: CursorParams = Depends(), region: RegionEnum | None = None,
+                                  vip: bool | None = None,
+                                  account_service: AccountService = Depends(get_account_service)):
+    try:
+        return await account_service.get_page(params, region=region, vip=vip)
+    except InvalidCursorException:
+        raise_invalid_cursor()
+
+
+@router.get('/export', response_class=StreamingResponse)
+async def export_accounts(region: RegionEnum | None = None, vip: bool | None = None,
+                          account_service: AccountService = Depends(get_account_service)):
+    return StreamingResponse(to_ndjson(account_service.export(region=region, vip=vip)),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.get('/{account_id}', response_model=AccountWithoutAgents)
 async def read_account(account_id: UUID, account_service: AccountService = Depends(get_account_service)):
     result = await account_service.get(account_id)
@@ -37,6 +73,15 @@ async def read_account(account_id: UUID, account_service: AccountService = Depen
     return result
 
 
+@router.get('/{account_id}/stats', response_model=AccountStats)
+async def read_account_stats(account_id: UUID, account_service: AccountService = Depends(get_account_service)):
+    result = await account_service.get_stats(account_id)
+    if result is None:
+        raise_not_found(f'Account {account_id} not found')
+
+    return result
+
+
 @router.post('/generate_company_report/{account_id}', response_model=Account)
 async def generate_company_report(account_id: UUID, account_service: AccountService = Depends(get_account_service)):
     result = await account_service.get_with_agents(account_id)
@@ -46,9 +91,27 @@ async def generate_company_report(account_id: UUID, account_service: AccountServ
     return result
 
 
-@router.delete('/{account_id}', status_code=status.HTTP_202_ACCEPTED)
-async def delete_account(account_id: UUID, account_service: AccountService = Depends(get_account_service)):
-    await account_service.delete(account_id)
+@router.get('/{account_id}/deletion', response_model=AccountDeletion)
+async def read_account_deletion(account_id: UUID, account_service: AccountService = Depends(get_account_service)):
+    result = await account_service.get_deletion(account_id)
+    if result is None:
+        raise_not_found(f'Deletion of account {account_id} not found')
+
+    return result
+
+
+@router.delete('/{account_id}', status_code=status.HTTP_202_ACCEPTED, response_model=AccountDeletion)
+async def delete_account(account_id: UUID, background_tasks: BackgroundTasks,
+                         account_service: AccountService = Depends(get_account_service)):
+    result = await account_service.schedule_delete(account_id)
+    if result is None:
+        raise_not_found(f'Account {account_id} not found')
+
+    # a failed deletion is resumed; repeated requests start no second job while one is running
+    if await account_service.claim_deletion(account_id):
+        background_tasks.add_task(run_account_deletion, account_id)
+        result.status = DeletionStatusEnum.running
+    return result
 
 
 @router.post('', response_model=AccountWithoutAgents)
@@ -62,3 +125,9 @@ async def create_account(account: AccountCreate,
 
     except DuplicatedMailException:
         raise_email_already_used()
+
+
+@router.post('/bulk', response_model=List[AccountCreateResult])
+async def create_accounts(accounts: conlist(AccountCreate, min_items=1, max_items=BULK_CREATE_LIMIT),
+                          account_service: AccountService = Depends(get_account_service)):
+    return await account_service.create_accounts(accounts)
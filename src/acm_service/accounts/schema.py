@@ -1,8 +1,10 @@
 from enum import Enum
+from typing import Dict
+from uuid import UUID
 
-from pydantic import BaseModel, EmailStr, UUID4
+from pydantic import BaseModel, EmailStr
 
-from acm_service.agents.schema import Agent
+from acm_service.agents.schema import Agent, AgentStats
 
 
 class RegionEnum(str, Enum):
@@ -11,6 +13,13 @@ class RegionEnum(str, Enum):
     apac = 'apac'
 
 
+class DeletionStatusEnum(str, Enum):
+    pending = 'pending'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
 class AccountBase(BaseModel):
     name: str
     email: EmailStr
@@ -23,7 +32,7 @@ class AccountCreate(AccountBase):
 
 
 class AccountWithoutAgents(AccountBase):
-    id: UUID4
+    id: UUID
 
     class Config:
         orm_mode = True
@@ -33,4 +42,46 @@ class Account(AccountWithoutAgents):
     agents: list[Agent] = []
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class DeletedAccount(AccountWithoutAgents):
+    agent_ids: list[UUID] = []
+
+
+class AccountDeletion(BaseModel):
+    account_id: UUID
+    region: RegionEnum
+    vip: bool
+    status: DeletionStatusEnum
+    agents_deleted: int = 0
+
+    class Config:
+        orm_mode = True
+
+
+class AccountStats(AgentStats):
+    account_id: UUID
+
+
+class RegionStats(BaseModel):
+    region: RegionEnum
+    vip: bool
+    accounts: int
+
+
+class Stats(AgentStats):
+    accounts: int = 0
+    accounts_by_region: list[RegionStats] = []
+
+
+class EraseResult(BaseModel):
+    method: str
+    rows_removed: Dict[str, int]
+    duration_ms: float = 0
+
+
+class AccountCreateResult(BaseModel):
+    email: EmailStr
+    account: AccountWithoutAgents | None = None
+    error: str | None = None
@@ -1,12 +1,17 @@
 import logging
-from typing import List
+import time
+from typing import List, AsyncIterator
 from uuid import UUID
 
 from acm_service.utils.logconf import DEFAULT_LOGGER
 from acm_service.utils.database.repository import AbstractRepository
+from acm_service.utils.database.session import UnitOfWork
 from acm_service.utils.events.producer import EventProducer
-from acm_service.accounts.schema import AccountWithoutAgents, Account
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.accounts.schema import AccountWithoutAgents, Account, RegionEnum, AccountCreate, \
+    AccountCreateResult, AccountDeletion, DeletionStatusEnum, EraseResult, AccountStats, Stats
+from acm_service.utils.env import ACCOUNT_DELETION_CHUNK_SIZE
+from acm_service.utils.pagination import CursorParams, CursorPage
+from acm_service.utils.http_exceptions import DuplicatedMailException, EMAIL_ALREADY_USED
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -15,13 +20,22 @@ class AccountService:
 
     def __init__(self, agents: AbstractRepository,
                  accounts: AbstractRepository,
-                 event_producer: EventProducer):
+                 event_producer: EventProducer,
+                 unit_of_work: UnitOfWork | None = None):
         self._agents = agents
         self._accounts = accounts
         self._producer = event_producer
+        self._unit_of_work = unit_of_work or UnitOfWork()
 
-    async def get_all(self) -> List[AccountWithoutAgents]:
-        return await self._accounts.get_all()
+    async def get_all(self, region: RegionEnum | None = None, vip: bool | None = None) -> List[AccountWithoutAgents]:
+        return await self._accounts.get_all(region=region, vip=vip)
+
+    async def get_page(self, params: CursorParams, region: RegionEnum | None = None,
+                       vip: bool | None = None) -> CursorPage[AccountWithoutAgents]:
+        return await self._accounts.get_page(params, region=region, vip=vip)
+
+    def export(self, region: RegionEnum | None = None, vip: bool | None = None) -> AsyncIterator[AccountWithoutAgents]:
+        return self._accounts.stream(region=region, vip=vip)
 
     async def get(self, account_id: UUID) -> AccountWithoutAgents | None:
         return await self._accounts.get(account_id)
@@ -29,37 +43,129 @@ class AccountService:
     async def get_with_agents(self, account_id: UUID) -> Account | None:
         account = await self.get(account_id)
         if account:
-            agents = await self._agents.get_by(account_id=account_id)
+            agents = await self._agents.get_by(account_id=account_id, region=account.region)
             result = Account.parse_obj(account.dict())
             result.agents = agents
             return result
 
         return None
 
-    async def delete(self, account_id: UUID) -> None:
+    async def get_stats(self, account_id: UUID) -> AccountStats | None:
+        account = await self.get(account_id)
+        if account is None:
+            return None
+        agents = await self._agents.get_stats(account_id=account_id, region=account.region)
+        return AccountStats(account_id=account_id, **agents.dict())
+
+    async def get_global_stats(self) -> Stats:
+        accounts_by_region = await self._accounts.get_stats()
+        agents = await self._agents.get_stats()
+        return Stats(accounts=sum(x.accounts for x in accounts_by_region), accounts_by_region=accounts_by_region,
+                     **agents.dict())
+
+    async def schedule_delete(self, account_id: UUID) -> AccountDeletion | None:
+        # from the primary, a deletion scheduled by a concurrent request may not be on the replica yet
+        deletion = await self._accounts.get_deletion(account_id, primary=True)
+        if deletion is not None:
+            return deletion
+
         account = await self.get(account_id)
         if account is None:
-            raise InconsistencyException()
-        agents = await self._agents.get_by(account_id=account_id)
+            return None
 
-        await self._accounts.delete(account_id)
-        await self._producer.delete_account(region=account.region, account_uuid=account_id, vip=account.vip)
-        for agent in agents:
-            await self._producer.delete_agent(region=account.region, agent_uuid=agent.id)
-        logger.info(f'Account {account_id} was deleted')
+        deletion = await self._accounts.start_deletion(account)
+        await self._unit_of_work.commit()
+        logger.info(f'Deletion of account {account_id} was scheduled')
+        return deletion
+
+    async def claim_deletion(self, account_id: UUID) -> bool:
+        """Claims a pending, failed or abandoned deletion for one job, False when another job runs or ran it."""
+        claimed = await self._accounts.claim_deletion(account_id)
+        await self._unit_of_work.commit()
+        return claimed
+
+    async def delete_chunk(self, account_id: UUID) -> bool:
+        """Deletes the next chunk of agents of an account scheduled for deletion and, once none is left, the account.
+
+        Returns True when the account is gone.
+        """
+        # from the primary, the deletion may have been scheduled too recently to be on the replica
+        deletion = await self._accounts.get_deletion(account_id, primary=True)
+        if deletion is None:
+            # erased meanwhile, nothing is left to delete
+            logger.info(f'Deletion of account {account_id} is gone, stopping')
+            return True
+
+        agent_ids = await self._agents.delete_chunk(account_id, ACCOUNT_DELETION_CHUNK_SIZE, deletion.region)
+        finished = len(agent_ids) == 0
+        if finished:
+            deleted = await self._accounts.delete(account_id, deletion.region)
+            agent_ids = deleted.agent_ids if deleted else []
+
+        status = DeletionStatusEnum.done if finished else DeletionStatusEnum.running
+        await self._accounts.update_deletion(account_id, status, len(agent_ids))
+        await self._unit_of_work.commit()
+
+        if agent_ids:
+            await self._producer.delete_agents(region=deletion.region, agent_uuids=agent_ids)
+        if finished:
+            await self._producer.delete_account(region=deletion.region, account_uuid=account_id, vip=deletion.vip)
+            logger.info(f'Account {account_id} was deleted')
+        return finished
+
+    async def fail_deletion(self, account_id: UUID) -> None:
+        await self._accounts.update_deletion(account_id, DeletionStatusEnum.failed)
+        await self._unit_of_work.commit()
+
+    async def get_deletion(self, account_id: UUID) -> AccountDeletion | None:
+        return await self._accounts.get_deletion(account_id)
 
     async def create_account(self, name: str, email: str, region: str, vip: bool) -> AccountWithoutAgents:
         if await self.get_account_by_email(email):
             raise DuplicatedMailException()
 
         result = await self._accounts.create(name=name, email=email, region=region, vip=vip)
+        await self._unit_of_work.commit()
         logger.info(f'Account {result.id} was created')
 
         await self._producer.create_account(region=result.region, account_uuid=result.id, vip=vip)
         return result
 
-    async def delete_all(self) -> None:
-        await self._accounts.delete_all()
+    async def create_accounts(self, accounts: List[AccountCreate]) -> List[AccountCreateResult]:
+        used_emails = {account.email.lower()
+                       for account in await self._accounts.get_by(emails=[x.email for x in accounts])}
+
+        results = []
+        to_create = []
+        for account in accounts:
+            if account.email.lower() in used_emails:
+                results.append(AccountCreateResult(email=account.email, error=EMAIL_ALREADY_USED))
+                continue
+            used_emails.add(account.email.lower())
+            results.append(AccountCreateResult(email=account.email))
+            to_create.append(account.dict())
+
+        created = {account.email: account for account in await self._accounts.create_many(to_create)}
+        await self._unit_of_work.commit()
+        logger.info(f'{len(created)} accounts were created')
+
+        for result in results:
+            if result.error is None and result.email not in created:
+                # taken by a concurrent request after the check
+                result.error = EMAIL_ALREADY_USED
+            elif result.error is None:
+                result.account = created[result.email]
+        if created:
+            await self._producer.create_accounts(list(created.values()))
+        return results
+
+    async def erase(self) -> EraseResult:
+        started = time.perf_counter()
+        result = await self._accounts.erase()
+        result.duration_ms = (time.perf_counter() - started) * 1000
+        logger.info(f'Database erased with {result.method} in {result.duration_ms:.0f} ms, '
+                    f'rows removed: {result.rows_removed}')
+        return result
 
     async def get_account_by_email(self, email: str) -> AccountWithoutAgents | None:
         result = await self._accounts.get_by(email=email)
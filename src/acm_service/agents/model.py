@@ -1,14 +1,31 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey
+from sqlalchemy import Column, String, Boolean, ForeignKey, Index, DateTime, func, PrimaryKeyConstraint, \
+    UniqueConstraint
 
 from acm_service.utils.database.session import Base
+from acm_service.utils.database.repository import DatabaseNow, utc_now
+from acm_service.utils.database.types import UUIDType
 
 
 class Agent(Base):
     __tablename__ = 'agents'
+    # partitioned by region on PostgreSQL (migration b74d84bc7ca9) the region joins the primary key and the foreign
+    # key, e-mails are unique through the agent_emails table instead
+    __table_args__ = (PrimaryKeyConstraint('id', name='agents_pkey'),
+                      UniqueConstraint('email', name='agents_email_key'),
+                      Index('ix_agents_account_id_name', 'account_id', 'name'),
+                      Index('ix_agents_updated_at_id', 'updated_at', 'id'))
 
-    id = Column(String, primary_key=True, index=True)
-    email = Column(String, unique=True)
+    id = Column(UUIDType, index=True)
+    email = Column(String)
     name = Column(String, index=False)
     blocked = Column(Boolean, default=False, nullable=False)
+    # copy of the account's region, the partition key of agents on PostgreSQL
+    region = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utc_now)
+    # stamped by the database as the row is written, the change feed pages by it
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=DatabaseNow(), onupdate=DatabaseNow())
 
-    account_id = Column(String, ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False)
\ No newline at end of file
+    account_id = Column(UUIDType, ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False)
+
+
+Index('ix_agents_lower_email', func.lower(Agent.email))
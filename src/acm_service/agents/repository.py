@@ -1,101 +1,231 @@
+import json
 from datetime import timedelta
-from typing import List
-from uuid import UUID, uuid4
+from typing import List, AsyncIterator, Dict, Iterable, Tuple
+from uuid import UUID
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, update, func, literal, and_
 from sqlalchemy.future import select
+from pydantic import parse_raw_as
+from pydantic.json import pydantic_encoder
 
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.accounts.schema import RegionEnum
 from acm_service.agents.model import Agent as AgentDB
-from acm_service.agents.schema import Agent
-from acm_service.utils.cache.repositories import Cache, logger
-from acm_service.utils.database.repository import AbstractRepository, log_exception
-from acm_service.utils.database.session import create_session
-from acm_service.utils.env import REDIS_CACHE_INVALIDATION_IN_SECONDS
+from acm_service.agents.schema import Agent, AgentStats
+from acm_service.changes.repository import write_tombstones, tombstones_of
+from acm_service.changes.schema import ChangeKindEnum
+from acm_service.utils.cache.repositories import Cache, ABSENT, logger
+from acm_service.utils.database.repository import AbstractRepository, DatabaseRepository, log_exception, \
+    insert_unless_conflicting, stream_rows, supports_returning, utc_now
+from acm_service.utils.database.ids import new_id
+from acm_service.utils.database.session import UnitOfWork, HAS_READ_REPLICA
+from acm_service.utils.env import REDIS_CACHE_INVALIDATION_IN_SECONDS, STATS_CACHE_INVALIDATION_IN_SECONDS, \
+    NEGATIVE_CACHE_TTL_IN_SECONDS
+from acm_service.utils.pagination import CursorParams, CursorPage, paginate_by_keyset
 
+ACCOUNT_AGENTS = 'AccountAgents'
+ACCOUNT_AGENTS_VERSION = 'AccountAgentsVersion'
 
-class AgentRepository(AbstractRepository):
+
+class AgentRepository(DatabaseRepository, AbstractRepository):
+
+    @staticmethod
+    def _in_region(query, region: RegionEnum | None):
+        # agents can be partitioned by region on PostgreSQL, the predicate lets the planner skip other partitions
+        return query.where(AgentDB.region == region) if region is not None else query
 
     @log_exception
     async def get(self, agent_uuid: UUID) -> Agent | None:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AgentDB).where(AgentDB.id == str(agent_uuid)))
-                result = query.scalar()
-                if result:
-                    return Agent.from_orm(result)
-                return None
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AgentDB).where(AgentDB.id == agent_uuid))
+            result = query.scalar()
+            if result:
+                return Agent.from_orm(result)
+            return None
 
     @log_exception
     async def get_all(self):
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AgentDB).order_by(AgentDB.name))
-                return query.scalars().all()
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AgentDB).order_by(AgentDB.name))
+            return query.scalars().all()
+
+    @log_exception
+    async def get_stats(self, account_id: UUID | None = None, region: RegionEnum | None = None) -> AgentStats:
+        async with self._unit_of_work.read_transaction() as session:
+            query = self._in_region(select(AgentDB.blocked, func.count()).group_by(AgentDB.blocked), region)
+            if account_id is not None:
+                query = query.where(AgentDB.account_id == account_id)
+            counts = dict((await session.execute(query)).all())
+            return AgentStats(agents=sum(counts.values()), blocked_agents=counts.get(True, 0))
+
+    @log_exception
+    async def get_page(self, params: CursorParams, account_id: UUID | None = None,
+                       region: RegionEnum | None = None) -> CursorPage[Agent]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = self._in_region(select(AgentDB).order_by(AgentDB.name, AgentDB.id), region)
+            if account_id:
+                query = query.where(AgentDB.account_id == account_id)
+            return await paginate_by_keyset(session, query, params, Agent)
+
+    def stream(self, region: RegionEnum | None = None, vip: bool | None = None) -> AsyncIterator[Agent]:
+        query = self._in_region(select(AgentDB).order_by(AgentDB.id), region)
+        if vip is not None:
+            query = query.join(AccountDB, AccountDB.id == AgentDB.account_id).where(AccountDB.vip == vip)
+        return stream_rows(query, Agent)
 
     @log_exception
     async def create(self, **kwargs) -> Agent:
-        async with create_session() as session:
-            async with session.begin():
-                new_agent = AgentDB(id=str(uuid4()), **kwargs)
-                session.add(new_agent)
-                await session.commit()
-                return Agent.from_orm(new_agent)
+        async with self._unit_of_work.transaction() as session:
+            # the region is copied from the account in the INSERT itself, on the primary
+            region = select(AccountDB.region).where(AccountDB.id == kwargs['account_id']).scalar_subquery()
+            new_agent = AgentDB(id=new_id(), region=region, **kwargs)
+            session.add(new_agent)
+            await session.flush()
+            return Agent.from_orm(new_agent)
+
+    @log_exception
+    async def create_many(self, items: List[dict]) -> List[Agent]:
+        now = utc_now()
+        rows = [dict(agent, id=new_id(), created_at=now) for agent in items]
+        if rows:
+            async with self._unit_of_work.transaction() as session:
+                rows = await insert_unless_conflicting(session, AgentDB, rows)
+        return [Agent.parse_obj(row) for row in rows]
 
     @log_exception
     async def get_by(self, **kwargs) -> List[Agent]:
         if 'email' in kwargs.keys():
             return await self.get_agent_by_email(kwargs['email'])
 
+        if 'emails' in kwargs.keys():
+            return await self.get_agents_by_emails(kwargs['emails'])
+
+        if 'ids' in kwargs.keys():
+            return await self.get_agents_by_ids(kwargs['ids'])
+
         if 'account_id' in kwargs.keys():
-            return await self.get_agents_for_account(kwargs['account_id'])
+            return await self.get_agents_for_account(kwargs['account_id'], kwargs.get('region'))
 
         raise NotImplementedError
 
     @log_exception
     async def get_agent_by_email(self, email: str) -> List[Agent]:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AgentDB).where(AgentDB.email == email))
-                result = query.scalar()
-                if result:
-                    return [Agent.from_orm(result)]
-                return []
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AgentDB).where(func.lower(AgentDB.email) == email.lower()))
+            result = query.scalar()
+            if result:
+                return [Agent.from_orm(result)]
+            return []
 
     @log_exception
-    async def get_agents_for_account(self, agent_uuid: UUID) -> List[Agent]:
-        async with create_session() as session:
-            async with session.begin():
-                query = await session.execute(select(AgentDB).where(AgentDB.account_id == str(agent_uuid))
-                                              .order_by(AgentDB.name))
-                return query.scalars().all()
+    async def get_agents_by_emails(self, emails: List[str]) -> List[Agent]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AgentDB).where(
+                func.lower(AgentDB.email).in_([email.lower() for email in emails])))
+            return [Agent.from_orm(agent) for agent in query.scalars()]
 
     @log_exception
-    async def delete(self, agent_uuid: UUID) -> None:
-        async with create_session() as session:
-            async with session.begin():
-                await session.execute(delete(AgentDB).where(AgentDB.id == str(agent_uuid)))
-                await session.commit()
+    async def get_agents_by_ids(self, agent_uuids: List[UUID]) -> List[Agent]:
+        async with self._unit_of_work.read_transaction() as session:
+            query = await session.execute(select(AgentDB).where(AgentDB.id.in_(agent_uuids)))
+            return [Agent.from_orm(agent) for agent in query.scalars()]
 
     @log_exception
-    async def delete_all(self) -> None:
-        async with create_session() as session:
-            async with session.begin():
-                await session.execute(delete(AgentDB))
+    async def get_agents_for_account(self, agent_uuid: UUID, region: RegionEnum | None = None,
+                                     primary: bool = False) -> List[Agent]:
+        async with self._unit_of_work.read_transaction(primary) as session:
+            query = self._in_region(select(AgentDB), region).where(AgentDB.account_id == agent_uuid). \
+                order_by(AgentDB.name)
+            query = await session.execute(query)
+            return query.scalars().all()
 
     @log_exception
-    async def update(self, agent_uuid: UUID, **kwargs) -> None:
-        async with create_session() as session:
-            async with session.begin():
-                query = update(AgentDB).where(AgentDB.id == str(agent_uuid)).values(**kwargs). \
-                    execution_options(synchronize_session="fetch")
-                await session.execute(query)
-                await session.flush()
+    async def delete(self, agent_uuid: UUID, region: RegionEnum | None = None) -> None:
+        async with self._unit_of_work.transaction() as session:
+            await session.execute(tombstones_of(self._in_region(self._tombstone_columns(), region).
+                                                where(AgentDB.id == agent_uuid)))
+            await session.execute(self._in_region(delete(AgentDB), region).where(AgentDB.id == agent_uuid))
+
+    @staticmethod
+    def _tombstone_columns():
+        return select(literal(ChangeKindEnum.agent.value), AgentDB.id, AgentDB.account_id)
+
+    @staticmethod
+    async def _update_returning(session, condition, **values) -> List[dict]:
+        """Updates the agents matching the condition and returns their rows as written, in one statement where the
+        database supports RETURNING."""
+        if supports_returning(session):
+            query = update(AgentDB).where(condition).values(**values).returning(*AgentDB.__table__.columns). \
+                execution_options(synchronize_session=False)
+            return [dict(row) for row in (await session.execute(query)).mappings()]
+
+        query = select(*AgentDB.__table__.columns).where(condition)
+        rows = [dict(row) for row in (await session.execute(query)).mappings()]
+        if rows:
+            # a concurrent request may have changed the agents since the select, only one of them publishes
+            query = update(AgentDB).where(AgentDB.id.in_([row['id'] for row in rows]), condition).values(**values). \
+                execution_options(synchronize_session=False)
+            if (await session.execute(query)).rowcount == 0:
+                return []
+        return [dict(row, **values) for row in rows]
+
+    @log_exception
+    async def update(self, agent_uuid: UUID, **kwargs) -> Agent | None:
+        """Returns the agent as written or None when there was no agent to change."""
+        async with self._unit_of_work.transaction() as session:
+            rows = await self._update_returning(session, AgentDB.id == agent_uuid, **kwargs)
+            return Agent.parse_obj(rows[0]) if rows else None
+
+    @log_exception
+    async def block(self, agent_uuids: List[UUID], blocked: bool) -> List[Tuple[Agent, RegionEnum]]:
+        """Returns the changed agents as written, with the regions of their accounts."""
+        async with self._unit_of_work.transaction() as session:
+            rows = await self._update_returning(session, and_(AgentDB.id.in_(agent_uuids), AgentDB.blocked != blocked),
+                                                blocked=blocked)
+            return [(Agent.parse_obj(row), RegionEnum(row['region'])) for row in rows]
+
+    async def set_blocked(self, agent_uuid: UUID, blocked: bool) -> RegionEnum | None:
+        """Returns the region of the agent's account or None when there was no agent to change."""
+        changed = await self.block([agent_uuid], blocked)
+        return changed[0][1] if changed else None
+
+    async def set_blocked_many(self, agent_uuids: List[UUID], blocked: bool) -> Dict[UUID, RegionEnum]:
+        """Returns the changed agents with the regions of their accounts."""
+        return {agent.id: region for agent, region in await self.block(agent_uuids, blocked)}
+
+    @log_exception
+    async def delete_chunk(self, account_uuid: UUID, limit: int, region: RegionEnum | None = None) -> List[UUID]:
+        """Deletes up to `limit` agents of the account and returns their IDs."""
+        chunk = self._in_region(select(AgentDB.id), region).where(AgentDB.account_id == account_uuid).limit(limit)
+        async with self._unit_of_work.transaction() as session:
+            if supports_returning(session):
+                query = self._in_region(delete(AgentDB), region).where(AgentDB.id.in_(chunk.scalar_subquery())). \
+                    returning(AgentDB.id).execution_options(synchronize_session=False)
+                ids = (await session.scalars(query)).all()
+            else:
+                ids = (await session.scalars(chunk)).all()
+                if ids:
+                    await session.execute(self._in_region(delete(AgentDB), region).where(AgentDB.id.in_(ids)).
+                                          execution_options(synchronize_session=False))
+
+            await write_tombstones(session, ChangeKindEnum.agent, ids, account_uuid)
+
+            return ids
 
 
 class AgentCachedRepository(AbstractRepository):
+    """Write-through cache of agents: set on create, update and (un)blocking, marked absent on delete.
+
+    A written agent is cached as returned by the write itself (RETURNING), and the cache is changed only once the
+    unit of work is committed, so a rolled back write never reaches it. Misses are filled only if the key is still
+    not cached (SET NX): a row read from a lagging replica never replaces a write.
+    Agent lists of an account are cached under the account's version counter, which every change of its agents
+    bumps, so the lists are never searched for or deleted.
+    """
 
-    def __init__(self, cache: Cache = Cache.get_instance()):
-        self._agent_repository = AgentRepository()
+    def __init__(self, unit_of_work: UnitOfWork | None = None, cache: Cache = Cache.get_instance()):
+        self._unit_of_work = unit_of_work or UnitOfWork()
+        self._agent_repository = AgentRepository(self._unit_of_work)
         self._cache = cache
 
     async def update_cache(self, agent: Agent) -> None:
@@ -103,39 +233,154 @@ class AgentCachedRepository(AbstractRepository):
                               timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
         logger.debug(f'Putting Agent {agent.id} into cache')
 
+    async def refresh(self, agents: List[Agent], account_uuids: Iterable[UUID] = ()) -> None:
+        await self._cache.set_many(Agent.__name__, {str(agent.id): agent.json() for agent in agents},
+                                   timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, *{str(x) for x in account_uuids},
+                                        expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        logger.debug(f'Refreshing {len(agents)} Agents in cache')
+
+    async def mark_deleted(self, agent_uuids: List[UUID], account_uuids: Iterable[UUID] = ()) -> None:
+        # a marker instead of a DEL, so a concurrent miss cannot fill the deleted agent back in from a replica
+        await self._cache.set_many(Agent.__name__, {str(x): ABSENT for x in agent_uuids},
+                                   timedelta(seconds=NEGATIVE_CACHE_TTL_IN_SECONDS))
+        await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, *{str(x) for x in account_uuids},
+                                        expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        logger.debug(f'Marking {len(agent_uuids)} Agents as deleted in cache')
+
+    async def evict(self, agent_uuids: List[UUID], account_uuids: Iterable[UUID] = ()) -> None:
+        await self._cache.delete(Agent.__name__, *(str(x) for x in agent_uuids))
+        await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, *{str(x) for x in account_uuids},
+                                        expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        logger.debug(f'Removing {len(agent_uuids)} Agents from cache')
+
+    async def _after_write(self, agents: List[Agent], account_uuids: Iterable[UUID] = ()) -> None:
+        """Caches the agents as returned by the write once committed; evicting them is the fallback."""
+        accounts = {*account_uuids, *(agent.account_id for agent in agents)}
+        await self._unit_of_work.after_commit(lambda: self.refresh(agents, accounts),
+                                              lambda: self.evict([agent.id for agent in agents], accounts))
+
+    async def get_agents_for_account(self, account_uuid: UUID, region: RegionEnum | None = None) -> List[Agent]:
+        version = await self._cache.get_version(ACCOUNT_AGENTS_VERSION, str(account_uuid))
+        from_cache = await self._cache.get_versioned(ACCOUNT_AGENTS, str(account_uuid), version)
+        if from_cache is not None:
+            return parse_raw_as(List[Agent], from_cache)
+
+        # from the primary when there is a replica: a list read from a lagging replica would be stored under the
+        # version bumped meanwhile
+        result = [Agent.from_orm(agent) for agent in
+                  await self._agent_repository.get_agents_for_account(account_uuid, region, primary=HAS_READ_REPLICA)]
+        await self._cache.set_versioned(ACCOUNT_AGENTS, str(account_uuid), version,
+                                        json.dumps(result, default=pydantic_encoder), ACCOUNT_AGENTS_VERSION,
+                                        timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        return result
+
     async def get_from_cache(self, key: UUID) -> Agent | None:
         from_cache = await self._cache.get(Agent.__name__, str(key))
-        if from_cache is None:
+        if from_cache is None or from_cache == ABSENT:
             logger.debug('Cache miss')
             return None
         logger.debug('Cache hit')
         return Agent.parse_raw(from_cache)
 
     async def get(self, agent_uuid: UUID) -> Agent | None:
-        from_cache = await self.get_from_cache(agent_uuid)
-        if from_cache:
-            return from_cache
+        from_cache = await self._cache.get(Agent.__name__, str(agent_uuid))
+        if from_cache is not None:
+            return Agent.parse_raw(from_cache) if from_cache != ABSENT else None
 
         result = await self._agent_repository.get(agent_uuid)
         if result:
-            await self.update_cache(result)
+            await self._cache.add(Agent.__name__, str(agent_uuid), result.json(),
+                                  timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+        else:
+            await self._cache.set_absent(Agent.__name__, str(agent_uuid),
+                                         timedelta(seconds=NEGATIVE_CACHE_TTL_IN_SECONDS))
 
         return result
 
     async def get_by(self, **kwargs) -> List[Agent]:
+        if 'account_id' in kwargs:
+            return await self.get_agents_for_account(kwargs['account_id'], kwargs.get('region'))
         return await self._agent_repository.get_by(**kwargs)
 
     async def get_all(self) -> List[Agent]:
         return await self._agent_repository.get_all()
 
+    async def get_stats(self, account_id: UUID | None = None, region: RegionEnum | None = None) -> AgentStats:
+        key = str(account_id) if account_id else '*'
+        from_cache = await self._cache.get(AgentStats.__name__, key)
+        if from_cache:
+            return AgentStats.parse_raw(from_cache)
+
+        result = await self._agent_repository.get_stats(account_id, region)
+        await self._cache.set(AgentStats.__name__, key, result.json(),
+                              timedelta(seconds=STATS_CACHE_INVALIDATION_IN_SECONDS))
+        return result
+
+    async def get_page(self, params: CursorParams, account_id: UUID | None = None,
+                       region: RegionEnum | None = None) -> CursorPage[Agent]:
+        return await self._agent_repository.get_page(params, account_id=account_id, region=region)
+
+    def stream(self, region: RegionEnum | None = None, vip: bool | None = None) -> AsyncIterator[Agent]:
+        return self._agent_repository.stream(region=region, vip=vip)
+
     async def create(self, **kwargs) -> Agent:
-        return await self._agent_repository.create(**kwargs)
+        result = await self._agent_repository.create(**kwargs)
 
-    async def delete(self, reference) -> None:
-        await self._agent_repository.delete(reference)
+        async def update_cache():
+            await self.update_cache(result)
+            await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, str(result.account_id),
+                                            expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+
+        await self._unit_of_work.after_commit(update_cache)
+        return result
+
+    async def create_many(self, items: List[dict]) -> List[Agent]:
+        result = await self._agent_repository.create_many(items)
+
+        async def update_cache():
+            await self._cache.set_many(Agent.__name__, {str(agent.id): agent.json() for agent in result},
+                                       timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+            await self._cache.bump_versions(ACCOUNT_AGENTS_VERSION, *{str(agent.account_id) for agent in result},
+                                            expiration=timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS))
+
+        await self._unit_of_work.after_commit(update_cache)
+        return result
 
-    async def delete_all(self) -> None:
-        await self._agent_repository.delete_all()
+    async def _accounts_of(self, agent_uuid: UUID) -> List[UUID]:
+        # the agent has usually just been read by the caller, so it comes from the cache; a miss is not cached as
+        # the read can follow an uncommitted write
+        agent = await self.get_from_cache(agent_uuid) or await self._agent_repository.get(agent_uuid)
+        return [agent.account_id] if agent else []
 
-    async def update(self, reference, **kwargs) -> None:
-        await self._agent_repository.update(reference, **kwargs)
+    async def delete(self, reference, region: RegionEnum | None = None) -> None:
+        accounts = await self._accounts_of(reference)
+        await self._agent_repository.delete(reference, region)
+        await self._unit_of_work.after_commit(lambda: self.mark_deleted([reference], accounts),
+                                              lambda: self.evict([reference], accounts))
+
+    async def update(self, reference, **kwargs) -> Agent | None:
+        accounts = await self._accounts_of(reference)
+        result = await self._agent_repository.update(reference, **kwargs)
+        if result is not None:
+            await self._after_write([result], accounts)
+        return result
+
+    async def set_blocked(self, agent_uuid: UUID, blocked: bool) -> RegionEnum | None:
+        changed = await self._agent_repository.block([agent_uuid], blocked)
+        if changed:
+            await self._after_write([agent for agent, _ in changed])
+        return changed[0][1] if changed else None
+
+    async def set_blocked_many(self, agent_uuids: List[UUID], blocked: bool) -> Dict[UUID, RegionEnum]:
+        changed = await self._agent_repository.block(agent_uuids, blocked)
+        if changed:
+            await self._after_write([agent for agent, _ in changed])
+        return {agent.id: region for agent, region in changed}
+
+    async def delete_chunk(self, account_uuid: UUID, limit: int, region: RegionEnum | None = None) -> List[UUID]:
+        result = await self._agent_repository.delete_chunk(account_uuid, limit, region)
+        if result:
+            await self._unit_of_work.after_commit(lambda: self.mark_deleted(result, [account_uuid]),
+                                                  lambda: self.evict(result, [account_uuid]))
+        return result
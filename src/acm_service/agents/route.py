@@ -1,17 +1,25 @@
 import logging
+from typing import List
 from uuid import UUID
 
 from fastapi import Depends
 from fastapi import APIRouter, status
+from fastapi.responses import StreamingResponse
 from fastapi_pagination import paginate
+from pydantic import conlist
 
-from acm_service.agents.schema import AgentCreate, Agent
-from acm_service.utils.http_exceptions import raise_not_found, raise_email_already_used, raise_bad_request
+from acm_service.accounts.schema import RegionEnum
+from acm_service.agents.schema import AgentCreate, Agent, AgentCreateResult, AgentsBlockResult
+from acm_service.utils.http_exceptions import raise_not_found, raise_email_already_used, raise_bad_request, \
+    raise_account_being_deleted, raise_invalid_cursor
 from acm_service.utils.dependencies import get_token_header, get_agent_service
+from acm_service.utils.env import BULK_CREATE_LIMIT, BULK_BLOCK_LIMIT
+from acm_service.utils.export import to_ndjson, NDJSON_MEDIA_TYPE
 from acm_service.utils.logconf import DEFAULT_LOGGER
-from acm_service.utils.pagination import Page
+from acm_service.utils.pagination import Page, CursorPage, CursorParams
 from acm_service.agents.service import AgentService
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException, \
+    AccountBeingDeletedException, InvalidCursorException
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -21,6 +29,31 @@ router = APIRouter(
 )
 
 
+@router.get('/accounts/{account_id}/agents/cursor', response_model=CursorPage[Agent])
+async def read_agents_by_cursor(account_id: UUID, params: CursorParams = Depends(),
+                                agent_service: AgentService = Depends(get_agent_service)):
+    try:
+        return await agent_service.get_page_for_account(account_id, params)
+    except InvalidCursorException:
+        raise_invalid_cursor()
+
+
+@router.get('/agents/cursor', response_model=CursorPage[Agent])
+async def read_all_agents_by_cursor(params: CursorParams = Depends(),
+                                    agent_service: AgentService = Depends(get_agent_service)):
+    try:
+        return await agent_service.get_page(params)
+    except InvalidCursorException:
+        raise_invalid_cursor()
+
+
+@router.get('/agents/export', response_class=StreamingResponse)
+async def export_agents(region: RegionEnum | None = None, vip: bool | None = None,
+                        agent_service: AgentService = Depends(get_agent_service)):
+    return StreamingResponse(to_ndjson(agent_service.export(region=region, vip=vip)),
+                             media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.get('/accounts/{account_id}/agents/{agent_id}', response_model=Agent)
 async def read_agent(account_id: UUID, agent_id: UUID, agent_service: AgentService = Depends(get_agent_service)):
     agent = await agent_service.get(agent_id)
@@ -43,6 +76,18 @@ async def unblock_agent(agent_id: UUID, agent_service: AgentService = Depends(ge
         raise_not_found(f'Agent {agent_id} not found')
 
 
+@router.post('/agents/block', response_model=AgentsBlockResult, status_code=status.HTTP_202_ACCEPTED)
+async def block_agents(agent_ids: conlist(UUID, min_items=1, max_items=BULK_BLOCK_LIMIT),
+                       agent_service: AgentService = Depends(get_agent_service)):
+    return await agent_service.block_agents(agent_ids)
+
+
+@router.post('/agents/unblock', response_model=AgentsBlockResult, status_code=status.HTTP_202_ACCEPTED)
+async def unblock_agents(agent_ids: conlist(UUID, min_items=1, max_items=BULK_BLOCK_LIMIT),
+                         agent_service: AgentService = Depends(get_agent_service)):
+    return await agent_service.unblock_agents(agent_ids)
+
+
 @router.post('/agents/find_agent/{email}', response_model=Agent)
 async def find_agent(email: str, agent_service: AgentService = Depends(get_agent_service)):
     agent = await agent_service.get_agent_by_email(email)
@@ -71,6 +116,20 @@ async def create_agent(account_id: UUID, agent: AgentCreate, agent_service: Agen
         return result
     except DuplicatedMailException:
         raise_email_already_used()
+    except AccountBeingDeletedException:
+        raise_account_being_deleted()
+
+
+@router.post('/accounts/{account_id}/agents/bulk', response_model=List[AgentCreateResult])
+async def create_agents(account_id: UUID, agents: conlist(AgentCreate, min_items=1, max_items=BULK_CREATE_LIMIT),
+                        agent_service: AgentService = Depends(get_agent_service)):
+    try:
+        result = await agent_service.create_agents(account_id, agents)
+        if result is None:
+            raise_not_found(f'Account {account_id} not found')
+        return result
+    except AccountBeingDeletedException:
+        raise_account_being_deleted()
 
 
 @router.delete('/accounts/{account_id}/agents/{agent_id}', status_code=status.HTTP_202_ACCEPTED)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, EmailStr, UUID4
+from uuid import UUID
+
+from pydantic import BaseModel, EmailStr
 
 
 class AgentBase(BaseModel):
@@ -12,9 +14,24 @@ class AgentCreate(AgentBase):
 
 
 class Agent(AgentBase):
-    id: UUID4
-    account_id: UUID4
+    id: UUID
+    account_id: UUID
     blocked: bool
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class AgentCreateResult(BaseModel):
+    email: EmailStr
+    agent: Agent | None = None
+    error: str | None = None
+
+
+class AgentStats(BaseModel):
+    agents: int = 0
+    blocked_agents: int = 0
+
+
+class AgentsBlockResult(BaseModel):
+    not_found: list[UUID] = []
@@ -1,12 +1,17 @@
 import logging
-from typing import List
+from collections import defaultdict
+from typing import List, AsyncIterator, Dict, Iterable
 from uuid import UUID
 
 from acm_service.utils.logconf import DEFAULT_LOGGER
 from acm_service.utils.database.repository import AbstractRepository
+from acm_service.utils.database.session import UnitOfWork
 from acm_service.utils.events.producer import EventProducer
-from acm_service.agents.schema import Agent
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.accounts.schema import RegionEnum
+from acm_service.agents.schema import Agent, AgentCreate, AgentCreateResult, AgentsBlockResult
+from acm_service.utils.pagination import CursorParams, CursorPage
+from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException, EMAIL_ALREADY_USED, \
+    AccountBeingDeletedException
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -15,36 +20,69 @@ class AgentService:
 
     def __init__(self, agents: AbstractRepository,
                  accounts: AbstractRepository,
-                 event_producer: EventProducer):
+                 event_producer: EventProducer,
+                 unit_of_work: UnitOfWork | None = None):
         self._agents = agents
         self._accounts = accounts
         self._producer = event_producer
+        self._unit_of_work = unit_of_work or UnitOfWork()
 
     async def get(self, agent_id: UUID) -> Agent | None:
         return await self._agents.get(agent_id)
 
     async def block_agent(self, agent_id: UUID) -> bool:
         logger.info(f'Getting agent to be blocked {agent_id}')
-        agent = await self._agents.get(agent_id)
-        if agent is None:
-            return False
+        region = await self._agents.set_blocked(agent_id, True)
+        if region is None:
+            return await self._agents.get(agent_id) is not None
 
-        region = (await self._accounts.get(agent.account_id)).region
-        await self._agents.update(agent_id, blocked=True)
+        await self._unit_of_work.commit()
         await self._producer.block_agent(region, agent_id)
         return True
 
     async def unblock_agent(self, agent_id: UUID) -> bool:
         logger.info(f'Getting agent to be unblocked {agent_id}')
-        agent = await self._agents.get(agent_id)
-        if agent is None:
-            return False
+        region = await self._agents.set_blocked(agent_id, False)
+        if region is None:
+            return await self._agents.get(agent_id) is not None
 
-        region = (await self._accounts.get(agent.account_id)).region
-        await self._agents.update(agent_id, blocked=False)
+        await self._unit_of_work.commit()
         await self._producer.unblock_agent(region, agent_id)
         return True
 
+    async def block_agents(self, agent_ids: List[UUID]) -> AgentsBlockResult:
+        logger.info(f'Blocking {len(agent_ids)} agents')
+        changed = await self._agents.set_blocked_many(agent_ids, True)
+        result = await self._find_missing(agent_ids, changed.keys())
+        await self._unit_of_work.commit()
+
+        for region, agents in self._group_by_region(changed).items():
+            await self._producer.block_agents(region=region, agent_uuids=agents)
+        return result
+
+    async def unblock_agents(self, agent_ids: List[UUID]) -> AgentsBlockResult:
+        logger.info(f'Unblocking {len(agent_ids)} agents')
+        changed = await self._agents.set_blocked_many(agent_ids, False)
+        result = await self._find_missing(agent_ids, changed.keys())
+        await self._unit_of_work.commit()
+
+        for region, agents in self._group_by_region(changed).items():
+            await self._producer.unblock_agents(region=region, agent_uuids=agents)
+        return result
+
+    async def _find_missing(self, agent_ids: List[UUID], changed: Iterable[UUID]) -> AgentsBlockResult:
+        missing = set(agent_ids) - set(changed)
+        if missing:
+            missing -= {agent.id for agent in await self._agents.get_by(ids=list(missing))}
+        return AgentsBlockResult(not_found=[x for x in dict.fromkeys(agent_ids) if x in missing])
+
+    @staticmethod
+    def _group_by_region(agents: Dict[UUID, RegionEnum]) -> Dict[RegionEnum, List[UUID]]:
+        result = defaultdict(list)
+        for agent_id, region in agents.items():
+            result[region].append(agent_id)
+        return result
+
     async def get_agent_by_email(self, email: str) -> Agent | None:
         result = await self._agents.get_by(email=email)
         if len(result) == 0:
@@ -57,18 +95,69 @@ class AgentService:
     async def get_all(self) -> List[Agent]:
         return await self._agents.get_all()
 
+    async def get_page(self, params: CursorParams) -> CursorPage[Agent]:
+        return await self._agents.get_page(params)
+
+    async def get_page_for_account(self, account_id: UUID, params: CursorParams) -> CursorPage[Agent]:
+        return await self._agents.get_page(params, account_id=account_id)
+
+    def export(self, region: RegionEnum | None = None, vip: bool | None = None) -> AsyncIterator[Agent]:
+        return self._agents.stream(region=region, vip=vip)
+
+    async def _ensure_not_being_deleted(self, account_id: UUID) -> None:
+        # from the primary, the deletion may have been scheduled too recently to be on the replica; an agent created
+        # after this check is still removed with the account by the last chunk of the deletion
+        if await self._accounts.get_deletion(account_id, primary=True) is not None:
+            raise AccountBeingDeletedException()
+
     async def create_agent(self, name: str, email: str, account_id: UUID) -> Agent:
         if await self.get_agent_by_email(email):
             raise DuplicatedMailException()
+        await self._ensure_not_being_deleted(account_id)
 
-        result = await self._agents.create(name=name, email=email, account_id=str(account_id), blocked=False)
+        result = await self._agents.create(name=name, email=email, account_id=account_id, blocked=False)
         logger.info(f'Agent {result.id} was created')
 
         account = await self._accounts.get(account_id)
+        await self._unit_of_work.commit()
 
         await self._producer.create_agent(region=account.region, agent_uuid=result.id)
         return Agent.from_orm(result)
 
+    async def create_agents(self, account_id: UUID, agents: List[AgentCreate]) -> List[AgentCreateResult] | None:
+        account = await self._accounts.get(account_id)
+        if account is None:
+            return None
+        await self._ensure_not_being_deleted(account_id)
+
+        used_emails = {agent.email.lower()
+                       for agent in await self._agents.get_by(emails=[x.email for x in agents])}
+
+        results = []
+        to_create = []
+        for agent in agents:
+            if agent.email.lower() in used_emails:
+                results.append(AgentCreateResult(email=agent.email, error=EMAIL_ALREADY_USED))
+                continue
+            used_emails.add(agent.email.lower())
+            results.append(AgentCreateResult(email=agent.email))
+            to_create.append(dict(agent.dict(), account_id=account_id, region=account.region, blocked=False))
+
+        created = {agent.email: agent for agent in await self._agents.create_many(to_create)}
+        await self._unit_of_work.commit()
+        logger.info(f'{len(created)} agents were created for account {account_id}')
+
+        for result in results:
+            if result.error is None and result.email not in created:
+                # taken by a concurrent request after the check
+                result.error = EMAIL_ALREADY_USED
+            elif result.error is None:
+                result.agent = created[result.email]
+        if created:
+            await self._producer.create_agents(region=account.region,
+                                               agent_uuids=[agent.id for agent in created.values()])
+        return results
+
     async def delete(self, account_id: UUID, agent_id: UUID) -> None:
         agent = await self._agents.get(agent_id)
         account = await self._accounts.get(account_id)
@@ -80,7 +169,8 @@ class AgentService:
             logger.info(f'Trying to remove agent {agent_id} from the account f{account_id} but they are not linked.')
             raise InconsistencyException()
 
-        await self._agents.delete(agent_id)
+        await self._agents.delete(agent_id, account.region)
+        await self._unit_of_work.commit()
 
         await self._producer.delete_agent(region=account.region, agent_uuid=agent_id)
         logger.info(f'Agent {agent_id} was deleted')
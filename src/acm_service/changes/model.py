@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, Index
+
+from acm_service.utils.database.repository import DatabaseNow
+from acm_service.utils.database.session import Base
+from acm_service.utils.database.types import UUIDType
+
+
+class Tombstone(Base):
+    __tablename__ = 'tombstones'
+    __table_args__ = (Index('ix_tombstones_deleted_at_ref_id', 'deleted_at', 'ref_id'),)
+
+    ref_id = Column(UUIDType, primary_key=True)
+    kind = Column(String, nullable=False)
+    account_id = Column(UUIDType, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False, default=DatabaseNow())
@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import List, Iterable
+from uuid import UUID
+
+from sqlalchemy import insert, tuple_, true, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql import Select, Insert
+
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.accounts.schema import AccountWithoutAgents
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.agents.schema import Agent
+from acm_service.changes.model import Tombstone as TombstoneDB
+from acm_service.changes.schema import Change, ChangeCursor, ChangeKindEnum, ChangeSourceEnum
+from acm_service.utils.database.repository import DatabaseRepository, log_exception, DatabaseNow
+
+
+async def write_tombstones(session: AsyncSession, kind: ChangeKindEnum, ref_ids: Iterable[UUID],
+                           account_id: UUID) -> None:
+    rows = [{'ref_id': ref_id, 'kind': kind.value, 'account_id': account_id} for ref_id in ref_ids]
+    if rows:
+        await session.execute(insert(TombstoneDB), rows)
+
+
+def tombstones_of(query: Select) -> Insert:
+    """INSERT ... SELECT of tombstones for the rows of a (kind, ref_id, account_id) query, run before their DELETE."""
+    return insert(TombstoneDB).from_select(['kind', 'ref_id', 'account_id', 'deleted_at'],
+                                           query.add_columns(DatabaseNow()))
+
+
+# Every transaction still open on the primary may yet commit rows stamped after it began, so the feed stops at the
+# start of the oldest one: whatever is stamped before is committed, whatever commits later is stamped after.
+# The transactions of other roles are only listed to members of pg_read_all_stats: connect with a single role.
+POSTGRESQL_HIGH_WATER_MARK = text("""
+    SELECT least(clock_timestamp(), min(xact_start)) FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+""")
+
+
+class ChangesRepository(DatabaseRepository):
+    SOURCES = {
+        # source: (model, timestamp, key), all served by an index on (timestamp, key)
+        ChangeSourceEnum.account: (AccountDB, AccountDB.updated_at, AccountDB.id),
+        ChangeSourceEnum.agent: (AgentDB, AgentDB.updated_at, AgentDB.id),
+        ChangeSourceEnum.tombstone: (TombstoneDB, TombstoneDB.deleted_at, TombstoneDB.ref_id),
+    }
+
+    @log_exception
+    async def get_changes(self, since: ChangeCursor | None, limit: int) -> List[tuple[ChangeCursor, Change]]:
+        """Returns up to `limit` committed changes after the cursor, each with the cursor pointing at it.
+
+        Rows are stamped by the database as they are written and only the ones stamped before the high-water mark
+        are returned, so a transaction committing later can not add a change behind a cursor already handed out.
+        Read on the primary: a replica lags behind the transactions the mark is taken from.
+        """
+        changes = []
+        async with self._unit_of_work.read_transaction(primary=True) as session:
+            until = await self._high_water_mark(session)
+            for source, (model, timestamp, key) in self.SOURCES.items():
+                query = select(model).where(self._after(source, timestamp, key, since), timestamp < until). \
+                    order_by(timestamp, key).limit(limit)
+                for row in (await session.execute(query)).scalars():
+                    cursor = ChangeCursor(timestamp=getattr(row, timestamp.key), source=source,
+                                          id=getattr(row, key.key))
+                    changes.append((cursor, self._to_change(source, row)))
+
+        changes.sort(key=lambda change: (change[0].timestamp, list(ChangeSourceEnum).index(change[0].source),
+                                         change[0].id))
+        return changes[:limit]
+
+    @staticmethod
+    async def _high_water_mark(session: AsyncSession) -> datetime:
+        if session.bind.dialect.name == 'postgresql':
+            return await session.scalar(POSTGRESQL_HIGH_WATER_MARK)
+        # SQLite has a single writer: a transaction stamps its rows only once the previous one has committed
+        return await session.scalar(select(DatabaseNow()))
+
+    @staticmethod
+    def _after(source: ChangeSourceEnum, timestamp, key, since: ChangeCursor | None):
+        if since is None:
+            return true()
+        if source == since.source:
+            return tuple_(timestamp, key) > tuple_(literal(since.timestamp, timestamp.type),
+                                                  literal(since.id, key.type))
+        sources = list(ChangeSourceEnum)
+        if sources.index(source) > sources.index(since.source):
+            return timestamp >= since.timestamp
+        return timestamp > since.timestamp
+
+    @staticmethod
+    def _to_change(source: ChangeSourceEnum, row) -> Change:
+        if source == ChangeSourceEnum.account:
+            return Change(kind=ChangeKindEnum.account, id=row.id, account_id=row.id, updated_at=row.updated_at,
+                          account=AccountWithoutAgents.from_orm(row))
+        if source == ChangeSourceEnum.agent:
+            return Change(kind=ChangeKindEnum.agent, id=row.id, account_id=row.account_id, updated_at=row.updated_at,
+                          agent=Agent.from_orm(row))
+        return Change(kind=ChangeKindEnum(row.kind), id=row.ref_id, account_id=row.account_id,
+                      updated_at=row.deleted_at, deleted=True)
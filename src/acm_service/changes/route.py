@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+
+from acm_service.changes.schema import Changes
+from acm_service.changes.service import ChangesService
+from acm_service.utils.dependencies import get_token_header, get_changes_service
+from acm_service.utils.http_exceptions import raise_invalid_cursor, InvalidCursorException
+
+router = APIRouter(
+    tags=["changes"],
+    dependencies=[Depends(get_token_header)]
+)
+
+
+@router.get('/changes', response_model=Changes)
+async def read_changes(since: str | None = Query(None, description="Cursor returned by the previous call"),
+                       size: int = Query(500, ge=1, le=1_000, description="Page size"),
+                       changes_service: ChangesService = Depends(get_changes_service)):
+    try:
+        return await changes_service.get_changes(since, size)
+    except InvalidCursorException:
+        raise_invalid_cursor()
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from acm_service.accounts.schema import AccountWithoutAgents
+from acm_service.agents.schema import Agent
+
+
+class ChangeKindEnum(str, Enum):
+    account = 'account'
+    agent = 'agent'
+
+
+class ChangeSourceEnum(str, Enum):
+    # the order of the values is the order of changes sharing a timestamp
+    account = 'account'
+    agent = 'agent'
+    tombstone = 'tombstone'
+
+
+class ChangeCursor(BaseModel):
+    """Position in the change feed: the last change returned, ordered by (timestamp, source, id)."""
+    timestamp: datetime
+    source: ChangeSourceEnum
+    id: UUID
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.json().encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> 'ChangeCursor':
+        return cls.parse_obj(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+
+
+class Change(BaseModel):
+    kind: ChangeKindEnum
+    id: UUID
+    account_id: UUID
+    updated_at: datetime
+    deleted: bool = False
+    account: AccountWithoutAgents | None = None
+    agent: Agent | None = None
+
+
+class Changes(BaseModel):
+    items: list[Change] = []
+    # pass as `since` to get the next changes, stays the same while there are none
+    cursor: str | None = None
@@ -0,0 +1,21 @@
+from acm_service.changes.repository import ChangesRepository
+from acm_service.changes.schema import Changes, ChangeCursor
+from acm_service.utils.http_exceptions import InvalidCursorException
+
+
+class ChangesService:
+
+    def __init__(self, changes: ChangesRepository):
+        self._changes = changes
+
+    async def get_changes(self, since: str | None, limit: int) -> Changes:
+        """Returns the changes after the cursor, the cursor itself when there is none yet."""
+        try:
+            cursor = ChangeCursor.decode(since) if since else None
+        except ValueError as exc:
+            raise InvalidCursorException() from exc
+
+        changes = await self._changes.get_changes(cursor, limit)
+        if not changes:
+            return Changes(cursor=since)
+        return Changes(items=[change for _, change in changes], cursor=changes[-1][0].encode())
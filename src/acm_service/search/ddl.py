@@ -0,0 +1,72 @@
+"""DDL of the search indexes, shared by the metadata (tests, fresh databases) and the migrations."""
+
+# table: (kind, account id column)
+SEARCH_SOURCES = {
+    'accounts': ('account', 'id'),
+    'agents': ('agent', 'account_id'),
+}
+
+# PostgreSQL: trigram GIN indexes serve ILIKE '%q%' on names and e-mails
+TRIGRAM_INDEXES = {
+    'ix_accounts_name_trgm': ('accounts', 'name'),
+    'ix_accounts_email_trgm': ('accounts', 'email'),
+    'ix_agents_name_trgm': ('agents', 'name'),
+    'ix_agents_email_trgm': ('agents', 'email'),
+}
+POSTGRESQL_SEARCH_DDL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    *(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+      for name, (table, column) in TRIGRAM_INDEXES.items()),
+)
+
+# SQLite: accounts and agents are mirrored by triggers into search_documents, whose INTEGER PRIMARY KEY (stable
+# across VACUUM, unlike implicit rowids) backs the trigram FTS5 index kept as an external content table
+SQLITE_SEARCH_DOCUMENTS_DDL = (
+    'CREATE TABLE search_documents (id INTEGER PRIMARY KEY, kind VARCHAR NOT NULL, ref_id BLOB NOT NULL, '
+    'account_id BLOB NOT NULL, name VARCHAR, email VARCHAR, UNIQUE (kind, ref_id))',
+    "CREATE VIRTUAL TABLE search_index USING fts5(name, email, content='search_documents', content_rowid='id', "
+    "tokenize='trigram')",
+    'CREATE TRIGGER search_documents_insert AFTER INSERT ON search_documents BEGIN '
+    'INSERT INTO search_index (rowid, name, email) VALUES (new.id, new.name, new.email); END',
+    'CREATE TRIGGER search_documents_update AFTER UPDATE ON search_documents BEGIN '
+    "INSERT INTO search_index (search_index, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+    'INSERT INTO search_index (rowid, name, email) VALUES (new.id, new.name, new.email); END',
+    'CREATE TRIGGER search_documents_delete AFTER DELETE ON search_documents BEGIN '
+    "INSERT INTO search_index (search_index, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+    'END',
+)
+SQLITE_SEARCH_DROP_DDL = (
+    'DROP TABLE IF EXISTS search_index',
+    'DROP TABLE IF EXISTS search_documents',
+)
+
+
+def sqlite_document_triggers(table: str) -> tuple:
+    """Triggers mirroring a source table into search_documents, batch migrations of the table drop them."""
+    kind, account_id = SEARCH_SOURCES[table]
+    return (
+        f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO search_documents (kind, ref_id, account_id, name, email) "
+        f"VALUES ('{kind}', new.id, new.{account_id}, new.name, new.email); END",
+        f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF name, email ON {table} BEGIN "
+        f"UPDATE search_documents SET name = new.name, email = new.email "
+        f"WHERE kind = '{kind}' AND ref_id = new.id; END",
+        f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM search_documents WHERE kind = '{kind}' AND ref_id = old.id; END",
+    )
+
+
+def sqlite_drop_document_triggers(table: str) -> tuple:
+    return tuple(f'DROP TRIGGER IF EXISTS {table}_search_{action}' for action in ('insert', 'update', 'delete'))
+
+
+def sqlite_document_backfill(table: str) -> str:
+    kind, account_id = SEARCH_SOURCES[table]
+    return (f"INSERT INTO search_documents (kind, ref_id, account_id, name, email) "
+            f"SELECT '{kind}', id, {account_id}, name, email FROM {table}")
+
+
+SQLITE_SEARCH_DDL = (
+    *SQLITE_SEARCH_DOCUMENTS_DDL,
+    *(statement for table in SEARCH_SOURCES for statement in sqlite_document_triggers(table)),
+)
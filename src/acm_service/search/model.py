@@ -0,0 +1,18 @@
+from sqlalchemy import DDL, event, table, column, Integer, String, Float
+
+from acm_service.search.ddl import POSTGRESQL_SEARCH_DDL, SQLITE_SEARCH_DDL, SQLITE_SEARCH_DROP_DDL
+from acm_service.utils.database.session import Base
+from acm_service.utils.database.types import UUIDType
+
+for statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(Base.metadata, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Base.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in SQLITE_SEARCH_DROP_DDL:
+    event.listen(Base.metadata, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+search_documents = table('search_documents', column('id', Integer), column('kind', String),
+                         column('ref_id', UUIDType), column('account_id', UUIDType), column('name', String),
+                         column('email', String))
+# the hidden column named after the FTS5 table is the left operand of MATCH
+search_index = table('search_index', column('rowid', Integer), column('rank', Float), column('search_index'))
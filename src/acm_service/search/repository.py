@@ -0,0 +1,52 @@
+from sqlalchemy import literal, func, or_, union_all
+from sqlalchemy.future import select
+from sqlalchemy.sql import Select
+
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.search.model import search_documents, search_index
+from acm_service.search.schema import SearchResult, SearchKindEnum
+from acm_service.utils.database.repository import DatabaseRepository, log_exception
+from acm_service.utils.pagination import Params, SlicePage, paginate_by_slice
+
+
+def _like_pattern(phrase: str) -> str:
+    escaped = phrase.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class SearchRepository(DatabaseRepository):
+
+    @log_exception
+    async def search(self, phrase: str, params: Params) -> SlicePage[SearchResult]:
+        async with self._unit_of_work.read_transaction() as session:
+            if session.bind.dialect.name == 'postgresql':
+                query = self._trigram_query(phrase)
+            else:
+                query = self._fts_query(phrase)
+            return await paginate_by_slice(session, query, params, SearchResult)
+
+    @staticmethod
+    def _trigram_query(phrase: str) -> Select:
+        # ILIKE is served by the pg_trgm GIN indexes, similarity() ranks the matches
+        pattern = _like_pattern(phrase)
+
+        def documents(kind: SearchKindEnum, model, account_id) -> Select:
+            score = func.greatest(func.similarity(model.name, phrase), func.similarity(model.email, phrase))
+            return select(literal(kind.value).label('kind'), model.id.label('id'), account_id.label('account_id'),
+                          model.name.label('name'), model.email.label('email'), score.label('score')). \
+                where(or_(model.name.ilike(pattern, escape='\\'), model.email.ilike(pattern, escape='\\')))
+
+        matches = union_all(documents(SearchKindEnum.account, AccountDB, AccountDB.id),
+                            documents(SearchKindEnum.agent, AgentDB, AgentDB.account_id)).subquery()
+        return select(matches).order_by(matches.c.score.desc(), matches.c.id)
+
+    @staticmethod
+    def _fts_query(phrase: str) -> Select:
+        # a quoted phrase matches as a substring with the trigram tokenizer, bm25 (rank) is lower for better matches
+        match = '"' + phrase.replace('"', '""') + '"'
+        return select(search_documents.c.kind, search_documents.c.ref_id.label('id'), search_documents.c.account_id,
+                      search_documents.c.name, search_documents.c.email, (-search_index.c.rank).label('score')). \
+            select_from(search_index.join(search_documents, search_documents.c.id == search_index.c.rowid)). \
+            where(search_index.c.search_index.op('MATCH')(match)). \
+            order_by(search_index.c.rank, search_documents.c.id)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query
+
+from acm_service.search.schema import SearchResult
+from acm_service.search.service import SearchService
+from acm_service.utils.dependencies import get_token_header, get_search_service
+from acm_service.utils.pagination import SlicePage, Params
+
+router = APIRouter(
+    tags=["search"],
+    dependencies=[Depends(get_token_header)]
+)
+
+
+@router.get('/search', response_model=SlicePage[SearchResult])
+async def search(q: str = Query(min_length=3, max_length=255, description="Part of a name or an e-mail"),
+                 params: Params = Depends(), search_service: SearchService = Depends(get_search_service)):
+    return await search_service.search(q, params)
@@ -0,0 +1,21 @@
+from enum import Enum
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class SearchKindEnum(str, Enum):
+    account = 'account'
+    agent = 'agent'
+
+
+class SearchResult(BaseModel):
+    kind: SearchKindEnum
+    id: UUID
+    account_id: UUID
+    name: str | None
+    email: str | None
+    score: float
+
+    class Config:
+        orm_mode = True
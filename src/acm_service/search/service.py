@@ -0,0 +1,12 @@
+from acm_service.search.repository import SearchRepository
+from acm_service.search.schema import SearchResult
+from acm_service.utils.pagination import Params, SlicePage
+
+
+class SearchService:
+
+    def __init__(self, search: SearchRepository):
+        self._search = search
+
+    async def search(self, phrase: str, params: Params) -> SlicePage[SearchResult]:
+        return await self._search.search(phrase.strip(), params)
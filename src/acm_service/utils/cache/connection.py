@@ -1,24 +1,32 @@
 import asyncio
 import logging
 
-from aioredis import Redis
+from aioredis import Redis, BlockingConnectionPool
 
-from acm_service.utils.env import REDIS_URL, REDIS_PORT, REDIS_RETRIES, REDIS_TIMEOUT
+from acm_service.utils.env import REDIS_URL, REDIS_PORT, REDIS_RETRIES, REDIS_TIMEOUT, REDIS_POOL_SIZE, \
+    REDIS_POOL_TIMEOUT
 from acm_service.utils.logconf import DEFAULT_LOGGER
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
 
 async def connect_to_redis(url: str = REDIS_URL, port: int = REDIS_PORT, connection_timeout: int = REDIS_TIMEOUT,
-                           retries: int = REDIS_RETRIES) -> Redis | None:
+                           retries: int = REDIS_RETRIES, pool_size: int = REDIS_POOL_SIZE,
+                           pool_timeout: float = REDIS_POOL_TIMEOUT) -> Redis | None:
+    """Returns a client backed by a pool of up to pool_size connections, once Redis answers a PING.
+
+    When every connection is busy a command waits up to pool_timeout seconds for one to be released.
+    """
     for x in range(retries):
+        pool = BlockingConnectionPool(host=url, port=port, decode_responses=True,
+                                      max_connections=pool_size, timeout=pool_timeout)
+        connection = Redis(connection_pool=pool)
         try:
-            connection = Redis(host=url, port=port,
-                               decode_responses=True,
-                               single_connection_client=True)
+            await connection.ping()
             logger.info('Redis is alive !')
             return connection
         except Exception as _error:
+            await pool.disconnect()
             logger.info(f'Waiting for Redis to be alive. '
                         f'Sleeping {connection_timeout} seconds before {x + 1} retry.')
             await asyncio.sleep(connection_timeout)
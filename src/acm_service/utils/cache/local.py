@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+
+class LocalCache:
+    """In-process LRU cache with per-namespace TTLs, bounded by the number of entries and their size in bytes.
+
+    The size of an entry is approximated by the length of its key and value (cached values are ASCII JSON).
+    Not thread-safe, it is meant to be used from a single event loop.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, default_ttl: float, namespace_ttls: Dict[str, float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._default_ttl = default_ttl
+        self._namespace_ttls = namespace_ttls or {}
+        self._clock = clock
+        self._entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f'{namespace}:{key}'
+
+    def ttl(self, namespace: str) -> float:
+        return self._namespace_ttls.get(namespace, self._default_ttl)
+
+    def get(self, namespace: str, key: str) -> str | None:
+        full_key = self._key(namespace, key)
+        entry = self._entries.get(full_key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            self._remove(full_key)
+            return None
+
+        self._entries.move_to_end(full_key)
+        return value
+
+    def set(self, namespace: str, key: str, value: str, ttl: float | None = None) -> None:
+        ttl = min(self.ttl(namespace), ttl) if ttl is not None else self.ttl(namespace)
+        full_key = self._key(namespace, key)
+        self._remove(full_key)
+        size = len(full_key) + len(value)
+        if ttl <= 0 or size > self._max_bytes:
+            return
+
+        self._entries[full_key] = (value, self._clock() + ttl)
+        self._bytes += size
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._remove(self._key(namespace, key))
+
+    def delete_key(self, full_key: str) -> None:
+        self._remove(full_key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_in_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, full_key: str) -> None:
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            self._bytes -= len(full_key) + len(entry[0])
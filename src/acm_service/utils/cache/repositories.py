@@ -1,18 +1,39 @@
+import asyncio
 import logging
 from datetime import timedelta
+from typing import List, Dict
+from uuid import uuid4
 
-from aioredis import Redis
+from aioredis import Redis, RedisError
+from aioredis.client import PubSub, Pipeline
 
+from acm_service.utils.cache.local import LocalCache
+from acm_service.utils.env import L1_CACHE_MAX_ENTRIES, L1_CACHE_MAX_BYTES, L1_CACHE_TTL_IN_SECONDS, \
+    L1_CACHE_NAMESPACE_TTLS, L1_CACHE_INVALIDATION_CHANNEL
 from acm_service.utils.logconf import DEFAULT_LOGGER
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
+# value cached for a key known not to exist in the database
+ABSENT = '-'
+
 
 class Cache:
+    """Two-tier cache: an in-process LocalCache (L1) in front of Redis.
+
+    Every set and delete is published on the invalidation channel, the other workers drop the keys from their L1.
+    L1 is used only while the invalidation listener runs; a worker reading Redis while another one writes can
+    still keep the older value until its L1 TTL, which is why the L1 TTLs are short.
+    """
     instance = None
 
-    def __init__(self):
+    def __init__(self, local: LocalCache | None = None):
         self._redis = None
+        self._local = local or LocalCache(L1_CACHE_MAX_ENTRIES, L1_CACHE_MAX_BYTES, L1_CACHE_TTL_IN_SECONDS,
+                                          L1_CACHE_NAMESPACE_TTLS)
+        self._id = uuid4().hex
+        self._pubsub: PubSub | None = None
+        self._listener: asyncio.Task | None = None
 
     def connect_to_cache_service(self, redis: Redis):
         self._redis = redis
@@ -23,12 +44,156 @@ class Cache:
             Cache.instance = Cache()
         return Cache.instance
 
+    @property
+    def connected(self) -> bool:
+        return self._redis is not None
+
+    @property
+    def _local_enabled(self) -> bool:
+        return self._listener is not None and not self._listener.done()
+
     async def set(self, namespace: str, key: str, value: str, expiration: timedelta | None):
-        await self._redis.set(name=f'{namespace}:{key}', value=value)
-        if expiration:
-            await self._redis.expire(f'{namespace}:{key}', expiration)
+        await self.set_many(namespace, {key: value}, expiration)
+
+    async def set_many(self, namespace: str, values: Dict[str, str], expiration: timedelta | None) -> None:
+        """Sets the keys with SET EX and publishes the invalidation in one pipeline (a single round trip)."""
+        if not values:
+            return
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            for key, value in values.items():
+                pipeline.set(f'{namespace}:{key}', value, ex=expiration)
+            self._invalidate(pipeline, namespace, *values)
+            await pipeline.execute()
+        if self._local_enabled:
+            for key, value in values.items():
+                self._local.set(namespace, key, value, expiration.total_seconds() if expiration else None)
+
+    async def add(self, namespace: str, key: str, value: str, expiration: timedelta | None) -> bool:
+        """Sets the key only if it is not cached yet (SET NX), a value set meanwhile by a write is never replaced.
+
+        Used to fill the cache on a miss with a value read from the database, which may be older than the write.
+        """
+        if not await self._redis.set(f'{namespace}:{key}', value, ex=expiration, nx=True):
+            return False
+        if self._local_enabled:
+            self._local.set(namespace, key, value, expiration.total_seconds() if expiration else None)
+        return True
+
+    async def set_absent(self, namespace: str, key: str, expiration: timedelta) -> None:
+        """Marks the key as not existing, unless a value was set meanwhile e.g. by its creation."""
+        await self.add(namespace, key, ABSENT, expiration)
 
     async def get(self, namespace: str, key: str) -> str | None:
-        return await self._redis.get(f'{namespace}:{key}')
+        if self._local_enabled:
+            value = self._local.get(namespace, key)
+            if value is not None:
+                return value
+
+        value = await self._redis.get(f'{namespace}:{key}')
+        if value is not None and self._local_enabled:
+            self._local.set(namespace, key, value)
+        return value
+
+    async def get_many(self, namespace: str, keys: List[str]) -> List[str | None]:
+        """Returns the values in the order of keys, the ones missing in L1 are read with a single MGET."""
+        values = {}
+        if self._local_enabled:
+            values = {key: self._local.get(namespace, key) for key in keys}
+        missing = [key for key in dict.fromkeys(keys) if values.get(key) is None]
+        if missing:
+            fetched = await self._redis.mget([f'{namespace}:{key}' for key in missing])
+            for key, value in zip(missing, fetched):
+                values[key] = value
+                if value is not None and self._local_enabled:
+                    self._local.set(namespace, key, value)
+        return [values[key] for key in keys]
+
+    async def get_version(self, namespace: str, key: str) -> int:
+        # counters are read from Redis only, a bump has to be seen by every worker at once
+        return int(await self._redis.get(f'{namespace}:{key}') or 0)
+
+    async def bump_versions(self, namespace: str, *keys: str, expiration: timedelta) -> None:
+        """Increments the version counters, each lives at least as long as the values cached under it."""
+        if not keys:
+            return
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.incr(f'{namespace}:{key}')
+                pipeline.expire(f'{namespace}:{key}', expiration)
+            await pipeline.execute()
+
+    async def set_versioned(self, namespace: str, key: str, version: int, value: str,
+                            version_namespace: str, expiration: timedelta) -> None:
+        """Caches the value of one version of the key, values of older versions are never read again.
+
+        The counter is kept alive as long as the value: a counter expiring and starting over from 0 could
+        otherwise make an old value current again. A versioned value never changes, so nothing is published.
+        """
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            pipeline.set(f'{namespace}:{key}:{version}', value, ex=expiration)
+            pipeline.expire(f'{version_namespace}:{key}', expiration)
+            await pipeline.execute()
+        if self._local_enabled:
+            self._local.set(namespace, f'{key}:{version}', value, expiration.total_seconds())
+
+    async def get_versioned(self, namespace: str, key: str, version: int) -> str | None:
+        return await self.get(namespace, f'{key}:{version}')
+
+    async def delete(self, namespace: str, *keys: str) -> None:
+        if not keys:
+            return
+        async with self._redis.pipeline(transaction=False) as pipeline:
+            pipeline.delete(*(f'{namespace}:{key}' for key in keys))
+            self._invalidate(pipeline, namespace, *keys)
+            await pipeline.execute()
+
+    async def delete_namespace(self, namespace: str) -> None:
+        """Drops every key of the namespace, the keys are found with SCAN so Redis is not blocked."""
+        keys = [key async for key in self._redis.scan_iter(match=f'{namespace}:*')]
+        if keys:
+            await self._redis.delete(*keys)
+        self._local.clear()
+        await self._redis.publish(L1_CACHE_INVALIDATION_CHANNEL, self._id)
+
+    def _invalidate(self, pipeline: Pipeline, namespace: str, *keys: str) -> None:
+        for key in keys:
+            self._local.delete(namespace, key)
+        full_keys = ' '.join(f'{namespace}:{key}' for key in keys)
+        pipeline.publish(L1_CACHE_INVALIDATION_CHANNEL, f'{self._id} {full_keys}')
+
+    def on_invalidation(self, message: str) -> None:
+        # "<sender> <namespace:key> ...", a message without keys clears the whole L1
+        sender, *full_keys = message.split(' ')
+        if sender == self._id:
+            return
+        if not full_keys:
+            self._local.clear()
+        for full_key in full_keys:
+            self._local.delete_key(full_key)
+
+    async def start_invalidation_listener(self) -> None:
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(L1_CACHE_INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen(self._pubsub))
+        logger.info(f'Listening to cache invalidations on {L1_CACHE_INVALIDATION_CHANNEL}')
 
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        self._local.clear()
 
+    async def _listen(self, pubsub: PubSub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    self.on_invalidation(message['data'])
+        except (RedisError, OSError) as exc:
+            # without invalidations L1 could serve stale values, the cache falls back to Redis only
+            logger.exception(f'Cache invalidation listener failed, local cache disabled: {exc}')
+        finally:
+            self._local.clear()
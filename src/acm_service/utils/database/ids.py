@@ -0,0 +1,24 @@
+import secrets
+import time
+import uuid
+
+from acm_service.utils.env import ID_STRATEGY
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID version 7 (RFC 9562): 48 bits of Unix time in milliseconds followed by random bits.
+
+    Consecutive ids land next to each other in the primary key index instead of at random pages.
+    """
+    value = (time.time_ns() // 1_000_000 & 0xFFFF_FFFF_FFFF) << 80 | secrets.randbits(80)
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+
+ID_GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+new_id = ID_GENERATORS[ID_STRATEGY]
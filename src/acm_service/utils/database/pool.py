@@ -0,0 +1,82 @@
+import time
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStats(BaseModel):
+    size: int
+    checked_out: int
+    checked_out_peak: int
+    overflow: int
+    checkouts: int
+    connects: int
+    invalidations: int
+    timeouts: int
+    wait_time_total_ms: float
+    wait_time_max_ms: float
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that measures how long callers wait in checkout and how often they give up.
+
+    Pool events only fire once a connection is handed out, so the wait itself is timed around _do_get().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+
+class PoolMonitor:
+    """Collects pool statistics of an engine through SQLAlchemy pool events."""
+
+    def __init__(self, engine: AsyncEngine):
+        self._engine = engine
+        self.checkouts = 0
+        self.checked_out_peak = 0
+        self.connects = 0
+        self.invalidations = 0
+        event.listen(engine.sync_engine, 'checkout', self._on_checkout)
+        event.listen(engine.sync_engine, 'connect', self._on_connect)
+        event.listen(engine.sync_engine, 'invalidate', self._on_invalidate)
+
+    def _on_checkout(self, _dbapi_connection, _connection_record, _connection_proxy) -> None:
+        self.checkouts += 1
+        self.checked_out_peak = max(self.checked_out_peak, self._engine.pool.checkedout())
+
+    def _on_connect(self, _dbapi_connection, _connection_record) -> None:
+        self.connects += 1
+
+    def _on_invalidate(self, _dbapi_connection, _connection_record, _exception) -> None:
+        self.invalidations += 1
+
+    def stats(self) -> PoolStats:
+        pool = self._engine.pool
+        return PoolStats(size=pool.size(),
+                         checked_out=pool.checkedout(),
+                         checked_out_peak=self.checked_out_peak,
+                         overflow=max(pool.overflow(), 0),
+                         checkouts=self.checkouts,
+                         connects=self.connects,
+                         invalidations=self.invalidations,
+                         timeouts=getattr(pool, 'timeouts', 0),
+                         wait_time_total_ms=getattr(pool, 'wait_time_total', 0.0) * 1000,
+                         wait_time_max_ms=getattr(pool, 'wait_time_max', 0.0) * 1000)
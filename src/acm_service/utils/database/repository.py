@@ -1,10 +1,89 @@
 import abc
 import logging
+from datetime import datetime, timezone
+from typing import List, AsyncIterator, Type, TypeVar
 
+from sqlalchemy import insert, DateTime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.functions import FunctionElement
+
+from acm_service.utils.database.session import UnitOfWork, create_read_session
+from acm_service.utils.env import EXPORT_YIELD_PER
 from acm_service.utils.logconf import DEFAULT_LOGGER
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
+T = TypeVar('T')
+
+
+def supports_returning(session: AsyncSession) -> bool:
+    return session.bind.dialect.full_returning
+
+
+def supports_truncate(session: AsyncSession) -> bool:
+    return session.bind.dialect.name == 'postgresql'
+
+
+async def insert_unless_conflicting(session: AsyncSession, table, rows: List[dict]) -> List[dict]:
+    """Inserts the rows in one statement and returns the inserted ones.
+
+    If a row violates a constraint, e.g. an e-mail taken by a concurrent request since it was checked, the rows are
+    inserted one by one instead, each in its own savepoint, and the conflicting ones are left out.
+    """
+    try:
+        async with session.begin_nested():
+            await session.execute(insert(table), rows)
+        return rows
+    except IntegrityError:
+        pass
+
+    inserted = []
+    for row in rows:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(table), [row])
+            inserted.append(row)
+        except IntegrityError:
+            continue
+    return inserted
+
+
+async def stream_rows(query: Select, schema: Type[T]) -> AsyncIterator[T]:
+    """Streams the entities of the query in batches of EXPORT_YIELD_PER, from a session of its own."""
+    async with create_read_session() as session:
+        async with session.begin():
+            async for row in await session.stream_scalars(query.execution_options(yield_per=EXPORT_YIELD_PER)):
+                yield schema.from_orm(row)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class DatabaseNow(FunctionElement):  # pylint: disable=too-many-ancestors
+    """Clock of the database at the time the statement runs, rather than when its transaction began."""
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(DatabaseNow)
+def _database_now(_element, _compiler, **_kwargs):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(DatabaseNow, 'postgresql')
+def _database_now_postgresql(_element, _compiler, **_kwargs):
+    return 'clock_timestamp()'
+
+
+@compiles(DatabaseNow, 'sqlite')
+def _database_now_sqlite(_element, _compiler, **_kwargs):
+    # in the format SQLAlchemy stores datetimes in, microseconds included
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
 
 def log_exception(coro):
     async def wrap(*args, **kwargs):
@@ -27,14 +106,27 @@ class AbstractRepository(abc.ABC):
     async def get_all(self):
         raise NotImplementedError
 
+    async def get_page(self, params):
+        raise NotImplementedError
+
+    def stream(self):
+        raise NotImplementedError
+
     async def create(self, **kwargs):
         raise NotImplementedError
 
-    async def delete(self, reference):
+    async def create_many(self, items):
         raise NotImplementedError
 
-    async def delete_all(self):
+    async def delete(self, reference):
         raise NotImplementedError
 
     async def update(self, reference, **kwargs):
         raise NotImplementedError
+
+
+class DatabaseRepository:
+    """Base of the repositories running their statements in a unit of work, shared or of their own."""
+
+    def __init__(self, unit_of_work: UnitOfWork | None = None):
+        self._unit_of_work = unit_of_work or UnitOfWork()
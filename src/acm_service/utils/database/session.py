@@ -1,20 +1,58 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from typing import Tuple, List, Callable, Awaitable
 
+from aioredis import RedisError
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.pool import AsyncAdaptedQueuePool
-
-from acm_service.utils.env import ASYNC_DB_URL
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from acm_service.utils.database.pool import MonitoredQueuePool, PoolMonitor
+from acm_service.utils.database.sqlite import is_sqlite_file, apply_sqlite_profile
+from acm_service.utils.env import ASYNC_DB_URL, ASYNC_READ_DB_URL, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, \
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, SQLITE_PROFILE, SQLITE_READERS
 from acm_service.utils.logconf import DEFAULT_LOGGER
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
-engine = create_async_engine(ASYNC_DB_URL, future=True, echo=False, pool_size=20, max_overflow=10,
-                             poolclass=AsyncAdaptedQueuePool)
+# what a cache write or the read feeding it fails with, the committed transaction stands regardless
+AFTER_COMMIT_ERRORS = (RedisError, SQLAlchemyError, OSError, asyncio.TimeoutError)
+
+POOL_SETTINGS = {'poolclass': MonitoredQueuePool, 'pool_size': DB_POOL_SIZE, 'max_overflow': DB_POOL_MAX_OVERFLOW,
+                 'pool_timeout': DB_POOL_TIMEOUT, 'pool_recycle': DB_POOL_RECYCLE, 'pool_pre_ping': DB_POOL_PRE_PING}
+
+
+def create_engines(url: str, read_url: str = '',
+                   sqlite_profile: bool = SQLITE_PROFILE) -> Tuple[AsyncEngine, AsyncEngine | None]:
+    """Returns the primary engine and the read engine (None when reads go to the primary).
+
+    A file based SQLite database gets one serialized writer connection and a pool of reader connections to the
+    same file instead of a read replica.
+    """
+    if sqlite_profile and not read_url and is_sqlite_file(url):
+        writer = create_async_engine(url, future=True, echo=False,
+                                     **{**POOL_SETTINGS, 'pool_size': 1, 'max_overflow': 0})
+        readers = create_async_engine(url, future=True, echo=False,
+                                      **{**POOL_SETTINGS, 'pool_size': SQLITE_READERS, 'max_overflow': 0})
+        apply_sqlite_profile(writer, readers)
+        return writer, readers
+
+    primary = create_async_engine(url, future=True, echo=False, **POOL_SETTINGS)
+    replica = create_async_engine(read_url, future=True, echo=False, **POOL_SETTINGS) if read_url else None
+    return primary, replica
+
+
+engine, read_engine = create_engines(ASYNC_DB_URL, ASYNC_READ_DB_URL)
+# only a replica lags behind the primary, the SQLite readers read the file the single writer has committed to
+HAS_READ_REPLICA = bool(ASYNC_READ_DB_URL)
+
+pool_monitor = PoolMonitor(engine)
+read_pool_monitor = PoolMonitor(read_engine) if read_engine else None
 
 
 async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession, autocommit=False, autoflush=False)
+async_read_session = sessionmaker(read_engine, expire_on_commit=False, class_=AsyncSession, autocommit=False,
+                                  autoflush=False) if read_engine else None
 
 
 @asynccontextmanager
@@ -23,4 +61,111 @@ async def create_session() -> AsyncSession:
         yield session
 
 
+@asynccontextmanager
+async def create_read_session() -> AsyncSession:
+    async with (async_read_session or async_session)() as session:
+        yield session
+
+
+class UnitOfWork:
+    """Transaction scope shared by the repositories taking part in one service call.
+
+    Bound to a session, every repository call joins the same transaction (one pooled connection) and nothing
+    is persisted until commit(). Without a session each repository call runs in its own short transaction.
+    Reads go to the read replica (when configured) until the first write; afterwards they stay on the primary,
+    so a request always reads its own writes. Bound to a session only, reads share that session as well.
+    """
+
+    def __init__(self, session: AsyncSession | None = None, read_session: AsyncSession | None = None):
+        self._session = session
+        self._read_session = read_session
+        self._written = False
+        self._after_commit: List[Tuple[Callable[[], Awaitable[None]], Callable[[], Awaitable[None]] | None]] = []
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncSession:
+        self._written = True
+        async with self._primary_transaction() as session:
+            yield session
+
+    @asynccontextmanager
+    async def read_transaction(self, primary: bool = False) -> AsyncSession:
+        """Read scope, on the primary when asked to: for reads that must not lag behind a write of another request."""
+        bound_without_reader = self._session is not None and self._read_session is None
+        if primary or self._written or async_read_session is None or bound_without_reader:
+            async with self._primary_transaction() as session:
+                yield session
+            return
+
+        if self._read_session is not None:
+            yield self._read_session
+            return
+
+        async with create_read_session() as session:
+            async with session.begin():
+                yield session
+
+    @asynccontextmanager
+    async def _primary_transaction(self) -> AsyncSession:
+        if self._session is not None:
+            yield self._session
+            return
+
+        session = async_session()
+        try:
+            yield session
+            await session.commit()
+        finally:
+            # closing gives the connection back and rolls back whatever was not committed
+            await session.close()
+
+    async def after_commit(self, callback: Callable[[], Awaitable[None]],
+                           fallback: Callable[[], Awaitable[None]] | None = None) -> None:
+        """Runs the callback once the current writes are persisted, right away when there is no bound session.
+
+        The writes are already persisted when the callback runs, so its failure is logged instead of raised and
+        the fallback (if any) runs in its place.
+        """
+        if self._session is None:
+            await self._run_after_commit(callback, fallback)
+            return
+        self._after_commit.append((callback, fallback))
+
+    async def commit(self) -> None:
+        if self._session is not None:
+            await self._session.commit()
+            callbacks, self._after_commit = self._after_commit, []
+            for callback, fallback in callbacks:
+                await self._run_after_commit(callback, fallback)
+
+    @staticmethod
+    async def _run_after_commit(callback: Callable[[], Awaitable[None]],
+                                fallback: Callable[[], Awaitable[None]] | None) -> None:
+        try:
+            await callback()
+            return
+        except AFTER_COMMIT_ERRORS:
+            logger.exception('After commit callback failed')
+
+        if fallback is None:
+            return
+        try:
+            await fallback()
+        except AFTER_COMMIT_ERRORS:
+            logger.exception('After commit fallback failed')
+
+
+@asynccontextmanager
+async def create_unit_of_work() -> UnitOfWork:
+    session = async_session()
+    read_session = async_read_session() if async_read_session is not None else None
+    try:
+        yield UnitOfWork(session, read_session)
+    finally:
+        # the services commit, closing rolls back a unit of work left without one
+        await session.close()
+        if read_session is not None:
+            await read_session.close()
+
+
 Base = declarative_base()
@@ -0,0 +1,41 @@
+from typing import Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from acm_service.utils.env import SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT
+
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    f'mmap_size={SQLITE_MMAP_SIZE}',
+    f'cache_size={SQLITE_CACHE_SIZE}',
+    f'busy_timeout={SQLITE_BUSY_TIMEOUT}',
+)
+
+
+def is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == 'sqlite' and parsed.database not in (None, '', ':memory:')
+
+
+def _execute_pragmas(dbapi_connection, pragmas: Tuple[str, ...]) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma in pragmas:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+def set_writer_pragmas(dbapi_connection, _connection_record) -> None:
+    _execute_pragmas(dbapi_connection, SQLITE_PRAGMAS)
+
+
+def set_reader_pragmas(dbapi_connection, _connection_record) -> None:
+    _execute_pragmas(dbapi_connection, SQLITE_PRAGMAS + ('query_only=1',))
+
+
+def apply_sqlite_profile(engine: AsyncEngine, read_engine: AsyncEngine) -> None:
+    """WAL lets the readers run next to the single writer, every connection gets the tuned pragmas on connect."""
+    event.listen(engine.sync_engine, 'connect', set_writer_pragmas)
+    event.listen(read_engine.sync_engine, 'connect', set_reader_pragmas)
@@ -1,18 +1,25 @@
 import asyncio
+from typing import AsyncIterator
 
 from aio_pika.abc import AbstractRobustConnection
 from aioredis import Redis
-from fastapi import Header
+from fastapi import Header, Depends
 
 from acm_service.utils.env import AUTH_TOKEN, TWO_FA
 from acm_service.utils.http_exceptions import raise_bad_request
 from acm_service.utils.events.connection import connect_to_rabbit_mq
 from acm_service.utils.cache.connection import connect_to_redis
+from acm_service.utils.cache.repositories import Cache
+from acm_service.utils.database.session import UnitOfWork, create_unit_of_work
 from acm_service.accounts.repository import AccountRepository, AccountCachedRepository
 from acm_service.agents.repository import AgentRepository, AgentCachedRepository
 from acm_service.agents.service import AgentService
 from acm_service.utils.events.producer import get_event_producer
 from acm_service.accounts.service import AccountService
+from acm_service.search.repository import SearchRepository
+from acm_service.search.service import SearchService
+from acm_service.changes.repository import ChangesRepository
+from acm_service.changes.service import ChangesService
 
 
 async def get_cache_connection() -> Redis | None:
@@ -33,17 +40,47 @@ def get_2fa_token_header(two_fa: str = Header()) -> None:
         raise_bad_request("Invalid 2FA header")
 
 
-def get_agent_service() -> AgentService:
-    return AgentService(AgentRepository(), AccountRepository(), get_event_producer())
+async def get_unit_of_work() -> AsyncIterator[UnitOfWork]:
+    async with create_unit_of_work() as unit_of_work:
+        yield unit_of_work
 
 
-def get_account_service() -> AccountService:
-    return AccountService(AgentRepository(), AccountRepository(), get_event_producer())
+def get_agent_service(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> AgentService:
+    return AgentService(AgentRepository(unit_of_work), AccountRepository(unit_of_work), get_event_producer(),
+                        unit_of_work)
 
 
-def get_agent_service_with_cache() -> AgentService:
-    return AgentService(AgentCachedRepository(), AccountCachedRepository(), get_event_producer())
+def get_account_service(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> AccountService:
+    return AccountService(AgentRepository(unit_of_work), AccountRepository(unit_of_work), get_event_producer(),
+                          unit_of_work)
 
 
-def get_account_service_with_cache() -> AccountService:
-    return AccountService(AgentCachedRepository(), AccountCachedRepository(), get_event_producer())
+def get_agent_service_with_cache(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> AgentService:
+    return AgentService(AgentCachedRepository(unit_of_work), AccountCachedRepository(unit_of_work),
+                        get_event_producer(), unit_of_work)
+
+
+def get_account_service_with_cache(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> AccountService:
+    return AccountService(AgentCachedRepository(unit_of_work), AccountCachedRepository(unit_of_work),
+                          get_event_producer(), unit_of_work)
+
+
+def get_background_agent_service(unit_of_work: UnitOfWork) -> AgentService:
+    # event consumers and background jobs are not resolved by FastAPI, so the cache override is applied here
+    if Cache.get_instance().connected:
+        return get_agent_service_with_cache(unit_of_work)
+    return get_agent_service(unit_of_work)
+
+
+def get_background_account_service(unit_of_work: UnitOfWork) -> AccountService:
+    if Cache.get_instance().connected:
+        return get_account_service_with_cache(unit_of_work)
+    return get_account_service(unit_of_work)
+
+
+def get_search_service(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> SearchService:
+    return SearchService(SearchRepository(unit_of_work))
+
+
+def get_changes_service(unit_of_work: UnitOfWork = Depends(get_unit_of_work)) -> ChangesService:
+    return ChangesService(ChangesRepository(unit_of_work))
@@ -1,11 +1,14 @@
 import logging
-from typing import Any
+from typing import Any, Dict
 
 from fastapi import Depends
 from fastapi import APIRouter, status
 
+from acm_service.utils.database.pool import PoolStats
+from acm_service.utils.database.session import pool_monitor, read_pool_monitor
 from acm_service.utils.dependencies import get_token_header, get_2fa_token_header, get_account_service
 from acm_service.utils.logconf import DEFAULT_LOGGER
+from acm_service.accounts.schema import EraseResult
 from acm_service.accounts.service import AccountService
 
 logger = logging.getLogger(DEFAULT_LOGGER)
@@ -17,8 +20,17 @@ router = APIRouter(
 )
 
 
-@router.post('/erase_db', status_code=status.HTTP_202_ACCEPTED)
+@router.post('/erase_db', status_code=status.HTTP_202_ACCEPTED, response_model=EraseResult)
 async def clear(_two_fa_token: Any = Depends(get_2fa_token_header),
                 accounts: AccountService = Depends(get_account_service)):
-    await accounts.delete_all()
+    result = await accounts.erase()
     logger.info('All accounts were deleted')
+    return result
+
+
+@router.get('/pool_stats', response_model=Dict[str, PoolStats])
+async def pool_stats(_two_fa_token: Any = Depends(get_2fa_token_header)):
+    stats = {'primary': pool_monitor.stats()}
+    if read_pool_monitor is not None:
+        stats['replica'] = read_pool_monitor.stats()
+    return stats
@@ -16,6 +16,21 @@ SCOUT_KEY = os.environ.get('SCOUT_KEY', '')
 PORT = os.environ.get('PORT', '8080')
 ENABLE_EVENTS = os.environ.get('ENABLE_EVENTS', 'False') == 'True'
 ASYNC_DB_URL = os.environ.get('ASYNC_DB_URL', 'sqlite+aiosqlite:///./sql_app.db')
+ASYNC_READ_DB_URL = os.environ.get('ASYNC_READ_DB_URL', '')
+ID_STRATEGIES = ('uuid4', 'uuid7')
+ID_STRATEGY = os.environ.get('ID_STRATEGY', 'uuid4')
+if ID_STRATEGY not in ID_STRATEGIES:
+    raise ValueError(f"ID_STRATEGY must be one of {', '.join(ID_STRATEGIES)}, not '{ID_STRATEGY}'")
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 20))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', -1))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'False') == 'True'
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'True') == 'True'
+SQLITE_READERS = int(os.environ.get('SQLITE_READERS', 4))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
 DEBUG_LOGGER_LEVEL = (os.environ.get('DEBUG_LOGGER_LEVEL', 'False') == 'True')
 DEBUG_REST = (os.environ.get('DEBUG_REST', 'False') == 'True')
 
@@ -23,4 +38,26 @@ REDIS_URL = os.environ.get('REDIS_URL', '')
 REDIS_PORT = os.environ.get('REDIS_PORT', '')
 REDIS_RETRIES = int(os.environ.get('CLOUDAMQP_RETRIES', 1))
 REDIS_TIMEOUT = int(os.environ.get('CLOUDAMQP_TIMEOUT', 0))
+REDIS_POOL_SIZE = int(os.environ.get('REDIS_POOL_SIZE', 50))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 5))
 REDIS_CACHE_INVALIDATION_IN_SECONDS = int(os.environ.get('REDIS_CACHE_INVALIDATION_IN_SECONDS', 60))
+L1_CACHE_MAX_ENTRIES = int(os.environ.get('L1_CACHE_MAX_ENTRIES', 10000))
+L1_CACHE_MAX_BYTES = int(os.environ.get('L1_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+L1_CACHE_TTL_IN_SECONDS = float(os.environ.get('L1_CACHE_TTL_IN_SECONDS', 5))
+# e.g. "Account=30,AgentStats=2", namespaces are the names of the cached schemas
+L1_CACHE_NAMESPACE_TTLS = {namespace.strip(): float(ttl) for namespace, ttl in
+                           (item.split('=') for item in os.environ.get('L1_CACHE_NAMESPACE_TTLS', '').split(',')
+                            if item.strip())}
+L1_CACHE_INVALIDATION_CHANNEL = os.environ.get('L1_CACHE_INVALIDATION_CHANNEL', 'cache-invalidation')
+NEGATIVE_CACHE_TTL_IN_SECONDS = int(os.environ.get('NEGATIVE_CACHE_TTL_IN_SECONDS', 30))
+STATS_CACHE_INVALIDATION_IN_SECONDS = int(os.environ.get('STATS_CACHE_INVALIDATION_IN_SECONDS', 10))
+
+BULK_CREATE_LIMIT = int(os.environ.get('BULK_CREATE_LIMIT', 1000))
+BULK_BLOCK_LIMIT = int(os.environ.get('BULK_BLOCK_LIMIT', 5000))
+
+EXPORT_YIELD_PER = int(os.environ.get('EXPORT_YIELD_PER', 1000))
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 500))
+
+ACCOUNT_DELETION_CHUNK_SIZE = int(os.environ.get('ACCOUNT_DELETION_CHUNK_SIZE', 1000))
+ACCOUNT_DELETION_LEASE_IN_SECONDS = int(os.environ.get('ACCOUNT_DELETION_LEASE_IN_SECONDS', 60))
+ERASE_CHUNK_SIZE = int(os.environ.get('ERASE_CHUNK_SIZE', 10000))
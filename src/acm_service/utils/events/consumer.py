@@ -7,7 +7,8 @@ from aio_pika.abc import AbstractIncomingMessage, AbstractRobustConnection
 
 from acm_service.utils.logconf import DEFAULT_LOGGER
 from acm_service.utils.env import ENCODING
-from acm_service.utils.dependencies import get_agent_service
+from acm_service.utils.database.session import create_unit_of_work
+from acm_service.utils.dependencies import get_background_agent_service
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -36,8 +37,9 @@ class EventConsumer:
         async with message.process():
             uuid = decode(message)
             logger.info(f'Receiving event to block agent: {uuid}')
-            controller = get_agent_service()
-            result = await controller.block_agent(uuid)
+            async with create_unit_of_work() as unit_of_work:
+                controller = get_background_agent_service(unit_of_work)
+                result = await controller.block_agent(uuid)
             logger.info(f'Receiving event to block agent: {uuid} with result: {result}')
 
     @staticmethod
@@ -45,8 +47,9 @@ class EventConsumer:
         async with message.process():
             uuid = decode(message)
             logger.info(f'Receiving event to block agent: {uuid}')
-            controller = get_agent_service()
-            result = await controller.unblock_agent(uuid)
+            async with create_unit_of_work() as unit_of_work:
+                controller = get_background_agent_service(unit_of_work)
+                result = await controller.unblock_agent(uuid)
             logger.info(f'Receiving event to unblock agent: {uuid} with result: {result}')
 
     async def consume_block_agent(self) -> None:
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from typing import List, Tuple
 from uuid import UUID
 
 from aio_pika import ExchangeType, Message, DeliveryMode
@@ -7,7 +8,7 @@ from aio_pika.abc import AbstractRobustConnection
 
 from acm_service.utils.logconf import DEFAULT_LOGGER
 from acm_service.utils.env import ENCODING, CLOUDAMQP_RETRIES, CLOUDAMQP_TIMEOUT
-from acm_service.accounts.schema import RegionEnum
+from acm_service.accounts.schema import RegionEnum, AccountWithoutAgents
 
 logger = logging.getLogger(DEFAULT_LOGGER)
 
@@ -49,7 +50,7 @@ class EventProducer:
 
     async def _send_customer_event(self, entity_uuid: UUID | None, routing_key: str) -> None:
         if self._connection is None:
-            logger.warning(f'Connection to event broker do not exists')
+            logger.warning('Connection to event broker do not exists')
             return
 
         exchange_name = 'topic_customers'
@@ -61,6 +62,25 @@ class EventProducer:
         await exchange.publish(message, routing_key=routing_key)
         logger.info(f'Sending the event with body={message_content} to routing key={routing_key}')
 
+    async def _send_customer_events(self, events: List[Tuple[UUID, str]]) -> None:
+        if self._connection is None:
+            logger.warning('Connection to event broker do not exists')
+            return
+
+        exchange_name = 'topic_customers'
+        async with self._connection.channel() as channel:
+            exchange = await channel.declare_exchange(name=exchange_name, type=ExchangeType.TOPIC)
+            for entity_uuid, routing_key in events:
+                message = Message(str(entity_uuid).encode(ENCODING), delivery_mode=DeliveryMode.PERSISTENT)
+                await exchange.publish(message, routing_key=routing_key)
+        logger.info(f'Sending the batch of {len(events)} events to {exchange_name}')
+
+    @staticmethod
+    def _account_routing_key(action: str, region: RegionEnum | None, vip: bool) -> str:
+        routing_key = f'{action}.account.{region.value if region else "*"}'
+        routing_key += '.vip' if vip else '.standard'
+        return routing_key
+
     @decorate_event
     async def block_agent(self, region: RegionEnum, agent_uuid: UUID) -> None:
         routing_key = f'block.agent.{region.value}'
@@ -71,6 +91,16 @@ class EventProducer:
         routing_key = f'unblock.agent.{region.value}'
         return await self._send_customer_event(agent_uuid, routing_key)
 
+    @decorate_event
+    async def block_agents(self, region: RegionEnum, agent_uuids: List[UUID]) -> None:
+        routing_key = f'block.agent.{region.value}'
+        return await self._send_customer_events([(agent_uuid, routing_key) for agent_uuid in agent_uuids])
+
+    @decorate_event
+    async def unblock_agents(self, region: RegionEnum, agent_uuids: List[UUID]) -> None:
+        routing_key = f'unblock.agent.{region.value}'
+        return await self._send_customer_events([(agent_uuid, routing_key) for agent_uuid in agent_uuids])
+
     @decorate_event
     async def create_agent(self, region: RegionEnum, agent_uuid: UUID) -> None:
         routing_key = f'create.agent.{region.value}'
@@ -82,17 +112,31 @@ class EventProducer:
         routing_key = f'delete.agent.{region.value if region else "*"}'
         return await self._send_customer_event(agent_uuid, routing_key)
 
+    @decorate_event
+    async def delete_agents(self, region: RegionEnum, agent_uuids: List[UUID]) -> None:
+        routing_key = f'delete.agent.{region.value}'
+        return await self._send_customer_events([(agent_uuid, routing_key) for agent_uuid in agent_uuids])
+
+    @decorate_event
+    async def create_agents(self, region: RegionEnum, agent_uuids: List[UUID]) -> None:
+        routing_key = f'create.agent.{region.value}'
+        return await self._send_customer_events([(agent_uuid, routing_key) for agent_uuid in agent_uuids])
+
     @decorate_event
     async def create_account(self, region: RegionEnum, account_uuid: UUID, vip: bool) -> None:
-        routing_key = f'create.account.{region.value}'
-        routing_key += '.vip' if vip else '.standard'
+        routing_key = self._account_routing_key('create', region, vip)
         return await self._send_customer_event(account_uuid, routing_key)
 
+    @decorate_event
+    async def create_accounts(self, accounts: List[AccountWithoutAgents]) -> None:
+        return await self._send_customer_events([(account.id, self._account_routing_key('create', account.region,
+                                                                                         account.vip))
+                                                 for account in accounts])
+
     @decorate_event
     async def delete_account(self, region: RegionEnum | None,
                              account_uuid: UUID | None, vip: bool) -> None:
-        routing_key = f'delete.account.{region.value if region else "*"}'
-        routing_key += '.vip' if vip else '.standard'
+        routing_key = self._account_routing_key('delete', region, vip)
         return await self._send_customer_event(account_uuid, routing_key)
 
 
@@ -0,0 +1,18 @@
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+
+from acm_service.utils.env import EXPORT_CHUNK_SIZE
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+async def to_ndjson(items: AsyncIterator[BaseModel], chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[str]:
+    chunk = []
+    async for item in items:
+        chunk.append(item.json())
+        if len(chunk) == chunk_size:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
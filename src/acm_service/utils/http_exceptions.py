@@ -1,6 +1,10 @@
 from fastapi import HTTPException
 from fastapi import status
 
+EMAIL_ALREADY_USED = 'E-mail is already used'
+ACCOUNT_BEING_DELETED = 'Account is being deleted'
+INVALID_CURSOR = 'Invalid cursor'
+
 
 def raise_not_found(detail: str = None):
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
@@ -11,7 +15,15 @@ def raise_bad_request(detail: str = None):
 
 
 def raise_email_already_used():
-    raise_bad_request('E-mail is already used')
+    raise_bad_request(EMAIL_ALREADY_USED)
+
+
+def raise_account_being_deleted():
+    raise_bad_request(ACCOUNT_BEING_DELETED)
+
+
+def raise_invalid_cursor():
+    raise_bad_request(INVALID_CURSOR)
 
 
 class InconsistencyException(Exception):
@@ -20,3 +32,11 @@ class InconsistencyException(Exception):
 
 class DuplicatedMailException(Exception):
     pass
+
+
+class InvalidCursorException(Exception):
+    pass
+
+
+class AccountBeingDeletedException(Exception):
+    pass
@@ -1,6 +1,16 @@
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Type, Sequence
+from fastapi_pagination.api import set_page
+from fastapi_pagination.cursor import CursorPage as BaseCursorPage, CursorParams as BaseCursorParams
 from fastapi_pagination.default import Page as BasePage, Params as BaseParams
+from fastapi_pagination.ext.async_sqlalchemy import paginate
 from fastapi import Query
+from pydantic.generics import GenericModel
+from sqlakeyset import InvalidPage
+from sqlalchemy.exc import DBAPIError, StatementError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from acm_service.utils.http_exceptions import InvalidCursorException
 
 T = TypeVar("T")
 
@@ -11,3 +21,43 @@ class Params(BaseParams):
 
 class Page(BasePage[T], Generic[T]):
     __params_type__ = Params
+
+
+class CursorParams(BaseCursorParams):
+    size: int = Query(500, ge=1, le=1_000, description="Page size")
+
+
+class CursorPage(BaseCursorPage[T], Generic[T]):
+    __params_type__ = CursorParams
+
+
+class SlicePage(GenericModel, Generic[T]):
+    """Page of a query too costly to count: no total, only whether another page follows."""
+    items: Sequence[T]
+    page: int
+    size: int
+    has_next: bool
+
+
+async def paginate_by_slice(session: AsyncSession, query: Select, params: Params, schema: Type[T]) -> SlicePage[T]:
+    # one row past the page tells whether a next page exists, instead of a COUNT over all the matches
+    offset = (params.page - 1) * params.size
+    rows = (await session.execute(query.offset(offset).limit(params.size + 1))).all()
+    return SlicePage[schema](items=[schema.from_orm(row) for row in rows[:params.size]], page=params.page,
+                             size=params.size, has_next=len(rows) > params.size)
+
+
+async def paginate_by_keyset(session: AsyncSession, query: Select, params: CursorParams,
+                             schema: Type[T]) -> CursorPage[T]:
+    """Raises InvalidCursorException when the cursor is no base64, no bookmark or a bookmark of another query."""
+    # the query has to be ordered by a unique set of columns, so the keyset (cursor) is never ambiguous
+    with set_page(CursorPage[schema]):
+        try:
+            return await paginate(session, query, params)
+        except DBAPIError:
+            raise
+        except (ValueError, InvalidPage, StatementError) as exc:
+            # StatementError: values of the bookmark that cannot be bound as the ordering columns
+            if not params.cursor:
+                raise
+            raise InvalidCursorException() from exc
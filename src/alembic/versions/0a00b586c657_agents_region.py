@@ -0,0 +1,42 @@
+# pylint: skip-file
+"""agents region
+
+Revision ID: 0a00b586c657
+Revises: c4798098598b
+Create Date: 2026-10-18 13:02:17.284113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a00b586c657'
+down_revision = 'c4798098598b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agents', sa.Column('region', sa.String(), nullable=True))
+    op.execute('UPDATE agents SET region = (SELECT accounts.region FROM accounts WHERE accounts.id = agents.account_id)')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('agents', 'region', nullable=False)
+        return
+
+    # batch mode does not carry expression indexes over to the copied table
+    op.drop_index('ix_agents_lower_email', table_name='agents')
+    with op.batch_alter_table('agents') as batch_op:
+        batch_op.alter_column('region', existing_type=sa.String(), nullable=False)
+    op.create_index('ix_agents_lower_email', 'agents', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_column('agents', 'region')
+        return
+
+    op.drop_index('ix_agents_lower_email', table_name='agents')
+    with op.batch_alter_table('agents') as batch_op:
+        batch_op.drop_column('region')
+    op.create_index('ix_agents_lower_email', 'agents', [sa.text('lower(email)')], unique=False)
@@ -0,0 +1,50 @@
+# pylint: skip-file
+"""search indexes
+
+PostgreSQL gets pg_trgm GIN indexes on names and e-mails. SQLite gets search_documents, a trigram FTS5 index over
+it and triggers on accounts and agents keeping both in sync. Batch mode recreates tables without their triggers,
+later SQLite batch migrations of accounts or agents have to recreate them.
+
+Revision ID: 5d2e8c1f4a7b
+Revises: b74d84bc7ca9
+Create Date: 2026-10-18 14:11:08.513347
+
+"""
+from alembic import op
+
+from acm_service.search.ddl import POSTGRESQL_SEARCH_DDL, SQLITE_SEARCH_DOCUMENTS_DDL, SQLITE_SEARCH_DROP_DDL, \
+    SEARCH_SOURCES, TRIGRAM_INDEXES, sqlite_document_backfill, sqlite_document_triggers, sqlite_drop_document_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8c1f4a7b'
+down_revision = 'b74d84bc7ca9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for statement in POSTGRESQL_SEARCH_DDL:
+            op.execute(statement)
+        return
+
+    for statement in SQLITE_SEARCH_DOCUMENTS_DDL:
+        op.execute(statement)
+    for table in SEARCH_SOURCES:
+        op.execute(sqlite_document_backfill(table))
+        for statement in sqlite_document_triggers(table):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, (table, _) in TRIGRAM_INDEXES.items():
+            op.drop_index(name, table_name=table)
+        return
+
+    for table in SEARCH_SOURCES:
+        for statement in sqlite_drop_document_triggers(table):
+            op.execute(statement)
+    for statement in SQLITE_SEARCH_DROP_DDL:
+        op.execute(statement)
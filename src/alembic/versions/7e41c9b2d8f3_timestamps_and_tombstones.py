@@ -0,0 +1,77 @@
+# pylint: skip-file
+"""timestamps and tombstones
+
+Revision ID: 7e41c9b2d8f3
+Revises: 5d2e8c1f4a7b
+Create Date: 2026-10-18 15:20:33.174902
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql as pg
+
+from acm_service.search.ddl import sqlite_document_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '7e41c9b2d8f3'
+down_revision = '5d2e8c1f4a7b'
+branch_labels = None
+depends_on = None
+
+TABLES = ('accounts', 'agents')
+TIMESTAMPS = ('created_at', 'updated_at')
+# batch mode does not carry expression indexes and triggers over to the copied table
+LOWER_EMAIL_INDEXES = {
+    'accounts': 'ix_accounts_lower_email',
+    'agents': 'ix_agents_lower_email',
+}
+
+
+def upgrade() -> None:
+    # existing rows are stamped with the time of the migration, SQLite only accepts a constant default here
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table in TABLES:
+        for column in TIMESTAMPS:
+            op.add_column(table, sa.Column(column, sa.DateTime(timezone=True), nullable=False,
+                                           server_default=f'{now}+00:00' if postgresql else now))
+            if postgresql:
+                op.alter_column(table, column, server_default=None)
+        if not postgresql:
+            drop_sqlite_defaults(table)
+        op.create_index(f'ix_{table}_updated_at_id', table, ['updated_at', 'id'], unique=False)
+
+    uuid_type = pg.UUID(as_uuid=True) if postgresql else sa.LargeBinary(16)
+    op.create_table('tombstones',
+                    sa.Column('ref_id', uuid_type, nullable=False),
+                    sa.Column('kind', sa.String(), nullable=False),
+                    sa.Column('account_id', uuid_type, nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('ref_id'))
+    op.create_index('ix_tombstones_deleted_at_ref_id', 'tombstones', ['deleted_at', 'ref_id'], unique=False)
+
+
+def drop_sqlite_defaults(table: str) -> None:
+    # the backfill default must not outlive the backfill, SQLite drops a default only by copying the table
+    op.drop_index(LOWER_EMAIL_INDEXES[table], table_name=table)
+    with op.batch_alter_table(table) as batch_op:
+        for column in TIMESTAMPS:
+            batch_op.alter_column(column, server_default=None)
+    op.create_index(LOWER_EMAIL_INDEXES[table], table, [sa.text('lower(email)')], unique=False)
+
+    # the triggers of revision 5d2e8c1f4a7b keeping the SQLite search documents in sync
+    for statement in sqlite_document_triggers(table):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tombstones_deleted_at_ref_id', table_name='tombstones')
+    op.drop_table('tombstones')
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_updated_at_id', table_name=table)
+        for column in TIMESTAMPS:
+            # native DROP COLUMN (SQLite 3.35+), batch mode would drop the search triggers
+            op.drop_column(table, column)
@@ -0,0 +1,29 @@
+# pylint: skip-file
+"""agents account and email indexes
+
+Revision ID: 9a6f1b0d59e4
+Revises: f050e897bfae
+Create Date: 2026-10-18 11:34:52.906611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6f1b0d59e4'
+down_revision = 'f050e897bfae'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_agents_account_id_name', 'agents', ['account_id', 'name'], unique=False)
+    op.create_index('ix_agents_lower_email', 'agents', [sa.text('lower(email)')], unique=False)
+    op.create_index('ix_accounts_lower_email', 'accounts', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_accounts_lower_email', table_name='accounts')
+    op.drop_index('ix_agents_lower_email', table_name='agents')
+    op.drop_index('ix_agents_account_id_name', table_name='agents')
@@ -0,0 +1,107 @@
+# pylint: skip-file
+"""partition accounts and agents by region
+
+Optional, PostgreSQL only: runs when asked for with `alembic -x partition_by_region=true upgrade head`
+(and the same flag on downgrade), otherwise the revision is a no-op. To partition a database that is already
+past this revision, downgrade to 0a00b586c657 and upgrade again with the flag.
+
+Both tables are list-partitioned by region, so the region becomes part of their primary keys and of the
+agents -> accounts foreign key. A partitioned table cannot have a unique constraint without the region, so e-mails
+are claimed (lower-cased) in the non-partitioned account_emails and agent_emails tables, kept by triggers in the
+same statement: a taken e-mail still fails the insert with a unique violation.
+
+Revision ID: b74d84bc7ca9
+Revises: 0a00b586c657
+Create Date: 2026-10-18 13:05:41.609271
+
+"""
+from alembic import op, context
+
+
+# revision identifiers, used by Alembic.
+revision = 'b74d84bc7ca9'
+down_revision = '0a00b586c657'
+branch_labels = None
+depends_on = None
+
+REGIONS = ('emea', 'nam', 'apac')
+TABLES = ('accounts', 'agents')
+CLAIMS = {'accounts': 'account_emails', 'agents': 'agent_emails'}
+
+
+def enabled() -> bool:
+    return op.get_bind().dialect.name == 'postgresql' and \
+        context.get_x_argument(as_dictionary=True).get('partition_by_region', '').lower() == 'true'
+
+
+def upgrade() -> None:
+    if enabled():
+        rebuild(partitioned=True)
+        for table, claims in CLAIMS.items():
+            claim_emails(table, claims)
+
+
+def downgrade() -> None:
+    if enabled():
+        for claims in CLAIMS.values():
+            # the triggers go with their functions
+            op.execute(f'DROP FUNCTION {claims}_claim() CASCADE')
+            op.execute(f'DROP FUNCTION {claims}_truncate() CASCADE')
+            op.execute(f'DROP TABLE {claims}')
+        rebuild(partitioned=False)
+
+
+def rebuild(partitioned: bool) -> None:
+    """Copies both tables into new (un)partitioned ones, constraints and indexes are recreated on the copies."""
+    for table in TABLES:
+        op.execute(f'CREATE TABLE {table}_new (LIKE {table} INCLUDING DEFAULTS)'
+                   f'{" PARTITION BY LIST (region)" if partitioned else ""}')
+        if partitioned:
+            for region in REGIONS:
+                op.execute(f"CREATE TABLE {table}_{region} PARTITION OF {table}_new FOR VALUES IN ('{region}')")
+        op.execute(f'INSERT INTO {table}_new SELECT * FROM {table}')
+
+    for table in reversed(TABLES):
+        op.execute(f'DROP TABLE {table}')
+    for table in TABLES:
+        op.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+    key = ', region' if partitioned else ''
+    for table in TABLES:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id{key})')
+        if not partitioned:
+            op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_email_key UNIQUE (email)')
+        op.create_index(f'ix_{table}_id', table, ['id'], unique=False)
+        op.execute(f'CREATE INDEX ix_{table}_lower_email ON {table} (lower(email))')
+    op.create_index('ix_accounts_region_vip_name', 'accounts', ['region', 'vip', 'name'], unique=False)
+    op.create_index('ix_agents_account_id_name', 'agents', ['account_id', 'name'], unique=False)
+    op.execute(f'ALTER TABLE agents ADD CONSTRAINT agents_account_id_fkey FOREIGN KEY (account_id{key}) '
+               f'REFERENCES accounts (id{key}) ON DELETE CASCADE')
+
+
+def claim_emails(table: str, claims: str) -> None:
+    """E-mails of the table are unique across all partitions through the primary key of the claims table."""
+    op.execute(f'CREATE TABLE {claims} (email VARCHAR PRIMARY KEY, id UUID NOT NULL)')
+    op.execute(f'INSERT INTO {claims} SELECT lower(email), id FROM {table} WHERE email IS NOT NULL')
+    op.execute(f"""
+        CREATE FUNCTION {claims}_claim() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.email IS NOT NULL THEN
+                DELETE FROM {claims} WHERE email = lower(OLD.email) AND id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.email IS NOT NULL THEN
+                INSERT INTO {claims} (email, id) VALUES (lower(NEW.email), NEW.id);
+            END IF;
+            RETURN NULL;
+        END $$""")
+    op.execute(f'CREATE TRIGGER {claims}_claim AFTER INSERT OR DELETE OR UPDATE OF email ON {table} '
+               f'FOR EACH ROW EXECUTE FUNCTION {claims}_claim()')
+    # row triggers do not fire on TRUNCATE (the erase endpoint)
+    op.execute(f"""
+        CREATE FUNCTION {claims}_truncate() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            TRUNCATE TABLE {claims};
+            RETURN NULL;
+        END $$""")
+    op.execute(f'CREATE TRIGGER {claims}_truncate AFTER TRUNCATE ON {table} '
+               f'FOR EACH STATEMENT EXECUTE FUNCTION {claims}_truncate()')
@@ -0,0 +1,72 @@
+# pylint: skip-file
+"""native uuid columns
+
+Revision ID: c4798098598b
+Revises: 9a6f1b0d59e4
+Create Date: 2026-10-18 12:20:41.530927
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4798098598b'
+down_revision = '9a6f1b0d59e4'
+branch_labels = None
+depends_on = None
+
+UUID_COLUMNS = {
+    'accounts': ['id'],
+    'agents': ['id', 'account_id'],
+    'account_deletions': ['account_id'],
+}
+# batch mode does not carry expression indexes over to the copied table
+LOWER_EMAIL_INDEXES = {
+    'accounts': 'ix_accounts_lower_email',
+    'agents': 'ix_agents_lower_email',
+}
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        alter_postgresql(postgresql.UUID(as_uuid=True), '{column}::uuid')
+    else:
+        alter_sqlite(sa.LargeBinary(16), lambda value: uuid.UUID(value).bytes)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        alter_postgresql(sa.String(), '{column}::text')
+    else:
+        alter_sqlite(sa.String(), lambda value: str(uuid.UUID(bytes=value)))
+
+
+def alter_postgresql(type_, using: str) -> None:
+    op.drop_constraint('agents_account_id_fkey', 'agents', type_='foreignkey')
+    for table, columns in UUID_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column, type_=type_, postgresql_using=using.format(column=column))
+    op.create_foreign_key('agents_account_id_fkey', 'agents', 'accounts', ['account_id'], ['id'], ondelete='CASCADE')
+
+
+def alter_sqlite(type_, convert) -> None:
+    # values are converted first, SQLite keeps them as stored while batch mode copies the table with the new type
+    bind = op.get_bind()
+    for table, columns in UUID_COLUMNS.items():
+        for column in columns:
+            values = bind.execute(sa.text(f'SELECT DISTINCT {column} FROM {table}')).scalars().all()
+            if values:
+                bind.execute(sa.text(f'UPDATE {table} SET {column} = :new WHERE {column} = :old'),
+                             [{'new': convert(value), 'old': value} for value in values])
+
+        if table in LOWER_EMAIL_INDEXES:
+            op.drop_index(LOWER_EMAIL_INDEXES[table], table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=type_)
+        if table in LOWER_EMAIL_INDEXES:
+            op.create_index(LOWER_EMAIL_INDEXES[table], table, [sa.text('lower(email)')], unique=False)
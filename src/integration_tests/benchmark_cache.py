@@ -0,0 +1,104 @@
+"""Concurrent cache throughput of a single connection client vs the pooled client used by the service.
+
+Needs a running Redis, keys written by the benchmark are prefixed with `Benchmark:` and removed afterwards:
+    REDIS_URL=localhost REDIS_PORT=6379 BENCHMARK_WORKERS=64 python -m integration_tests.benchmark_cache
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import timedelta
+
+from aioredis import Redis
+from aioredis.exceptions import ConnectionError as RedisConnectionError
+
+from acm_service.utils.cache.connection import connect_to_redis
+from acm_service.utils.cache.repositories import Cache
+from acm_service.utils.env import REDIS_URL, REDIS_PORT
+
+WORKERS = int(os.environ.get('BENCHMARK_WORKERS', 64))
+DURATION = float(os.environ.get('BENCHMARK_DURATION_IN_SECONDS', 10))
+KEYS = 10_000
+BATCH = 100
+NAMESPACE = 'Benchmark'
+EXPIRATION = timedelta(minutes=5)
+
+
+async def seed(redis: Redis) -> None:
+    cache = Cache()
+    cache.connect_to_cache_service(redis)
+    for start in range(0, KEYS, 1_000):
+        await cache.set_many(NAMESPACE, {str(x): f'value_{x}' for x in range(start, start + 1_000)}, EXPIRATION)
+
+
+async def run(name: str, operation) -> None:
+    count = 0
+    errors = 0
+    latencies = []
+    deadline = time.perf_counter() + DURATION
+
+    async def worker():
+        nonlocal count, errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                keys = await operation()
+            except RedisConnectionError:
+                # no free connection within REDIS_POOL_TIMEOUT
+                errors += 1
+                continue
+            count += keys
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(WORKERS)))
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    print(f'{name:>36}: {count / DURATION:>9.0f} keys/s, p99 latency {p99:6.1f} ms, {errors} pool timeouts')
+
+
+async def benchmark(name: str, redis: Redis) -> None:
+    cache = Cache()
+    cache.connect_to_cache_service(redis)
+
+    async def get():
+        await cache.get(NAMESPACE, str(random.randrange(KEYS)))
+        return 1
+
+    async def get_many():
+        await cache.get_many(NAMESPACE, [str(random.randrange(KEYS)) for _ in range(BATCH)])
+        return BATCH
+
+    async def set_and_expire():
+        # the former Cache.set: SET and EXPIRE as two round trips
+        key = f'{NAMESPACE}:{random.randrange(KEYS)}'
+        await redis.set(key, 'value')
+        await redis.expire(key, EXPIRATION)
+        return 1
+
+    async def set_ex():
+        await cache.set(NAMESPACE, str(random.randrange(KEYS)), 'value', EXPIRATION)
+        return 1
+
+    await run(f'{name} get', get)
+    await run(f'{name} get_many({BATCH})', get_many)
+    await run(f'{name} SET + EXPIRE', set_and_expire)
+    await run(f'{name} SET EX', set_ex)
+
+
+async def main() -> None:
+    pooled = await connect_to_redis(REDIS_URL, REDIS_PORT, retries=1)
+    if pooled is None:
+        raise SystemExit(f'Redis is not available at {REDIS_URL}:{REDIS_PORT}')
+    single = Redis(host=REDIS_URL, port=REDIS_PORT, decode_responses=True, single_connection_client=True)
+
+    await seed(pooled)
+    await benchmark('single connection', single)
+    await benchmark('pool', pooled)
+
+    await pooled.delete(*[key async for key in pooled.scan_iter(match=f'{NAMESPACE}:*')])
+    await single.close()
+    await pooled.connection_pool.disconnect()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
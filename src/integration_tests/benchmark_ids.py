@@ -0,0 +1,68 @@
+"""Insert throughput of random (uuid4) vs time-ordered (uuid7) primary keys on a growing table.
+
+Runs against a scratch database, the benchmark tables are created and dropped:
+    BENCHMARK_DB_URL=postgresql+asyncpg://... BENCHMARK_ROWS=2000000 python -m integration_tests.benchmark_ids
+"""
+import asyncio
+import os
+import time
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy import MetaData, Table, Column, String, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+from acm_service.utils.database.ids import ID_GENERATORS
+from acm_service.utils.database.types import UUIDType
+
+DB_URL = os.environ.get('BENCHMARK_DB_URL', 'sqlite+aiosqlite:///./benchmark_ids.db')
+ROWS = int(os.environ.get('BENCHMARK_ROWS', 1_000_000))
+BATCH = int(os.environ.get('BENCHMARK_BATCH', 5_000))
+REPORTS = 10
+
+
+async def index_size(engine: AsyncEngine, table: Table) -> str:
+    if engine.dialect.name != 'postgresql':
+        return 'n/a'
+    async with engine.connect() as connection:
+        size = await connection.scalar(text(f"SELECT pg_relation_size('{table.name}_pkey')"))
+    return f'{size / 2 ** 20:.1f} MiB'
+
+
+async def benchmark(engine: AsyncEngine, name: str, generate_id: Callable[[], UUID]) -> None:
+    table = Table(f'benchmark_{name}', MetaData(), Column('id', UUIDType, primary_key=True),
+                  Column('name', String), Column('email', String))
+    async with engine.begin() as connection:
+        await connection.run_sync(table.metadata.drop_all)
+        await connection.run_sync(table.metadata.create_all)
+
+    inserted = last_reported = 0
+    started = report_started = time.perf_counter()
+    report_every = max(ROWS // REPORTS, BATCH)
+    while inserted < ROWS:
+        rows = [{'id': generate_id(), 'name': f'agent_{inserted + x}', 'email': f'agent_{inserted + x}@gmail.com'}
+                for x in range(min(BATCH, ROWS - inserted))]
+        async with engine.begin() as connection:
+            await connection.execute(insert(table), rows)
+        inserted += len(rows)
+        if inserted % report_every < BATCH or inserted == ROWS:
+            now = time.perf_counter()
+            rate = (inserted - last_reported) / (now - report_started)
+            print(f'{name}: {inserted:>10} rows, last {rate:>10.0f} rows/s')
+            report_started, last_reported = now, inserted
+
+    elapsed = time.perf_counter() - started
+    print(f'{name}: {ROWS / elapsed:.0f} rows/s overall, primary key index {await index_size(engine, table)}')
+    async with engine.begin() as connection:
+        await connection.run_sync(table.metadata.drop_all)
+
+
+async def main() -> None:
+    engine = create_async_engine(DB_URL)
+    for name, generate_id in ID_GENERATORS.items():
+        await benchmark(engine, name, generate_id)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Latency of GET /search backed by the search indexes (pg_trgm on PostgreSQL, FTS5 on SQLite).
+
+Runs against a scratch database, the benchmark tables are created and dropped:
+    BENCHMARK_DB_URL=postgresql+asyncpg://... BENCHMARK_ROWS=2000000 python -m integration_tests.benchmark_search
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+import namegenerator
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.accounts.schema import RegionEnum
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.search.repository import SearchRepository
+from acm_service.utils.database.session import Base, UnitOfWork
+from acm_service.utils.pagination import Params
+
+DB_URL = os.environ.get('BENCHMARK_DB_URL', 'sqlite+aiosqlite:///./benchmark_search.db')
+ROWS = int(os.environ.get('BENCHMARK_ROWS', 1_000_000))
+BATCH = int(os.environ.get('BENCHMARK_BATCH', 10_000))
+SEARCHES = int(os.environ.get('BENCHMARK_SEARCHES', 200))
+AGENTS_PER_ACCOUNT = 10
+
+
+async def seed(engine: AsyncEngine) -> None:
+    regions = list(RegionEnum)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    inserted = 0
+    while inserted < ROWS:
+        accounts, agents = [], []
+        for x in range(inserted, min(inserted + BATCH, ROWS), AGENTS_PER_ACCOUNT + 1):
+            account_id, region = uuid.uuid4(), regions[x % len(regions)]
+            accounts.append({'id': account_id, 'name': namegenerator.gen(), 'email': f'account_{x}@gmail.com',
+                             'region': region, 'vip': x % 2 == 0})
+            agents += [{'id': uuid.uuid4(), 'name': namegenerator.gen(), 'email': f'agent_{x}_{y}@gmail.com',
+                        'account_id': account_id, 'region': region, 'blocked': False}
+                       for y in range(AGENTS_PER_ACCOUNT)]
+        async with engine.begin() as connection:
+            await connection.execute(insert(AccountDB), accounts)
+            await connection.execute(insert(AgentDB), agents)
+        inserted += len(accounts) + len(agents)
+    print(f'seeded {inserted} rows')
+
+
+async def benchmark(engine: AsyncEngine) -> None:
+    latencies = []
+    async with AsyncSession(engine) as session:
+        repository = SearchRepository(UnitOfWork(session))
+        for _ in range(SEARCHES):
+            phrase = random.choice([namegenerator.gen().split('-')[0], f'agent_{random.randint(0, ROWS)}'])
+            started = time.perf_counter()
+            await repository.search(phrase, Params(page=1, size=20))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f'{SEARCHES} searches: p50 {statistics.median(latencies):.1f} ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms, max {latencies[-1]:.1f} ms')
+
+
+async def main() -> None:
+    engine = create_async_engine(DB_URL)
+    await seed(engine)
+    await benchmark(engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
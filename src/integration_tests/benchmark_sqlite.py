@@ -0,0 +1,90 @@
+"""Concurrent read/write throughput of the default SQLite setup vs the tuned profile (WAL, one writer, readers).
+
+Runs against a scratch database file which is removed afterwards:
+    BENCHMARK_DB_FILE=./benchmark_sqlite.db BENCHMARK_WORKERS=32 python -m integration_tests.benchmark_sqlite
+"""
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from acm_service.utils.database.session import create_engines
+
+DB_FILE = os.environ.get('BENCHMARK_DB_FILE', './benchmark_sqlite.db')
+WORKERS = int(os.environ.get('BENCHMARK_WORKERS', 32))
+DURATION = float(os.environ.get('BENCHMARK_DURATION_IN_SECONDS', 10))
+WRITE_RATIO = float(os.environ.get('BENCHMARK_WRITE_RATIO', 0.2))
+SEED_ROWS = 10_000
+
+table = Table('benchmark_sqlite', MetaData(), Column('id', Integer, primary_key=True),
+              Column('name', String), Column('email', String))
+
+
+@dataclass
+class Counters:
+    reads: int = 0
+    writes: int = 0
+    locked: int = 0
+    read_latency_max_ms: float = 0.0
+
+
+def remove_database() -> None:
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(DB_FILE + suffix):
+            os.remove(DB_FILE + suffix)
+
+
+async def seed(engine: AsyncEngine) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(table.metadata.create_all)
+        await connection.execute(insert(table), [{'name': f'agent_{x}', 'email': f'agent_{x}@gmail.com'}
+                                                 for x in range(SEED_ROWS)])
+
+
+async def worker(engine: AsyncEngine, read_engine: AsyncEngine, deadline: float, counters: Counters) -> None:
+    while time.perf_counter() < deadline:
+        try:
+            if random.random() < WRITE_RATIO:
+                async with engine.begin() as connection:
+                    await connection.execute(insert(table).values(name='agent', email='agent@gmail.com'))
+                counters.writes += 1
+            else:
+                started = time.perf_counter()
+                async with read_engine.connect() as connection:
+                    await connection.execute(select(table).where(table.c.id == random.randint(1, SEED_ROWS)))
+                counters.reads += 1
+                counters.read_latency_max_ms = max(counters.read_latency_max_ms,
+                                                   (time.perf_counter() - started) * 1000)
+        except OperationalError:
+            counters.locked += 1
+
+
+async def benchmark(name: str, sqlite_profile: bool) -> None:
+    remove_database()
+    engine, read_engine = create_engines(f'sqlite+aiosqlite:///{DB_FILE}', sqlite_profile=sqlite_profile)
+    await seed(engine)
+
+    counters = Counters()
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(*(worker(engine, read_engine or engine, deadline, counters) for _ in range(WORKERS)))
+    print(f'{name}: {counters.reads / DURATION:>8.0f} reads/s, {counters.writes / DURATION:>6.0f} writes/s, '
+          f'{counters.locked} lock errors, max read latency {counters.read_latency_max_ms:.0f} ms')
+
+    await engine.dispose()
+    if read_engine:
+        await read_engine.dispose()
+    remove_database()
+
+
+async def main() -> None:
+    await benchmark('default', sqlite_profile=False)
+    await benchmark('profile', sqlite_profile=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'postgresql: runs against the PostgreSQL database of the integration setup')
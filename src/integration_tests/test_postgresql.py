@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import text, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from sqlalchemy.future import select
+
+from acm_service.accounts.repository import AccountRepository
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.agents.repository import AgentRepository
+from acm_service.changes.model import Tombstone as TombstoneDB
+from acm_service.utils.database.session import UnitOfWork
+from integration_tests.env import POSTGRESQL_URL
+from unit_tests.test_query_plans import ACCOUNT_ID, HOT_QUERIES, seed
+
+pytestmark = pytest.mark.postgresql
+
+SEQUENTIAL_SCANS = text('SELECT coalesce(sum(seq_scan), 0) FROM pg_stat_xact_user_tables')
+
+
+@asynccontextmanager
+async def rolled_back_session() -> AsyncSession:
+    """Session on the migrated schema whose writes are rolled back, the database is shared with the backend."""
+    engine = create_async_engine(POSTGRESQL_URL)
+    try:
+        async with AsyncSession(engine) as session:
+            try:
+                yield session
+            finally:
+                await session.rollback()
+    finally:
+        await engine.dispose()
+
+
+async def sequential_scans(hot_query) -> int:
+    async with rolled_back_session() as session:
+        seed(session)
+        await session.flush()
+
+        # a table without a usable index is still scanned, whatever the cost
+        await session.execute(text('SET LOCAL enable_seqscan = off'))
+        before = await session.scalar(SEQUENTIAL_SCANS)
+        unit_of_work = UnitOfWork(session)
+        await hot_query(AccountRepository(unit_of_work), AgentRepository(unit_of_work))
+        return await session.scalar(SEQUENTIAL_SCANS) - before
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES.keys())
+def test_hot_query_does_not_scan_table(name):
+    #   given
+    hot_query = HOT_QUERIES[name]
+
+    #   when
+    scans = asyncio.run(sequential_scans(hot_query))
+
+    #   then
+    assert scans == 0
+
+
+async def delete_account() -> tuple:
+    """Deletes the seeded account through the DELETE ... RETURNING statement relying on ON DELETE CASCADE."""
+    async with rolled_back_session() as session:
+        seed(session)
+        await session.flush()
+        agent_ids = set((await session.scalars(select(AgentDB.id).where(AgentDB.account_id == ACCOUNT_ID))).all())
+
+        repository = AccountRepository(UnitOfWork(session))
+        deleted = await repository.delete(ACCOUNT_ID)
+        missing = await repository.delete(uuid4())
+        remaining = await session.scalar(select(func.count()).where(AgentDB.account_id == ACCOUNT_ID))
+        tombstones = set((await session.scalars(select(TombstoneDB.ref_id).
+                                                where(TombstoneDB.account_id == ACCOUNT_ID))).all())
+        return agent_ids, deleted, missing, remaining, tombstones
+
+
+def test_delete_returns_the_agents_removed_by_the_cascade():
+    #   when
+    agent_ids, deleted, missing, remaining, tombstones = asyncio.run(delete_account())
+
+    #   then
+    assert deleted.id == ACCOUNT_ID
+    assert len(agent_ids) > 0
+    assert set(deleted.agent_ids) == agent_ids
+    assert missing is None
+    assert remaining == 0
+    assert tombstones == agent_ids | {ACCOUNT_ID}
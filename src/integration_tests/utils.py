@@ -59,8 +59,8 @@ class RestClient:
     async def get_amount_of_agents(self, account: str) -> int:
         async with aiohttp.ClientSession(headers=
                                          {'x-token': self._token}) as session:
-            response = await session.get(f'{self._url}/accounts/{account}/agents')
-            return (await response.json())['total']
+            response = await session.get(f'{self._url}/accounts/{account}/stats')
+            return (await response.json())['agents']
 
     async def clear_accounts(self) -> None:
         async with aiohttp.ClientSession(headers=
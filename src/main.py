@@ -9,8 +9,10 @@ from fastapi_pagination import add_pagination
 from scout_apm.api import Config
 from scout_apm.async_.starlette import ScoutMiddleware
 
-from acm_service.accounts.route import router as account_router
+from acm_service.accounts.route import router as account_router, stats_router
 from acm_service.agents.route import router as agent_router
+from acm_service.search.route import router as search_router
+from acm_service.changes.route import router as changes_router
 from acm_service.utils.dev_controller import router as dev_router
 from acm_service.utils.env import PORT, REDIS_URL
 from acm_service.utils.dependencies import get_event_broker_connection, \
@@ -36,6 +38,9 @@ app = FastAPI(
 app.include_router(account_router)
 app.include_router(agent_router)
 app.include_router(dev_router)
+app.include_router(stats_router)
+app.include_router(search_router)
+app.include_router(changes_router)
 
 Config.set(
     key=SCOUT_KEY,
@@ -78,6 +83,7 @@ async def prepare_cache():
         return
 
     Cache.get_instance().connect_to_cache_service(cache_connection)
+    await Cache.get_instance().start_invalidation_listener()
     app.dependency_overrides[get_agent_service] = get_agent_service_with_cache
     app.dependency_overrides[get_account_service] = get_account_service_with_cache
     logger.info('Cache is ready')
@@ -105,6 +111,7 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await Cache.get_instance().stop_invalidation_listener()
     if ENABLE_EVENTS:
         await disconnect_event_broker(producer_connection)
         await disconnect_event_broker(consumer_connection)
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from acm_service.accounts.model import AccountDeletion as AccountDeletionDB
+from acm_service.accounts.repository import AccountRepository
+from acm_service.accounts.schema import DeletionStatusEnum
+from acm_service.utils.database.repository import utc_now
+from acm_service.utils.database.session import Base, UnitOfWork
+from acm_service.utils.env import ACCOUNT_DELETION_LEASE_IN_SECONDS
+
+
+async def claims(heartbeat_age: timedelta) -> tuple:
+    """Claims a deletion twice, then once more after its heartbeat was moved back by the given age."""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        accounts = AccountRepository(UnitOfWork(session))
+        account = await accounts.create(name='account', email='account@gmail.com', region='nam', vip=False)
+        await accounts.start_deletion(account)
+        first = await accounts.claim_deletion(account.id)
+        second = await accounts.claim_deletion(account.id)
+        await session.execute(update(AccountDeletionDB).values(heartbeat_at=utc_now() - heartbeat_age))
+        after_heartbeat = await accounts.claim_deletion(account.id)
+    await engine.dispose()
+    return first, second, after_heartbeat
+
+
+def test_running_deletion_is_not_claimed_within_its_lease():
+    #   when
+    result = asyncio.run(claims(timedelta(seconds=1)))
+
+    #   then
+    assert result == (True, False, False)
+
+
+def test_abandoned_deletion_is_claimed_again():
+    #   when
+    result = asyncio.run(claims(timedelta(seconds=ACCOUNT_DELETION_LEASE_IN_SECONDS + 1)))
+
+    #   then
+    assert result == (True, False, True)
+
+
+def test_deletion_scheduled_concurrently_is_returned():
+    #   given
+    async def scenario():
+        engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        async with AsyncSession(engine) as session:
+            accounts = AccountRepository(UnitOfWork(session))
+            account = await accounts.create(name='account', email='account@gmail.com', region='nam', vip=False)
+            first = await accounts.start_deletion(account)
+            await accounts.claim_deletion(account.id)
+            second = await accounts.start_deletion(account)
+        await engine.dispose()
+        return first, second
+
+    #   when
+    first, second = asyncio.run(scenario())
+
+    #   then
+    assert first.status == DeletionStatusEnum.pending
+    assert second.status == DeletionStatusEnum.running
@@ -7,9 +7,10 @@ import namegenerator
 import pytest
 from pydantic import ValidationError
 
-from acm_service.accounts.schema import RegionEnum
+from acm_service.accounts.schema import RegionEnum, AccountCreate, DeletionStatusEnum
 from acm_service.accounts.service import AccountService
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.agents.schema import AgentStats
+from acm_service.utils.http_exceptions import DuplicatedMailException, EMAIL_ALREADY_USED
 
 from unit_tests.utils import RabbitProducerStub, AgentRepositoryStub, AccountRepositoryStub
 
@@ -90,21 +91,145 @@ def test_delete_account(mocked_method, account_name, account_email, account_serv
     vip = True
     created = asyncio.run(account_service.create_account(account_name, account_email, region, vip))
 
+    asyncio.run(account_service.schedule_delete(created.id))
+
     #   when
-    asyncio.run(account_service.delete(created.id))
+    finished = asyncio.run(account_service.delete_chunk(created.id))
 
     #   then
+    assert finished
     mocked_method.assert_called_with(ANY, region=region, account_uuid=created.id, vip=vip)
     assert asyncio.run(account_service.get(created.id)) is None
 
 
-def test_delete_not_existing_account(account_service):
+@mock.patch('acm_service.accounts.service.ACCOUNT_DELETION_CHUNK_SIZE', 2)
+@mock.patch.object(RabbitProducerStub, 'delete_agents', autospec=True)
+def test_delete_account_in_chunks(mocked_method, account_name, account_email):
     #   given
-    random_account = uuid.uuid4()
+    accounts = AccountRepositoryStub()
+    agents = AgentRepositoryStub(accounts)
+    account_service = AccountService(agents, accounts, RabbitProducerStub())
+    created = asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.apac, True))
+    for i in range(3):
+        asyncio.run(agents.create(name='agent', email=f'agent_{i}_{account_email}', account_id=created.id,
+                                  blocked=False))
 
-    #   when && then
-    with pytest.raises(InconsistencyException):
-        asyncio.run(account_service.delete(random_account))
+    #   when
+    scheduled = asyncio.run(account_service.schedule_delete(created.id)).status
+    chunks = 1
+    while not asyncio.run(account_service.delete_chunk(created.id)):
+        chunks += 1
+
+    #   then
+    deletion = asyncio.run(account_service.get_deletion(created.id))
+    assert scheduled == DeletionStatusEnum.pending
+    assert chunks == 3
+    assert mocked_method.call_count == 2
+    assert deletion.status == DeletionStatusEnum.done
+    assert deletion.agents_deleted == 3
+    assert asyncio.run(account_service.get(created.id)) is None
+
+
+def test_delete_chunk_reads_deletion_from_primary(account_name, account_email, account_service):
+    #   given
+    created = asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.apac, True))
+    asyncio.run(account_service.schedule_delete(created.id))
+
+    #   when
+    with mock.patch.object(AccountRepositoryStub, 'get_deletion', autospec=True,
+                           side_effect=AccountRepositoryStub.get_deletion) as get_deletion:
+        asyncio.run(account_service.delete_chunk(created.id))
+
+    #   then
+    get_deletion.assert_called_once_with(ANY, created.id, primary=True)
+
+
+@mock.patch.object(RabbitProducerStub, 'delete_account', autospec=True)
+def test_delete_chunk_of_erased_deletion_finishes(mocked_method, account_service):
+    #   when
+    finished = asyncio.run(account_service.delete_chunk(uuid.uuid4()))
+
+    #   then
+    assert finished
+    mocked_method.assert_not_called()
+
+
+def test_schedule_delete_not_existing_account(account_service):
+    #   when
+    result = asyncio.run(account_service.schedule_delete(uuid.uuid4()))
+
+    #   then
+    assert result is None
+
+
+def test_deletion_is_claimed_once_until_it_fails(account_name, account_email, account_service):
+    #   given
+    created = asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.emea, False))
+    asyncio.run(account_service.schedule_delete(created.id))
+
+    #   when
+    first = asyncio.run(account_service.claim_deletion(created.id))
+    second = asyncio.run(account_service.claim_deletion(created.id))
+    asyncio.run(account_service.fail_deletion(created.id))
+    after_failure = asyncio.run(account_service.claim_deletion(created.id))
+
+    #   then
+    assert (first, second, after_failure) == (True, False, True)
+
+
+def test_get_stats(account_name, account_email):
+    #   given
+    accounts = AccountRepositoryStub()
+    agents = AgentRepositoryStub(accounts)
+    account_service = AccountService(agents, accounts, RabbitProducerStub())
+    created = asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.apac, True))
+    asyncio.run(account_service.create_account(account_name, f'other_{account_email}', RegionEnum.apac, True))
+    for i in range(3):
+        asyncio.run(agents.create(name='agent', email=f'agent_{i}_{account_email}', account_id=created.id,
+                                  blocked=i == 0))
+
+    #   when
+    account_stats = asyncio.run(account_service.get_stats(created.id))
+    stats = asyncio.run(account_service.get_global_stats())
+
+    #   then
+    assert (account_stats.agents, account_stats.blocked_agents) == (3, 1)
+    assert (stats.accounts, stats.agents, stats.blocked_agents) == (2, 3, 1)
+    assert [(x.region, x.vip, x.accounts) for x in stats.accounts_by_region] == [(RegionEnum.apac, True, 2)]
+
+
+@mock.patch.object(AgentRepositoryStub, 'get_stats', autospec=True)
+def test_get_stats_scoped_to_account_region(mocked_get_stats, account_name, account_email, account_service):
+    #   given
+    created = asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.nam, False))
+    mocked_get_stats.return_value = AgentStats()
+
+    #   when
+    asyncio.run(account_service.get_stats(created.id))
+
+    #   then
+    mocked_get_stats.assert_called_once_with(ANY, account_id=created.id, region=RegionEnum.nam)
+
+
+def test_get_stats_for_not_existing_account(account_service):
+    #   when
+    result = asyncio.run(account_service.get_stats(uuid.uuid4()))
+
+    #   then
+    assert result is None
+
+
+def test_erase(account_name, account_email, account_service):
+    #   given
+    asyncio.run(account_service.create_account(account_name, account_email, RegionEnum.emea, False))
+
+    #   when
+    result = asyncio.run(account_service.erase())
+
+    #   then
+    assert result.rows_removed == {'accounts': 1}
+    assert result.duration_ms >= 0
+    assert asyncio.run(account_service.get_all()) == []
 
 
 def test_read_accounts(account_name, account_email, account_service):
@@ -120,3 +245,60 @@ def test_read_accounts(account_name, account_email, account_service):
 
     #   then
     assert how_many == len(result)
+
+
+@mock.patch.object(RabbitProducerStub, 'create_accounts', autospec=True)
+def test_create_accounts(mocked_method, account_name, account_email, account_service):
+    #   given
+    region = RegionEnum.apac
+    asyncio.run(account_service.create_account(account_name, account_email, region, False))
+    accounts = [AccountCreate(name=account_name, email=account_email, region=region, vip=False),
+                AccountCreate(name=account_name, email='1' + account_email, region=region, vip=True),
+                AccountCreate(name=account_name, email='1' + account_email, region=region, vip=True),
+                AccountCreate(name=account_name, email='2' + account_email, region=region, vip=False)]
+
+    #   when
+    result = asyncio.run(account_service.create_accounts(accounts))
+
+    #   then
+    assert [x.error for x in result] == [EMAIL_ALREADY_USED, None, EMAIL_ALREADY_USED, None]
+    assert result[0].account is None
+    assert result[1].account.email == '1' + account_email
+    assert result[1].account.vip is True
+    assert asyncio.run(account_service.get(result[3].account.id)) == result[3].account
+    mocked_method.assert_called_once_with(ANY, [result[1].account, result[3].account])
+
+
+@mock.patch.object(RabbitProducerStub, 'create_accounts', autospec=True)
+@mock.patch.object(AccountRepositoryStub, 'get_by', autospec=True, return_value=[])
+def test_create_accounts_reports_email_taken_after_the_check(_get_by, mocked_method, account_name, account_email,
+                                                             account_service):
+    #   given
+    region = RegionEnum.apac
+    # the e-mail is taken by a concurrent request once the batch was checked
+    asyncio.run(account_service.create_account(account_name, account_email, region, False))
+    accounts = [AccountCreate(name=account_name, email=account_email, region=region, vip=False),
+                AccountCreate(name=account_name, email='1' + account_email, region=region, vip=False)]
+
+    #   when
+    result = asyncio.run(account_service.create_accounts(accounts))
+
+    #   then
+    assert [x.error for x in result] == [EMAIL_ALREADY_USED, None]
+    assert result[0].account is None
+    mocked_method.assert_called_once_with(ANY, [result[1].account])
+
+
+@mock.patch.object(RabbitProducerStub, 'create_accounts', autospec=True)
+def test_create_accounts_with_every_email_taken(mocked_method, account_name, account_email, account_service):
+    #   given
+    region = RegionEnum.apac
+    asyncio.run(account_service.create_account(account_name, account_email, region, False))
+
+    #   when
+    result = asyncio.run(account_service.create_accounts(
+        [AccountCreate(name=account_name, email=account_email, region=region, vip=False)]))
+
+    #   then
+    assert [x.error for x in result] == [EMAIL_ALREADY_USED]
+    mocked_method.assert_not_called()
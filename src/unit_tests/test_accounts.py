@@ -9,9 +9,11 @@ from pydantic import EmailStr
 from fastapi.testclient import TestClient
 
 from acm_service.utils.env import AUTH_TOKEN
-from acm_service.accounts.schema import RegionEnum, AccountWithoutAgents
+from acm_service.accounts.schema import RegionEnum, AccountWithoutAgents, AccountCreateResult, AccountDeletion, \
+    DeletionStatusEnum, AccountStats, Stats, RegionStats
 from acm_service.accounts.service import AccountService
-from acm_service.utils.http_exceptions import DuplicatedMailException
+from acm_service.utils.http_exceptions import DuplicatedMailException, InvalidCursorException
+from acm_service.utils.pagination import CursorPage
 
 from main import app
 
@@ -133,8 +135,17 @@ def test_read_account_bad_token():
     assert read_response.json() == {'detail': 'Invalid X-Token header'}
 
 
-@mock.patch.object(AccountService, AccountService.delete.__name__, return_value=simple_account, autospec=True)
-def test_delete_account(mocked_method):
+simple_deletion = AccountDeletion(account_id=simple_account.id,
+                                  region=simple_account.region,
+                                  vip=simple_account.vip,
+                                  status=DeletionStatusEnum.pending)
+
+
+@mock.patch('acm_service.accounts.route.run_account_deletion', autospec=True)
+@mock.patch.object(AccountService, AccountService.claim_deletion.__name__, return_value=True, autospec=True)
+@mock.patch.object(AccountService, AccountService.schedule_delete.__name__,
+                   side_effect=lambda *_: simple_deletion.copy(), autospec=True)
+def test_delete_account(mocked_method, mocked_claim, mocked_job):
     #   given & when
     response = client.delete(
         f'/accounts/{simple_account.id}',
@@ -142,8 +153,87 @@ def test_delete_account(mocked_method):
     )
 
     #   then
-    mocked_method.assert_called_once_with(ANY, account_id=simple_account.id)
+    mocked_method.assert_called_once_with(ANY, simple_account.id)
+    mocked_claim.assert_called_once_with(ANY, simple_account.id)
+    mocked_job.assert_called_once_with(simple_account.id)
     assert response.status_code == 202
+    assert response.json()['status'] == DeletionStatusEnum.running
+
+
+@mock.patch('acm_service.accounts.route.run_account_deletion', autospec=True)
+@mock.patch.object(AccountService, AccountService.claim_deletion.__name__, return_value=False, autospec=True)
+@mock.patch.object(AccountService, AccountService.schedule_delete.__name__,
+                   side_effect=lambda *_: simple_deletion.copy(update={'status': DeletionStatusEnum.running}),
+                   autospec=True)
+def test_repeated_delete_account_starts_no_second_job(mocked_method, mocked_claim, mocked_job):
+    #   given & when
+    response = client.delete(
+        f'/accounts/{simple_account.id}',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_job.assert_not_called()
+    assert response.status_code == 202
+    assert response.json()['status'] == DeletionStatusEnum.running
+
+
+@mock.patch.object(AccountService, AccountService.schedule_delete.__name__, return_value=None, autospec=True)
+def test_delete_not_existing_account(mocked_method):
+    #   given & when
+    response = client.delete(
+        f'/accounts/{simple_account.id}',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    assert response.status_code == 404
+
+
+@mock.patch.object(AccountService, AccountService.get_deletion.__name__, return_value=simple_deletion, autospec=True)
+def test_read_account_deletion(mocked_method):
+    #   given & when
+    response = client.get(
+        f'/accounts/{simple_account.id}/deletion',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, simple_account.id)
+    assert response.status_code == 200
+    assert response.json()['account_id'] == str(simple_account.id)
+
+
+@mock.patch.object(AccountService, AccountService.get_stats.__name__,
+                   return_value=AccountStats(account_id=simple_account.id, agents=3, blocked_agents=1), autospec=True)
+def test_read_account_stats(mocked_method):
+    #   given & when
+    response = client.get(
+        f'/accounts/{simple_account.id}/stats',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, simple_account.id)
+    assert response.status_code == 200
+    assert response.json() == {'account_id': str(simple_account.id), 'agents': 3, 'blocked_agents': 1}
+
+
+@mock.patch.object(AccountService, AccountService.get_global_stats.__name__,
+                   return_value=Stats(accounts=1, agents=3, blocked_agents=1,
+                                      accounts_by_region=[RegionStats(region=RegionEnum.emea, vip=True, accounts=1)]),
+                   autospec=True)
+def test_read_stats(mocked_method):
+    #   given & when
+    response = client.get(
+        '/stats',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    assert response.status_code == 200
+    assert response.json() == {'accounts': 1, 'agents': 3, 'blocked_agents': 1,
+                               'accounts_by_region': [{'region': 'emea', 'vip': True, 'accounts': 1}]}
 
 
 @mock.patch.object(AccountService, AccountService.get.__name__, return_value=None, autospec=True)
@@ -173,11 +263,25 @@ def test_read_accounts(mocked_method):
     )
 
     #   then
-    mocked_method.assert_called_once_with(ANY)
+    mocked_method.assert_called_once_with(ANY, region=None, vip=None)
     assert response.status_code == 200
     assert len(response.json()['items']) == 2
 
 
+@mock.patch.object(AccountService, AccountService.get_all.__name__, return_value=[simple_account], autospec=True)
+def test_read_accounts_filtered(mocked_method):
+    #   given & when
+    response = client.get(
+        '/accounts?region=emea&vip=true',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, region=RegionEnum.emea, vip=True)
+    assert response.status_code == 200
+    assert len(response.json()['items']) == 1
+
+
 def test_read_accounts_bad_token():
     #   given
     token = 'wrong_token'
@@ -191,3 +295,95 @@ def test_read_accounts_bad_token():
     #   then
     assert response.status_code == 400
     assert response.json() == {'detail': 'Invalid X-Token header'}
+
+
+@mock.patch.object(AccountService, AccountService.get_page.__name__,
+                   return_value=CursorPage[AccountWithoutAgents](items=[simple_account], next_page='next_cursor'),
+                   autospec=True)
+def test_read_accounts_by_cursor(mocked_method):
+    #   given & when
+    response = client.get(
+        '/accounts/cursor?size=1',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, ANY, region=None, vip=None)
+    assert mocked_method.call_args.args[1].size == 1
+    assert response.status_code == 200
+    assert len(response.json()['items']) == 1
+    assert response.json()['next_page'] == 'next_cursor'
+    assert response.json()['previous_page'] is None
+
+
+@mock.patch.object(AccountService, AccountService.get_page.__name__, side_effect=InvalidCursorException(),
+                   autospec=True)
+def test_read_accounts_by_invalid_cursor(mocked_method):
+    #   given & when
+    response = client.get(
+        '/accounts/cursor?cursor=garbage',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+async def exported_accounts():
+    for account in [simple_account, simple_account]:
+        yield account
+
+
+@mock.patch.object(AccountService, AccountService.export.__name__,
+                   side_effect=lambda *_args, **_kwargs: exported_accounts(), autospec=True)
+def test_export_accounts(mocked_method):
+    #   given & when
+    response = client.get(
+        '/accounts/export?region=emea&vip=true',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, region=RegionEnum.emea, vip=True)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert len(lines) == 2
+    assert AccountWithoutAgents.parse_raw(lines[0]) == simple_account
+
+
+@mock.patch.object(AccountService, AccountService.create_accounts.__name__,
+                   return_value=[AccountCreateResult(email=simple_account.email, account=simple_account),
+                                 AccountCreateResult(email=simple_account.email, error='E-mail is already used')],
+                   autospec=True)
+def test_create_accounts(mocked_method):
+    #   given
+    account = {'name': simple_account.name, 'email': simple_account.email,
+               'region': simple_account.region, 'vip': str(simple_account.vip)}
+
+    #   when
+    response = client.post(
+        '/accounts/bulk',
+        headers={'X-Token': AUTH_TOKEN},
+        json=[account, account]
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, ANY)
+    assert len(mocked_method.call_args.args[1]) == 2
+    assert response.status_code == 200
+    assert response.json()[0]['account']['id'] == str(simple_account.id)
+    assert response.json()[1] == {'email': simple_account.email, 'account': None, 'error': 'E-mail is already used'}
+
+
+def test_create_accounts_empty():
+    #   given & when
+    response = client.post(
+        '/accounts/bulk',
+        headers={'X-Token': AUTH_TOKEN},
+        json=[]
+    )
+
+    #   then
+    assert response.status_code == 422
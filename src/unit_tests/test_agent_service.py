@@ -7,8 +7,11 @@ import pytest
 from pydantic import ValidationError
 
 from acm_service.accounts.schema import AccountWithoutAgents
+from acm_service.agents.schema import AgentCreate
 from acm_service.agents.service import AgentService
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.utils.database.session import UnitOfWork
+from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException, EMAIL_ALREADY_USED, \
+    AccountBeingDeletedException
 
 from unit_tests.utils import RabbitProducerStub,  AgentRepositoryStub, AccountRepositoryStub
 
@@ -17,7 +20,7 @@ from unit_tests.utils import RabbitProducerStub,  AgentRepositoryStub, AccountRe
 def agent_service() -> AgentService:
     accounts = AccountRepositoryStub()
     accounts.create_random()
-    return AgentService(AgentRepositoryStub(), accounts, RabbitProducerStub())
+    return AgentService(AgentRepositoryStub(accounts), accounts, RabbitProducerStub())
 
 
 @pytest.fixture
@@ -46,6 +49,18 @@ def test_create_agent(mocked_method, agent_name, agent_mail, agent_service):
     mocked_method.assert_called_once_with(ANY, region=account.region, agent_uuid=agent.id)
 
 
+@mock.patch.object(UnitOfWork, 'commit', autospec=True)
+def test_create_agent_commits_once(mocked_commit, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+
+    #   when
+    asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+
+    #   then
+    mocked_commit.assert_called_once()
+
+
 def test_create_agent_duplicated_mail(agent_name, agent_mail, agent_service):
     #   given
     account = get_account(agent_service)
@@ -56,6 +71,22 @@ def test_create_agent_duplicated_mail(agent_name, agent_mail, agent_service):
         asyncio.run(agent_service.create_agent(agent_name + agent_name, agent_mail, account.id))
 
 
+@mock.patch.object(RabbitProducerStub, 'create_agent', autospec=True)
+def test_create_agent_of_account_being_deleted(mocked_method, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+    asyncio.run(agent_service.get_account_repository().start_deletion(account))
+
+    #  when && then
+    with pytest.raises(AccountBeingDeletedException):
+        asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+    with pytest.raises(AccountBeingDeletedException):
+        asyncio.run(agent_service.create_agents(account.id, [AgentCreate(name=agent_name, email=agent_mail)]))
+
+    #   then
+    mocked_method.assert_not_called()
+
+
 @mock.patch.object(RabbitProducerStub, 'block_agent', autospec=True)
 def test_block_agent(block_agent, agent_name, agent_mail, agent_service):
     #   given
@@ -71,6 +102,31 @@ def test_block_agent(block_agent, agent_name, agent_mail, agent_service):
     assert asyncio.run(agent_service.get(agent.id)).blocked is True
 
 
+@mock.patch.object(RabbitProducerStub, 'block_agent', autospec=True)
+def test_block_already_blocked_agent(block_agent, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+    agent = asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+    asyncio.run(agent_service.block_agent(agent.id))
+
+    #   when
+    result = asyncio.run(agent_service.block_agent(agent.id))
+
+    #   then
+    assert result is True
+    block_agent.assert_called_once_with(ANY, region=account.region, agent_uuid=agent.id)
+
+
+@mock.patch.object(RabbitProducerStub, 'block_agent', autospec=True)
+def test_block_not_existing_agent(block_agent, agent_service):
+    #   when
+    result = asyncio.run(agent_service.block_agent(uuid4()))
+
+    #   then
+    assert result is False
+    block_agent.assert_not_called()
+
+
 @mock.patch.object(RabbitProducerStub, 'unblock_agent', autospec=True)
 def test_unblock_agent(unblock_method, agent_name, agent_mail, agent_service):
     #   given
@@ -163,3 +219,66 @@ def test_try_delete_agent_from_other_account(mocked_method, agent_name, agent_ma
 
     #   then
     mocked_method.assert_not_called()
+
+
+@mock.patch.object(RabbitProducerStub, 'create_agents', autospec=True)
+def test_create_agents(mocked_method, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+    asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+    agents = [AgentCreate(name=agent_name, email='1' + agent_mail),
+              AgentCreate(name=agent_name, email=agent_mail),
+              AgentCreate(name=agent_name, email='2' + agent_mail)]
+
+    #   when
+    result = asyncio.run(agent_service.create_agents(account.id, agents))
+
+    #   then
+    assert [x.error for x in result] == [None, EMAIL_ALREADY_USED, None]
+    assert result[0].agent.account_id == account.id
+    assert result[1].agent is None
+    assert asyncio.run(agent_service.get(result[2].agent.id)).email == '2' + agent_mail
+    mocked_method.assert_called_once_with(ANY, region=account.region,
+                                          agent_uuids=[result[0].agent.id, result[2].agent.id])
+
+
+@mock.patch.object(RabbitProducerStub, 'create_agents', autospec=True)
+def test_create_agents_with_every_email_taken(mocked_method, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+    asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+
+    #   when
+    result = asyncio.run(agent_service.create_agents(account.id, [AgentCreate(name=agent_name, email=agent_mail)]))
+
+    #   then
+    assert [x.error for x in result] == [EMAIL_ALREADY_USED]
+    mocked_method.assert_not_called()
+
+
+@mock.patch.object(RabbitProducerStub, 'create_agents', autospec=True)
+def test_create_agents_for_not_existing_account(mocked_method, agent_name, agent_mail, agent_service):
+    #   when
+    result = asyncio.run(agent_service.create_agents(uuid4(), [AgentCreate(name=agent_name, email=agent_mail)]))
+
+    #   then
+    assert result is None
+    mocked_method.assert_not_called()
+
+
+@mock.patch.object(RabbitProducerStub, 'block_agents', autospec=True)
+def test_block_agents(block_agents, agent_name, agent_mail, agent_service):
+    #   given
+    account = get_account(agent_service)
+    first = asyncio.run(agent_service.create_agent(agent_name, agent_mail, account.id))
+    second = asyncio.run(agent_service.create_agent(agent_name, '1' + agent_mail, account.id))
+    asyncio.run(agent_service.block_agent(second.id))
+    missing = uuid4()
+
+    #   when
+    result = asyncio.run(agent_service.block_agents([first.id, second.id, missing]))
+
+    #   then
+    assert result.not_found == [missing]
+    block_agents.assert_called_once_with(ANY, region=account.region, agent_uuids=[first.id])
+    assert asyncio.run(agent_service.get(first.id)).blocked is True
@@ -10,9 +10,10 @@ from pydantic import EmailStr
 from fastapi.testclient import TestClient
 
 from acm_service.utils.env import AUTH_TOKEN
-from acm_service.agents.schema import Agent
+from acm_service.agents.schema import Agent, AgentsBlockResult
 from acm_service.agents.service import AgentService
-from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException
+from acm_service.utils.http_exceptions import InconsistencyException, DuplicatedMailException, InvalidCursorException
+from acm_service.utils.pagination import CursorPage
 
 from main import app
 
@@ -228,3 +229,90 @@ def test_read_agents(mocked_method):
     mocked_method.assert_called_once_with(ANY, account_id=simple_agent.account_id)
     assert response.status_code == 200
     assert len(response.json()['items']) == 2
+
+
+@mock.patch.object(AgentService, AgentService.get_page_for_account.__name__,
+                   return_value=CursorPage[Agent](items=[simple_agent, simple_agent], previous_page='previous_cursor'),
+                   autospec=True)
+def test_read_agents_by_cursor(mocked_method):
+    #   given & when
+    response = client.get(
+        f'/accounts/{simple_agent.account_id}/agents/cursor?cursor=current_cursor',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, simple_agent.account_id, ANY)
+    assert mocked_method.call_args.args[2].cursor == 'current_cursor'
+    assert response.status_code == 200
+    assert len(response.json()['items']) == 2
+    assert response.json()['previous_page'] == 'previous_cursor'
+    assert response.json()['next_page'] is None
+
+
+@mock.patch.object(AgentService, AgentService.get_page.__name__, side_effect=InvalidCursorException(), autospec=True)
+def test_read_agents_by_invalid_cursor(mocked_method):
+    #   given & when
+    response = client.get(
+        '/agents/cursor?cursor=garbage',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+async def exported_agents():
+    for agent in [simple_agent, simple_agent, simple_agent]:
+        yield agent
+
+
+@mock.patch.object(AgentService, AgentService.export.__name__,
+                   side_effect=lambda *_args, **_kwargs: exported_agents(), autospec=True)
+def test_export_agents(mocked_method):
+    #   given & when
+    response = client.get(
+        '/agents/export',
+        headers={'X-Token': AUTH_TOKEN}
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, region=None, vip=None)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 3
+    assert Agent.parse_raw(lines[0]) == simple_agent
+
+
+@mock.patch.object(AgentService, AgentService.create_agents.__name__, return_value=None, autospec=True)
+def test_create_agents_for_not_existing_account(mocked_method):
+    #   given & when
+    response = client.post(
+        f'/accounts/{simple_agent.account_id}/agents/bulk',
+        headers={'X-Token': AUTH_TOKEN},
+        json=[{'name': simple_agent.name, 'email': simple_agent.email}])
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, simple_agent.account_id, ANY)
+    assert response.status_code == 404
+    assert response.json() == {'detail': f'Account {simple_agent.account_id} not found'}
+
+
+@mock.patch.object(AgentService, AgentService.unblock_agents.__name__, autospec=True)
+def test_unblock_agents(mocked_method):
+    #   given
+    missing = uuid4()
+    mocked_method.return_value = AgentsBlockResult(not_found=[missing])
+
+    #   when
+    response = client.post(
+        '/agents/unblock',
+        headers={'X-Token': AUTH_TOKEN},
+        json=[str(simple_agent.id), str(missing)]
+    )
+
+    #   then
+    mocked_method.assert_called_once_with(ANY, [simple_agent.id, missing])
+    assert response.status_code == 202
+    assert response.json() == {'not_found': [str(missing)]}
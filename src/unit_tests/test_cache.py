@@ -0,0 +1,447 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+from aioredis import Redis
+
+from acm_service.accounts.repository import AccountRepository, AccountCachedRepository
+from acm_service.accounts.schema import AccountWithoutAgents, DeletedAccount, RegionEnum, EraseResult
+from acm_service.agents.repository import AgentRepository, AgentCachedRepository
+from acm_service.agents.schema import Agent
+from acm_service.utils.cache.connection import connect_to_redis
+from acm_service.utils.cache.local import LocalCache
+from acm_service.utils.cache.repositories import Cache, ABSENT
+from acm_service.utils.database.session import UnitOfWork
+from acm_service.utils.env import REDIS_CACHE_INVALIDATION_IN_SECONDS
+
+from unit_tests.utils import RedisStub
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_local_cache_evicts_least_recently_used_entry():
+    #   given
+    local = LocalCache(max_entries=2, max_bytes=1_000, default_ttl=10)
+    local.set('Account', '1', 'one')
+    local.set('Account', '2', 'two')
+    local.get('Account', '1')
+
+    #   when
+    local.set('Account', '3', 'three')
+
+    #   then
+    assert local.get('Account', '1') == 'one'
+    assert local.get('Account', '2') is None
+    assert local.get('Account', '3') == 'three'
+
+
+def test_local_cache_is_bounded_by_bytes():
+    #   given
+    local = LocalCache(max_entries=100, max_bytes=30, default_ttl=10)
+
+    #   when
+    local.set('Account', '1', 'x' * 10)
+    local.set('Account', '2', 'x' * 10)
+    local.set('Account', '3', 'x' * 100)
+
+    #   then
+    assert len(local) == 1
+    assert local.size_in_bytes == len('Account:2') + 10
+    assert local.get('Account', '3') is None
+
+
+def test_local_cache_expires_entries_by_namespace_ttl():
+    #   given
+    clock = Clock()
+    local = LocalCache(max_entries=100, max_bytes=1_000, default_ttl=10, namespace_ttls={'AgentStats': 1},
+                       clock=clock)
+    local.set('Account', '1', 'account')
+    local.set('AgentStats', '1', 'stats')
+    local.set('Agent', '1', 'agent', ttl=0.5)
+
+    #   when
+    clock.now = 2
+
+    #   then
+    assert local.get('Account', '1') == 'account'
+    assert local.get('AgentStats', '1') is None
+    assert local.get('Agent', '1') is None
+    assert len(local) == 1
+
+
+async def two_workers(scenario):
+    redis = RedisStub()
+    first, second = Cache(), Cache()
+    for cache in (first, second):
+        cache.connect_to_cache_service(redis)
+        await cache.start_invalidation_listener()
+    try:
+        return await scenario(redis, first, second)
+    finally:
+        for cache in (first, second):
+            await cache.stop_invalidation_listener()
+
+
+def test_get_is_served_by_local_cache():
+    #   given
+    async def scenario(redis, first, _):
+        await first.set('Account', '1', 'account', timedelta(seconds=60))
+        gets = redis.gets
+        values = [await first.get('Account', '1') for _ in range(3)]
+        return values, redis.gets - gets
+
+    #   when
+    values, redis_gets = asyncio.run(two_workers(scenario))
+
+    #   then
+    assert values == ['account'] * 3
+    assert redis_gets == 0
+
+
+def test_set_invalidates_local_cache_of_other_workers():
+    #   given
+    async def scenario(_, first, second):
+        await first.set('Account', '1', 'old', timedelta(seconds=60))
+        before = await second.get('Account', '1')
+        await first.set('Account', '1', 'new', timedelta(seconds=60))
+        await asyncio.sleep(0)
+        return before, await second.get('Account', '1')
+
+    #   when
+    before, after = asyncio.run(two_workers(scenario))
+
+    #   then
+    assert (before, after) == ('old', 'new')
+
+
+def test_delete_invalidates_local_cache_of_other_workers():
+    #   given
+    async def scenario(_, first, second):
+        await first.set('Account', '1', 'account', timedelta(seconds=60))
+        await second.get('Account', '1')
+        await first.delete('Account', '1')
+        await asyncio.sleep(0)
+        return await first.get('Account', '1'), await second.get('Account', '1')
+
+    #   when
+    result = asyncio.run(two_workers(scenario))
+
+    #   then
+    assert result == (None, None)
+
+
+def test_local_cache_is_not_used_without_invalidation_listener():
+    #   given
+    redis = RedisStub()
+    cache = Cache()
+    cache.connect_to_cache_service(redis)
+
+    #   when
+    asyncio.run(cache.set('Account', '1', 'account', None))
+    asyncio.run(cache.get('Account', '1'))
+
+    #   then
+    assert redis.gets == 1
+
+def connected_cache(redis: RedisStub) -> Cache:
+    cache = Cache()
+    cache.connect_to_cache_service(redis)
+    return cache
+
+
+agent = Agent(id=uuid4(), account_id=uuid4(), name='agent', email='agent@gmail.com', blocked=False)
+account = AccountWithoutAgents(id=uuid4(), name='account', email='account@gmail.com', region=RegionEnum.emea, vip=False)
+
+
+@mock.patch.object(AgentRepository, 'create', autospec=True, return_value=agent)
+def test_created_agent_is_put_into_cache(_create):
+    #   given
+    redis = RedisStub()
+    repository = AgentCachedRepository(UnitOfWork(), connected_cache(redis))
+
+    #   when
+    asyncio.run(repository.create(name=agent.name, email=agent.email, account_id=agent.account_id, blocked=False))
+
+    #   then
+    assert Agent.parse_raw(redis.values[f'Agent:{agent.id}']) == agent
+
+
+@mock.patch.object(AgentRepository, 'block', autospec=True,
+                   return_value=[(agent.copy(update={'blocked': True}), RegionEnum.emea)])
+def test_blocked_agent_is_cached_as_returned_once_committed(_block):
+    #   given
+    redis = RedisStub()
+    redis.values[f'Agent:{agent.id}'] = agent.json()
+    unit_of_work = UnitOfWork(mock.AsyncMock())
+    repository = AgentCachedRepository(unit_of_work, connected_cache(redis))
+
+    #   when
+    asyncio.run(repository.set_blocked(agent.id, True))
+    before_commit = Agent.parse_raw(redis.values[f'Agent:{agent.id}'])
+    asyncio.run(unit_of_work.commit())
+
+    #   then
+    assert not before_commit.blocked
+    assert Agent.parse_raw(redis.values[f'Agent:{agent.id}']).blocked
+
+
+@mock.patch.object(AgentRepository, 'block', autospec=True,
+                   return_value=[(agent.copy(update={'blocked': True}), RegionEnum.emea)])
+def test_rolled_back_blocking_keeps_agent_in_cache(_block):
+    #   given
+    redis = RedisStub()
+    redis.values[f'Agent:{agent.id}'] = agent.json()
+    repository = AgentCachedRepository(UnitOfWork(mock.AsyncMock()), connected_cache(redis))
+
+    #   when
+    asyncio.run(repository.set_blocked(agent.id, True))
+
+    #   then
+    assert not Agent.parse_raw(redis.values[f'Agent:{agent.id}']).blocked
+
+
+@mock.patch.object(AgentRepository, 'get', autospec=True, return_value=agent)
+def test_miss_does_not_replace_value_written_meanwhile(_get):
+    #   given
+    redis = RedisStub()
+    repository = AgentCachedRepository(UnitOfWork(), connected_cache(redis))
+    blocked = agent.copy(update={'blocked': True})
+
+    async def block_during_read(*_):
+        await repository.refresh([blocked])
+        return agent
+
+    _get.side_effect = block_during_read
+
+    #   when
+    result = asyncio.run(repository.get(agent.id))
+
+    #   then
+    assert result == agent
+    assert Agent.parse_raw(redis.values[f'Agent:{agent.id}']) == blocked
+
+
+@mock.patch.object(AgentRepository, 'block', autospec=True, return_value=[(agent, RegionEnum.emea)])
+def test_failed_cache_write_is_logged_and_evicts_instead(_block):
+    #   given
+    redis = RedisStub()
+    redis.values[f'Agent:{agent.id}'] = agent.json()
+    unit_of_work = UnitOfWork(mock.AsyncMock())
+    repository = AgentCachedRepository(unit_of_work, connected_cache(redis))
+    asyncio.run(repository.set_blocked(agent.id, True))
+
+    #   when
+    with mock.patch.object(Cache, 'set_many', autospec=True, side_effect=ConnectionError('Redis is down')):
+        with mock.patch('acm_service.utils.database.session.logger') as logger:
+            asyncio.run(unit_of_work.commit())
+
+    #   then
+    logger.exception.assert_called_once()
+    assert f'Agent:{agent.id}' not in redis.values
+
+
+@mock.patch.object(AccountRepository, 'delete', autospec=True,
+                   return_value=DeletedAccount(agent_ids=[agent.id], **account.dict()))
+def test_deleted_account_is_marked_absent_with_its_agents(_delete):
+    #   given
+    redis = RedisStub()
+    redis.values[f'Account:{account.id}'] = account.json()
+    redis.values[f'Agent:{agent.id}'] = agent.json()
+    repository = AccountCachedRepository(UnitOfWork(), connected_cache(redis))
+
+    #   when
+    asyncio.run(repository.delete(account.id, account.region))
+
+    #   then
+    assert redis.values == {f'Account:{account.id}': ABSENT, f'Agent:{agent.id}': ABSENT,
+                            f'AccountAgentsVersion:{account.id}': '1'}
+
+
+@mock.patch.object(AccountRepository, 'erase', autospec=True, return_value=EraseResult(method='delete', rows_removed={}))
+def test_erase_empties_account_and_agent_namespaces(_erase):
+    #   given
+    redis = RedisStub()
+    redis.values[f'Account:{account.id}'] = account.json()
+    redis.values[f'Agent:{agent.id}'] = agent.json()
+    redis.values['AgentStats:*'] = '{}'
+    repository = AccountCachedRepository(UnitOfWork(), connected_cache(redis))
+
+    #   when
+    asyncio.run(repository.erase())
+
+    #   then
+    assert list(redis.values) == ['AgentStats:*']
+
+
+def test_set_is_a_single_round_trip_with_expiration():
+    #   given
+    redis = RedisStub()
+    cache = connected_cache(redis)
+
+    #   when
+    asyncio.run(cache.set('Account', '1', 'account', timedelta(seconds=60)))
+
+    #   then
+    assert redis.round_trips == 1
+    assert redis.expirations == {'Account:1': timedelta(seconds=60)}
+
+
+def test_set_many_is_a_single_round_trip():
+    #   given
+    redis = RedisStub()
+    cache = connected_cache(redis)
+
+    #   when
+    asyncio.run(cache.set_many('Agent', {str(x): str(x) for x in range(100)}, timedelta(seconds=60)))
+
+    #   then
+    assert redis.round_trips == 1
+    assert len(redis.values) == 100
+
+
+def test_get_many_reads_keys_missing_in_local_cache_at_once():
+    #   given
+    async def scenario(redis, first, _):
+        await first.set_many('Agent', {'1': 'one', '2': 'two'}, None)
+        redis.values['Agent:3'] = 'three'
+        round_trips = redis.round_trips
+        values = await first.get_many('Agent', ['3', '1', '4', '2', '3'])
+        return values, redis.round_trips - round_trips
+
+    #   when
+    values, round_trips = asyncio.run(two_workers(scenario))
+
+    #   then
+    assert values == ['three', 'one', None, 'two', 'three']
+    assert round_trips == 1
+
+
+@mock.patch.object(Redis, 'ping', new_callable=mock.AsyncMock)
+def test_connect_to_redis_pings_a_pooled_client(_ping):
+    #   when
+    redis = asyncio.run(connect_to_redis('localhost', 6379, 0, 1, pool_size=7))
+
+    #   then
+    _ping.assert_called_once()
+    assert redis.connection_pool.max_connections == 7
+    assert redis.connection is None
+
+
+@mock.patch.object(Redis, 'ping', new_callable=mock.AsyncMock, side_effect=ConnectionError('refused'))
+def test_connect_to_redis_detects_dead_redis(_ping):
+    #   when
+    redis = asyncio.run(connect_to_redis('localhost', 6379, 0, 2))
+
+    #   then
+    assert redis is None
+    assert _ping.call_count == 2
+
+
+@mock.patch.object(AgentRepository, 'get_agents_for_account', autospec=True, return_value=[agent])
+def test_agents_of_account_are_read_once(_get_agents_for_account):
+    #   given
+    redis = RedisStub()
+    repository = AgentCachedRepository(UnitOfWork(), connected_cache(redis))
+
+    #   when
+    first = asyncio.run(repository.get_by(account_id=agent.account_id))
+    second = asyncio.run(repository.get_by(account_id=agent.account_id, region=RegionEnum.emea))
+
+    #   then
+    assert first == second == [agent]
+    _get_agents_for_account.assert_called_once_with(mock.ANY, agent.account_id, None, primary=False)
+
+
+@mock.patch('acm_service.agents.repository.HAS_READ_REPLICA', True)
+@mock.patch.object(AgentRepository, 'get_agents_for_account', autospec=True, return_value=[agent])
+def test_agents_of_account_are_read_from_primary_with_replica(_get_agents_for_account):
+    #   given
+    repository = AgentCachedRepository(UnitOfWork(), connected_cache(RedisStub()))
+
+    #   when
+    asyncio.run(repository.get_by(account_id=agent.account_id))
+
+    #   then
+    _get_agents_for_account.assert_called_once_with(mock.ANY, agent.account_id, None, primary=True)
+
+
+@mock.patch.object(AgentRepository, 'block', autospec=True, return_value=[(agent, RegionEnum.emea)])
+@mock.patch.object(AgentRepository, 'get_agents_for_account', autospec=True, return_value=[agent])
+def test_blocking_agent_bumps_version_of_its_account(_get_agents_for_account, _block):
+    #   given
+    redis = RedisStub()
+    repository = AgentCachedRepository(UnitOfWork(), connected_cache(redis))
+    asyncio.run(repository.update_cache(agent))
+    asyncio.run(repository.get_by(account_id=agent.account_id))
+
+    #   when
+    asyncio.run(repository.set_blocked(agent.id, True))
+    asyncio.run(repository.get_by(account_id=agent.account_id))
+
+    #   then
+    assert redis.values[f'AccountAgentsVersion:{agent.account_id}'] == '1'
+    assert redis.expirations[f'AccountAgentsVersion:{agent.account_id}'] == \
+        timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS)
+    assert _get_agents_for_account.call_count == 2
+
+
+@mock.patch.object(AgentRepository, 'create', autospec=True, return_value=agent)
+@mock.patch.object(AgentRepository, 'get_agents_for_account', autospec=True, return_value=[])
+def test_created_agent_bumps_version_of_its_account_once_committed(_get_agents_for_account, _create):
+    #   given
+    redis = RedisStub()
+    unit_of_work = UnitOfWork(mock.AsyncMock())
+    repository = AgentCachedRepository(unit_of_work, connected_cache(redis))
+    asyncio.run(repository.get_by(account_id=agent.account_id))
+
+    #   when
+    asyncio.run(repository.create(name=agent.name, email=agent.email, account_id=agent.account_id, blocked=False))
+    before_commit = asyncio.run(repository.get_by(account_id=agent.account_id))
+    asyncio.run(unit_of_work.commit())
+    asyncio.run(repository.get_by(account_id=agent.account_id))
+
+    #   then
+    assert before_commit == []
+    assert _get_agents_for_account.call_count == 2
+    assert redis.expirations[f'AccountAgentsVersion:{agent.account_id}'] == timedelta(seconds=REDIS_CACHE_INVALIDATION_IN_SECONDS)
+
+
+@mock.patch.object(AccountRepository, 'create', autospec=True, return_value=account)
+@mock.patch.object(AccountRepository, 'get', autospec=True, return_value=None)
+def test_missing_account_is_read_once_until_created(_get, _create):
+    #   given
+    redis = RedisStub()
+    repository = AccountCachedRepository(UnitOfWork(), connected_cache(redis))
+
+    #   when
+    missing = [asyncio.run(repository.get(account.id)) for _ in range(3)]
+    asyncio.run(repository.create(name=account.name, email=account.email, region=account.region, vip=account.vip))
+    created = asyncio.run(repository.get(account.id))
+
+    #   then
+    assert missing == [None] * 3
+    assert created.id == account.id
+    _get.assert_called_once()
+
+
+def test_absent_marker_does_not_replace_value():
+    #   given
+    redis = RedisStub()
+    cache = connected_cache(redis)
+    asyncio.run(cache.set('Account', '1', 'account', None))
+
+    #   when
+    asyncio.run(cache.set_absent('Account', '1', timedelta(seconds=30)))
+    asyncio.run(cache.set_absent('Account', '2', timedelta(seconds=30)))
+
+    #   then
+    assert redis.values == {'Account:1': 'account', 'Account:2': ABSENT}
+    assert redis.expirations['Account:2'] == timedelta(seconds=30)
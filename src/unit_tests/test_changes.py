@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from acm_service.accounts.repository import AccountRepository
+from acm_service.agents.repository import AgentRepository
+from acm_service.changes.repository import ChangesRepository
+from acm_service.changes.schema import ChangeKindEnum, ChangeCursor
+from acm_service.changes.service import ChangesService
+from acm_service.utils.database.repository import utc_now
+from acm_service.utils.database.session import Base, UnitOfWork
+from acm_service.utils.http_exceptions import InvalidCursorException
+
+
+async def feed(limit: int) -> list:
+    """Creates an account with two agents, blocks and deletes one of them and reads the feed page by page."""
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    pages = []
+    async with AsyncSession(engine) as session:
+        unit_of_work = UnitOfWork(session)
+        accounts, agents, changes = AccountRepository(unit_of_work), AgentRepository(unit_of_work), \
+            ChangesRepository(unit_of_work)
+        account = await accounts.create(name='account', email='account@gmail.com', region='nam', vip=False)
+        kept, removed = await agents.create_many([
+            dict(name='kept', email='kept@gmail.com', account_id=account.id, region='nam', blocked=False),
+            dict(name='removed', email='removed@gmail.com', account_id=account.id, region='nam', blocked=False)])
+        await agents.set_blocked(kept.id, True)
+        await agents.delete(removed.id)
+        await session.commit()
+        # the feed stops short of the current millisecond, a later write may still be stamped with it
+        await asyncio.sleep(0.01)
+
+        cursor = None
+        while page := await changes.get_changes(cursor, limit):
+            pages.append([change for _, change in page])
+            cursor = page[-1][0]
+    await engine.dispose()
+    return pages
+
+
+def test_feed_returns_every_change_once_in_order():
+    #   when
+    pages = asyncio.run(feed(limit=10))
+
+    #   then
+    assert len(pages) == 1
+    assert [(x.kind, x.deleted, (x.agent or x.account).name if not x.deleted else None) for x in pages[0]] == [
+        (ChangeKindEnum.account, False, 'account'),
+        (ChangeKindEnum.agent, False, 'kept'),
+        (ChangeKindEnum.agent, True, None)]
+    assert pages[0][1].agent.blocked is True
+
+
+def test_feed_pages_do_not_overlap():
+    #   when
+    pages = asyncio.run(feed(limit=1))
+
+    #   then
+    assert [len(page) for page in pages] == [1, 1, 1]
+    assert len({page[0].id for page in pages}) == 3
+
+
+async def feed_around_late_commit(path: str) -> tuple:
+    """Reads the feed while an agent is blocked but not committed yet, then again from the cursor it returned."""
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as writer, AsyncSession(engine) as reader:
+        accounts, agents = AccountRepository(UnitOfWork(writer)), AgentRepository(UnitOfWork(writer))
+        account = await accounts.create(name='account', email='account@gmail.com', region='nam', vip=False)
+        agent = await agents.create(name='late', email='late@gmail.com', account_id=account.id, blocked=False)
+        await writer.commit()
+        await agents.set_blocked(agent.id, True)
+        await asyncio.sleep(0.01)
+
+        changes = ChangesRepository(UnitOfWork(reader))
+        before = await changes.get_changes(None, 10)
+        await reader.commit()
+        await writer.commit()
+        await asyncio.sleep(0.01)
+        after = await changes.get_changes(before[-1][0], 10)
+    await engine.dispose()
+    return [change for _, change in before], [change for _, change in after]
+
+
+def test_feed_returns_change_committed_after_a_newer_cursor(tmp_path):
+    #   when
+    before, after = asyncio.run(feed_around_late_commit(str(tmp_path / 'changes.db')))
+
+    #   then
+    assert [change.kind for change in before] == [ChangeKindEnum.account, ChangeKindEnum.agent]
+    assert before[1].agent.blocked is False
+    assert [(change.kind, change.agent.blocked) for change in after] == [(ChangeKindEnum.agent, True)]
+
+
+def test_invalid_cursor():
+    #   given
+    service = ChangesService(ChangesRepository())
+
+    #   when && then
+    with pytest.raises(InvalidCursorException):
+        asyncio.run(service.get_changes('not a cursor', 10))
+
+
+def test_cursor_round_trip():
+    #   given
+    cursor = ChangeCursor(timestamp=utc_now(), source='agent', id='0b7c6f52-8e7a-4c09-9d3c-6c0d1d2f3a4b')
+
+    #   when
+    decoded = ChangeCursor.decode(cursor.encode())
+
+    #   then
+    assert decoded == cursor
@@ -0,0 +1,40 @@
+import time
+
+from acm_service.agents.schema import Agent
+from acm_service.utils.database.ids import uuid7
+
+
+def test_uuid7_layout():
+    #   given
+    before = time.time_ns() // 1_000_000
+
+    #   when
+    result = uuid7()
+
+    #   then
+    assert result.version == 7
+    assert result.variant == 'specified in RFC 4122'
+    assert before <= result.int >> 80 <= time.time_ns() // 1_000_000
+
+
+def test_uuid7_is_time_ordered():
+    #   given
+    first = uuid7()
+    time.sleep(0.002)
+
+    #   when
+    second = uuid7()
+
+    #   then
+    assert first < second
+
+
+def test_schemas_accept_uuid7():
+    #   given
+    agent_id, account_id = uuid7(), uuid7()
+
+    #   when
+    result = Agent(id=agent_id, account_id=account_id, name='agent', email='agent@gmail.com', blocked=False)
+
+    #   then
+    assert (result.id, result.account_id) == (agent_id, account_id)
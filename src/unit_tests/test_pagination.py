@@ -0,0 +1,41 @@
+import asyncio
+import base64
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from acm_service.accounts.repository import AccountRepository
+from acm_service.utils.database.session import Base, UnitOfWork
+from acm_service.utils.http_exceptions import InvalidCursorException
+from acm_service.utils.pagination import CursorParams
+
+
+def encoded(bookmark: bytes) -> str:
+    return base64.b64encode(bookmark).decode()
+
+
+async def page(cursor: str):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    try:
+        async with AsyncSession(engine) as session:
+            return await AccountRepository(UnitOfWork(session)).get_page(CursorParams(cursor=cursor, size=10))
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize('cursor', ['a', encoded(b'\xff\xfe'), encoded(b'>s:name'), encoded(b'>i:1~i:2')])
+def test_malformed_cursor_is_invalid(cursor):
+    #  when && then
+    with pytest.raises(InvalidCursorException):
+        asyncio.run(page(cursor))
+
+
+def test_cursor_of_first_page_is_valid():
+    #   when
+    result = asyncio.run(page(encoded(b'>s:name~s:00000000-0000-0000-0000-000000000000')))
+
+    #   then
+    assert result.items == []
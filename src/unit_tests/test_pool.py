@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from acm_service.utils.database.pool import MonitoredQueuePool, PoolMonitor
+
+
+def create_engine(pool_timeout: float = 30):
+    return create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=MonitoredQueuePool, pool_size=1,
+                               max_overflow=0, pool_timeout=pool_timeout)
+
+
+def test_pool_stats_checkouts():
+    #   given
+    engine = create_engine()
+    monitor = PoolMonitor(engine)
+
+    async def use_connection():
+        async with engine.connect() as connection:
+            checked_out = monitor.stats().checked_out
+        await engine.dispose()
+        return checked_out
+
+    #   when
+    checked_out = asyncio.run(use_connection())
+    stats = monitor.stats()
+
+    #   then
+    assert checked_out == 1
+    assert stats.checkouts == 1
+    assert stats.checked_out_peak == 1
+    assert stats.connects == 1
+
+
+def test_pool_stats_timeouts():
+    #   given
+    engine = create_engine(pool_timeout=0.05)
+    monitor = PoolMonitor(engine)
+
+    async def exhaust_pool():
+        async with engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                await engine.connect().start()
+        stats = monitor.stats()
+        await engine.dispose()
+        return stats
+
+    #   when
+    stats = asyncio.run(exhaust_pool())
+
+    #   then
+    assert stats.timeouts == 1
+    assert stats.wait_time_max_ms >= 50
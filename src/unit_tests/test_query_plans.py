@@ -0,0 +1,88 @@
+import asyncio
+from typing import List
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.accounts.repository import AccountRepository
+from acm_service.accounts.schema import RegionEnum
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.agents.repository import AgentRepository
+from acm_service.utils.database.session import Base, UnitOfWork
+
+ACCOUNTS = 200
+AGENTS_PER_ACCOUNT = 10
+ACCOUNT_ID = uuid4()
+AGENT_ID = uuid4()
+
+HOT_QUERIES = {
+    'account by id': lambda accounts, agents: accounts.get(ACCOUNT_ID),
+    'account by email': lambda accounts, agents: accounts.get_by(email='Account_7@Gmail.com'),
+    'accounts by emails': lambda accounts, agents: accounts.get_by(emails=['account_7@gmail.com']),
+    'accounts by region and vip': lambda accounts, agents: accounts.get_all(region=RegionEnum.apac, vip=True),
+    'agent by id': lambda accounts, agents: agents.get(AGENT_ID),
+    'agent by email': lambda accounts, agents: agents.get_by(email='Agent_7_7@Gmail.com'),
+    'agents by emails': lambda accounts, agents: agents.get_by(emails=['agent_7_7@gmail.com']),
+    'agents of account': lambda accounts, agents: agents.get_by(account_id=ACCOUNT_ID),
+    'agent stats of account': lambda accounts, agents: agents.get_stats(account_id=ACCOUNT_ID),
+    'agents of account in region': lambda accounts, agents: agents.get_by(account_id=ACCOUNT_ID,
+                                                                          region=RegionEnum.emea),
+    'agent stats of account in region': lambda accounts, agents: agents.get_stats(account_id=ACCOUNT_ID,
+                                                                                  region=RegionEnum.emea),
+}
+
+
+def seed(session: AsyncSession) -> None:
+    regions = list(RegionEnum)
+    for x in range(ACCOUNTS):
+        account_id = str(ACCOUNT_ID) if x == 0 else str(uuid4())
+        session.add(AccountDB(id=account_id, name=f'account_{x}', email=f'account_{x}@gmail.com',
+                              region=regions[x % len(regions)], vip=x % 2 == 0))
+        for y in range(AGENTS_PER_ACCOUNT):
+            agent_id = str(AGENT_ID) if x == 0 and y == 0 else str(uuid4())
+            session.add(AgentDB(id=agent_id, name=f'agent_{x}_{y}', email=f'agent_{x}_{y}@gmail.com',
+                                account_id=account_id, region=regions[x % len(regions)], blocked=False))
+
+
+async def plan(hot_query) -> List[str]:
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        seed(session)
+        await session.commit()
+        await session.execute(text('ANALYZE'))
+
+        statements = []
+        listener = lambda conn, cursor, statement, parameters, context, executemany: \
+            statements.append((statement, parameters))
+        event.listen(engine.sync_engine, 'before_cursor_execute', listener)
+        unit_of_work = UnitOfWork(session)
+        await hot_query(AccountRepository(unit_of_work), AgentRepository(unit_of_work))
+        event.remove(engine.sync_engine, 'before_cursor_execute', listener)
+
+        connection = await session.connection()
+        details = []
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', [parameters])
+            details += [f'{row[-1]} <- {statement}' for row in result.all()]
+    await engine.dispose()
+    return details
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES.keys())
+def test_hot_query_does_not_scan_table(name):
+    #   given
+    hot_query = HOT_QUERIES[name]
+
+    #   when
+    details = asyncio.run(plan(hot_query))
+
+    #   then
+    assert details
+    # a plain "SCAN <table>" is a full table scan, "SCAN <table> USING ... INDEX" walks an index
+    assert [x for x in details if x.startswith('SCAN ') and ' USING ' not in x.split(' <- ')[0]] == []
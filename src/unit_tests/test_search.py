@@ -0,0 +1,81 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from acm_service.accounts.model import Account as AccountDB
+from acm_service.agents.model import Agent as AgentDB
+from acm_service.search.repository import SearchRepository
+from acm_service.search.schema import SearchKindEnum
+from acm_service.utils.database.session import Base, UnitOfWork
+from acm_service.utils.pagination import Params
+
+ACCOUNT_ID = uuid4()
+AGENT_ID = uuid4()
+
+
+async def search(phrase: str, delete_agent: bool = False, size: int = 10):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:')
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        session.add(AccountDB(id=ACCOUNT_ID, name='Acme Corporation', email='boss@acme.com', region='nam', vip=True))
+        session.add(AccountDB(id=uuid4(), name='Globex', email='info@globex.com', region='emea', vip=False))
+        session.add(AgentDB(id=AGENT_ID, name='Wile Coyote', email='wile@acme.com', account_id=ACCOUNT_ID,
+                            region='nam', blocked=False))
+        await session.commit()
+        if delete_agent:
+            await session.execute(delete(AgentDB).where(AgentDB.id == AGENT_ID))
+            await session.commit()
+
+        result = await SearchRepository(UnitOfWork(session)).search(phrase, Params(page=1, size=size))
+    await engine.dispose()
+    return result
+
+
+def test_search_ranks_matches_of_accounts_and_agents():
+    #   when
+    result = asyncio.run(search('ACME'))
+
+    #   then
+    assert result.has_next is False
+    assert [(x.kind, x.id, x.account_id) for x in result.items] == [
+        (SearchKindEnum.account, ACCOUNT_ID, ACCOUNT_ID), (SearchKindEnum.agent, AGENT_ID, ACCOUNT_ID)]
+    assert result.items[0].score > result.items[1].score
+
+
+def test_search_is_paginated():
+    #   when
+    result = asyncio.run(search('acme', size=1))
+
+    #   then
+    assert result.has_next is True
+    assert [x.kind for x in result.items] == [SearchKindEnum.account]
+
+
+def test_search_index_follows_deletes():
+    #   when
+    result = asyncio.run(search('coyote', delete_agent=True))
+
+    #   then
+    assert result.items == []
+
+
+def test_search_handles_quotes_and_wildcards():
+    #   when
+    result = asyncio.run(search('a"b%'))
+
+    #   then
+    assert result.items == []
+
+
+def test_trigram_query_escapes_like_wildcards():
+    #   when
+    query = SearchRepository._trigram_query('100%_off').compile(dialect=postgresql.dialect())
+
+    #   then
+    assert 'ILIKE' in str(query)
+    assert '%100\\%\\_off%' in query.params.values()
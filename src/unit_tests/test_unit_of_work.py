@@ -0,0 +1,115 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
+import mock
+import pytest
+
+from acm_service.utils.database import session as database
+from acm_service.utils.database.session import UnitOfWork
+
+
+async def used_session(transaction) -> object:
+    async with transaction as session:
+        return session
+
+
+def test_read_goes_to_replica():
+    #   given
+    primary, replica = MagicMock(), MagicMock()
+    unit_of_work = UnitOfWork(primary, replica)
+
+    #   when
+    with mock.patch.object(database, 'async_read_session', MagicMock()):
+        result = asyncio.run(used_session(unit_of_work.read_transaction()))
+
+    #   then
+    assert result is replica
+
+
+def test_read_after_write_stays_on_primary():
+    #   given
+    primary, replica = MagicMock(), MagicMock()
+    unit_of_work = UnitOfWork(primary, replica)
+
+    #   when
+    with mock.patch.object(database, 'async_read_session', MagicMock()):
+        write = asyncio.run(used_session(unit_of_work.transaction()))
+        read = asyncio.run(used_session(unit_of_work.read_transaction()))
+
+    #   then
+    assert write is primary
+    assert read is primary
+
+
+def test_read_asked_for_primary_skips_replica():
+    #   given
+    primary, replica = MagicMock(), MagicMock()
+    unit_of_work = UnitOfWork(primary, replica)
+
+    #   when
+    with mock.patch.object(database, 'async_read_session', MagicMock()):
+        result = asyncio.run(used_session(unit_of_work.read_transaction(primary=True)))
+
+    #   then
+    assert result is primary
+
+
+def test_read_without_replica_uses_primary():
+    #   given
+    primary = MagicMock()
+    unit_of_work = UnitOfWork(primary)
+
+    #   when
+    with mock.patch.object(database, 'async_read_session', None):
+        result = asyncio.run(used_session(unit_of_work.read_transaction()))
+
+    #   then
+    assert result is primary
+
+
+def test_read_of_session_bound_without_reader_uses_that_session():
+    #   given
+    primary = MagicMock()
+    unit_of_work = UnitOfWork(primary)
+
+    #   when
+    with mock.patch.object(database, 'async_read_session', MagicMock()):
+        result = asyncio.run(used_session(unit_of_work.read_transaction()))
+
+    #   then
+    assert result is primary
+
+
+async def failed_write(unit_of_work: UnitOfWork) -> None:
+    async with unit_of_work.transaction():
+        raise ValueError('write failed')
+
+
+def test_unbound_write_commits_and_closes_its_session():
+    #   given
+    session = AsyncMock()
+    unit_of_work = UnitOfWork()
+
+    #   when
+    with mock.patch.object(database, 'async_session', MagicMock(return_value=session)):
+        result = asyncio.run(used_session(unit_of_work.transaction()))
+
+    #   then
+    assert result is session
+    session.commit.assert_awaited_once()
+    session.close.assert_awaited_once()
+
+
+def test_unbound_write_failing_closes_its_session_without_commit():
+    #   given
+    session = AsyncMock()
+    unit_of_work = UnitOfWork()
+
+    #   when
+    with mock.patch.object(database, 'async_session', MagicMock(return_value=session)):
+        with pytest.raises(ValueError):
+            asyncio.run(failed_write(unit_of_work))
+
+    #   then
+    session.commit.assert_not_awaited()
+    session.close.assert_awaited_once()
@@ -1,5 +1,8 @@
+import asyncio
+from datetime import timedelta
+from fnmatch import fnmatch
 from uuid import uuid4
-from typing import List
+from typing import List, Dict
 
 import namegenerator
 from aio_pika.abc import AbstractRobustConnection
@@ -7,8 +10,9 @@ from pydantic import EmailStr
 
 from acm_service.utils.database.repository import AbstractRepository
 from acm_service.utils.events.producer import EventProducer
-from acm_service.accounts.schema import RegionEnum, Account
-from acm_service.agents.schema import Agent
+from acm_service.accounts.schema import RegionEnum, Account, DeletedAccount, AccountDeletion, DeletionStatusEnum, \
+    EraseResult, RegionStats
+from acm_service.agents.schema import Agent, AgentStats
 
 
 def generate_random_mail() -> str:
@@ -29,12 +33,27 @@ class RabbitProducerStub(EventProducer):
     async def create_agent(self, region: str, agent_uuid: str) -> None:
         pass
 
+    async def create_agents(self, region: str, agent_uuids: List[str]) -> None:
+        pass
+
+    async def block_agents(self, region: str, agent_uuids: List[str]) -> None:
+        pass
+
+    async def unblock_agents(self, region: str, agent_uuids: List[str]) -> None:
+        pass
+
     async def delete_agent(self, region: str, agent_uuid: str) -> None:
         pass
 
+    async def delete_agents(self, region: str, agent_uuids: List[str]) -> None:
+        pass
+
     async def create_account(self, region: str, account_uuid: str, vip: bool) -> None:
         pass
 
+    async def create_accounts(self, accounts: List[Account]) -> None:
+        pass
+
     async def delete_account(self, region: str, account_uuid: str, vip: bool) -> None:
         pass
 
@@ -45,6 +64,8 @@ class AccountRepositoryStub(AbstractRepository):
         super().__init__()
         self._accounts_by_uuid = {}
         self._accounts_by_mail = {}
+        self._deletions = {}
+        self.agents = None
 
     def create_random(self) -> Account:
         new_account = Account(id=uuid4(), name='dummy_name', email=EmailStr(generate_random_mail()),
@@ -59,6 +80,10 @@ class AccountRepositoryStub(AbstractRepository):
         self._accounts_by_mail[new_account.email] = new_account
         return new_account
 
+    async def create_many(self, items: List[dict]) -> List[Account]:
+        # like the unique constraint, rows of e-mails already used are not inserted
+        return [await self.create(**account) for account in items if account['email'] not in self._accounts_by_mail]
+
     async def get(self, account_uuid: str) -> Account | None:
         if account_uuid in self._accounts_by_uuid:
             return self._accounts_by_uuid[account_uuid]
@@ -68,6 +93,9 @@ class AccountRepositoryStub(AbstractRepository):
         if 'email' in kwargs.keys():
             return self.get_account_by_email(kwargs['email'])
 
+        if 'emails' in kwargs.keys():
+            return [account for email in kwargs['emails'] for account in self.get_account_by_email(email)]
+
         raise NotImplementedError
 
     def get_account_by_email(self, email: str) -> List[Account]:
@@ -75,29 +103,69 @@ class AccountRepositoryStub(AbstractRepository):
             return [self._accounts_by_mail[email]]
         return []
 
-    async def get_all(self) -> List[Account]:
-        return list(self._accounts_by_uuid.values())
-
-    async def delete(self, account_uuid: str) -> None:
-        if account_uuid in self._accounts_by_uuid:
-            del self._accounts_by_uuid[account_uuid]
+    async def get_all(self, region: RegionEnum | None = None, vip: bool | None = None) -> List[Account]:
+        return [account for account in self._accounts_by_uuid.values()
+                if (region is None or account.region == region) and (vip is None or account.vip == vip)]
+
+    async def get_stats(self) -> List[RegionStats]:
+        counts = {}
+        for account in self._accounts_by_uuid.values():
+            counts[(account.region, account.vip)] = counts.get((account.region, account.vip), 0) + 1
+        return [RegionStats(region=region, vip=vip, accounts=accounts) for (region, vip), accounts in counts.items()]
+
+    async def delete(self, account_uuid: str, region: RegionEnum | None = None) -> DeletedAccount | None:
+        if account_uuid not in self._accounts_by_uuid:
+            return None
+        account = self._accounts_by_uuid.pop(account_uuid)
+        agent_ids = []
+        if self.agents is not None:
+            for agent in await self.agents.get_by(account_id=account_uuid):
+                await self.agents.delete(agent.id)
+                agent_ids.append(agent.id)
+        return DeletedAccount(**account.dict(exclude={'agents'}), agent_ids=agent_ids)
+
+    async def start_deletion(self, account: Account) -> AccountDeletion:
+        deletion = AccountDeletion(account_id=account.id, region=account.region, vip=account.vip,
+                                   status=DeletionStatusEnum.pending)
+        self._deletions[account.id] = deletion
+        return deletion
+
+    async def get_deletion(self, account_uuid: str, primary: bool = False) -> AccountDeletion | None:
+        return self._deletions.get(account_uuid)
+
+    async def claim_deletion(self, account_uuid: str) -> bool:
+        deletion = self._deletions.get(account_uuid)
+        if deletion is None or deletion.status not in (DeletionStatusEnum.pending, DeletionStatusEnum.failed):
+            return False
+        deletion.status = DeletionStatusEnum.running
+        return True
+
+    async def update_deletion(self, account_uuid: str, status: DeletionStatusEnum, agents_deleted: int = 0) -> None:
+        deletion = self._deletions[account_uuid]
+        deletion.status = status
+        deletion.agents_deleted += agents_deleted
 
     async def update(self, account_uuid: str, **kwargs) -> None:
         agent = self._accounts_by_uuid[account_uuid]
         for k in kwargs.keys():
             agent.__setattr__(k, kwargs[k])
 
-    async def delete_all(self) -> None:
+    async def erase(self) -> EraseResult:
+        rows_removed = {'accounts': len(self._accounts_by_uuid)}
         self._accounts_by_uuid = {}
         self._accounts_by_mail = {}
+        return EraseResult(method='delete', rows_removed=rows_removed)
 
 
 class AgentRepositoryStub(AbstractRepository):
 
-    def __init__(self):
+    def __init__(self, accounts: AccountRepositoryStub | None = None):
         super().__init__()
         self._agents_by_uuid = {}
         self._agents_by_mail = {}
+        self._accounts = accounts
+        if accounts is not None:
+            accounts.agents = self
 
     async def create(self, **kwargs) -> Agent:
         new_agent = Agent(id=uuid4(), **kwargs)
@@ -105,6 +173,10 @@ class AgentRepositoryStub(AbstractRepository):
         self._agents_by_mail[new_agent.email] = new_agent
         return new_agent
 
+    async def create_many(self, items: List[dict]) -> List[Agent]:
+        # like the unique constraint, rows of e-mails already used are not inserted
+        return [await self.create(**agent) for agent in items if agent['email'] not in self._agents_by_mail]
+
     async def get(self, agent_uuid: str) -> Agent | None:
         if agent_uuid in self._agents_by_uuid:
             return self._agents_by_uuid[agent_uuid]
@@ -114,9 +186,15 @@ class AgentRepositoryStub(AbstractRepository):
         if 'email' in kwargs.keys():
             return self.get_agent_for_email(kwargs['email'])
 
+        if 'emails' in kwargs.keys():
+            return [agent for email in kwargs['emails'] for agent in self.get_agent_for_email(email)]
+
         if 'account_id' in kwargs.keys():
             return self.get_agents_for_account(kwargs['account_id'])
 
+        if 'ids' in kwargs.keys():
+            return [self._agents_by_uuid[x] for x in kwargs['ids'] if x in self._agents_by_uuid]
+
         raise NotImplementedError
 
     def get_agent_for_email(self, email: str) -> List[Agent]:
@@ -134,7 +212,11 @@ class AgentRepositoryStub(AbstractRepository):
     async def get_all(self) -> List[Agent]:
         return list(self._agents_by_uuid.values())
 
-    async def delete(self, agent_uuid: str):
+    async def get_stats(self, account_id: str | None = None, region: RegionEnum | None = None) -> AgentStats:
+        agents = self.get_agents_for_account(account_id) if account_id else list(self._agents_by_uuid.values())
+        return AgentStats(agents=len(agents), blocked_agents=len([agent for agent in agents if agent.blocked]))
+
+    async def delete(self, agent_uuid: str, region: RegionEnum | None = None):
         if agent_uuid in self._agents_by_uuid:
             del self._agents_by_uuid[agent_uuid]
 
@@ -143,6 +225,147 @@ class AgentRepositoryStub(AbstractRepository):
         for k in kwargs.keys():
             agent.__setattr__(k, kwargs[k])
 
-    async def delete_all(self):
-        self._agents_by_uuid = {}
-        self._agents_by_mail = {}
+    async def set_blocked(self, agent_uuid: str, blocked: bool) -> RegionEnum | None:
+        agent = self._agents_by_uuid.get(agent_uuid)
+        if agent is None or agent.blocked == blocked:
+            return None
+        agent.blocked = blocked
+        return (await self._accounts.get(agent.account_id)).region
+
+    async def set_blocked_many(self, agent_uuids: List[str], blocked: bool) -> Dict[str, RegionEnum]:
+        result = {}
+        for agent_uuid in agent_uuids:
+            region = await self.set_blocked(agent_uuid, blocked)
+            if region is not None:
+                result[agent_uuid] = region
+        return result
+
+    async def delete_chunk(self, account_uuid: str, limit: int, region: RegionEnum | None = None) -> List[str]:
+        chunk = [agent.id for agent in self.get_agents_for_account(account_uuid)[:limit]]
+        for agent_uuid in chunk:
+            await self.delete(agent_uuid)
+        return chunk
+
+
+class RedisStub:
+    """In-memory Redis shared by the caches of several "workers", published messages reach every subscriber."""
+
+    def __init__(self):
+        self.values = {}
+        self.expirations = {}
+        self.gets = 0
+        self.round_trips = 0
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    async def set(self, name: str, value: str, ex: timedelta | None = None, nx: bool = False) -> bool | None:
+        self.round_trips += 1
+        if nx and name in self.values:
+            return None
+        self._set(name, value, ex)
+        return True
+
+    def _set(self, name: str, value: str, ex: timedelta | None = None) -> None:
+        self.values[name] = value
+        self.expirations[name] = ex
+
+    async def get(self, name: str) -> str | None:
+        self.round_trips += 1
+        self.gets += 1
+        return self.values.get(name)
+
+    async def mget(self, names: List[str]) -> List[str | None]:
+        self.round_trips += 1
+        self.gets += 1
+        return [self.values.get(name) for name in names]
+
+    async def delete(self, *names: str) -> None:
+        self.round_trips += 1
+        self._delete(*names)
+
+    def _incr(self, name: str) -> int:
+        self.values[name] = str(int(self.values.get(name, 0)) + 1)
+        return int(self.values[name])
+
+    def _expire(self, name: str, time: timedelta) -> None:
+        if name in self.values:
+            self.expirations[name] = time
+
+    def _delete(self, *names: str) -> None:
+        for name in names:
+            self.values.pop(name, None)
+
+    async def scan_iter(self, match: str):
+        for name in list(self.values):
+            if fnmatch(name, match):
+                yield name
+
+    async def publish(self, channel: str, message: str) -> None:
+        self.round_trips += 1
+        self._publish(channel, message)
+
+    def _publish(self, channel: str, message: str) -> None:
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait({'type': 'message', 'channel': channel, 'data': message})
+
+    def pubsub(self) -> 'PubSubStub':
+        return PubSubStub(self)
+
+    def pipeline(self, transaction: bool = True) -> 'PipelineStub':
+        return PipelineStub(self)
+
+
+class PipelineStub:
+
+    def __init__(self, redis: RedisStub):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self) -> 'PipelineStub':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self._commands = []
+
+    def set(self, name: str, value: str, ex: timedelta | None = None) -> 'PipelineStub':
+        self._commands.append(lambda: self._redis._set(name, value, ex))
+        return self
+
+    def delete(self, *names: str) -> 'PipelineStub':
+        self._commands.append(lambda: self._redis._delete(*names))
+        return self
+
+    def incr(self, name: str) -> 'PipelineStub':
+        self._commands.append(lambda: self._redis._incr(name))
+        return self
+
+    def expire(self, name: str, time: timedelta) -> 'PipelineStub':
+        self._commands.append(lambda: self._redis._expire(name, time))
+        return self
+
+    def publish(self, channel: str, message: str) -> 'PipelineStub':
+        self._commands.append(lambda: self._redis._publish(channel, message))
+        return self
+
+    async def execute(self) -> list:
+        self._redis.round_trips += 1
+        commands, self._commands = self._commands, []
+        return [command() for command in commands]
+
+
+class PubSubStub:
+
+    def __init__(self, redis: RedisStub):
+        self._redis = redis
+        self._queue = asyncio.Queue()
+
+    async def subscribe(self, channel: str) -> None:
+        self._redis.subscribers.setdefault(channel, []).append(self._queue)
+
+    async def listen(self):
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        for queues in self._redis.subscribers.values():
+            if self._queue in queues:
+                queues.remove(self._queue)